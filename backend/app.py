@@ -1,193 +1,1932 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, jsonify, request, send_from_directory, send_file, g, Response, stream_with_context
 from flask_cors import CORS
 import sqlite3
 import json
 import os
+import sys
 from pathlib import Path
 from datetime import datetime
-import pandas as pd
 import csv
+import io
+import zlib
+import gzip
 import sqlite3
 import re
+import base64
+import queue
+import threading
+import time
+import hashlib
+from functools import wraps, lru_cache
+from collections import OrderedDict
+from contextlib import contextmanager
+from config import Config
+from build_assets import load_assets
+from sql_dump import iter_statements, translate_statement, split_insert, INSERT_BATCH_ROWS
+from suggest import SuggestIndex
+from fuzzy import FuzzyIndex
+import metrics
 
-def load_sql_file(sql_file_path):
-    """Загружает SQL файл и выполняет все запросы"""
+# Необязательные ускорители ответов API: без них JSON через стандартный json и только gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def load_sql_file(sql_file_path, conn=None):
+    """Загружает SQL дамп (в том числе MySQL) одной транзакцией
+
+    Файл читается построчно, операторы выделяются с учётом кавычек и
+    переводятся на диалект SQLite (см. sql_dump.py). CREATE TABLE для уже
+    существующих таблиц пропускается - схему movies создаёт init_database.
+    Если подключение не передано, берётся подключение на запись из пула.
+
+    INSERT в movies направляются в movies_staging (без индексов и
+    триггеров, с копией уже загруженных фильмов), а FTS, счётчики и жанры
+    перестраиваются один раз при подмене таблицы, как в import_csv_file, -
+    а не триггерами на каждую строку. Подряд идущие INSERT в одну таблицу
+    склеиваются в многострочный INSERT (split_insert).
+
+    Возвращает статистику загрузки или None при ошибке.
+    """
+    started = time.perf_counter()
+    stats = {'statements': 0, 'executed': 0, 'skipped': 0, 'failed': 0}
     try:
-        with open(sql_file_path, 'r', encoding='utf-8') as f:
-            sql_content = f.read()
-        
-        # Удаляем комментарии
-        sql_content = re.sub(r'--.*', '', sql_content)
-        sql_content = re.sub(r'/\*.*?\*/', '', sql_content, flags=re.DOTALL)
-        
-        # Разделяем на отдельные запросы
-        queries = [q.strip() for q in sql_content.split(';') if q.strip()]
-        
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        for query in queries:
+        with db_pool.connection(existing=conn) as conn, \
+                open(sql_file_path, 'r', encoding='utf-8') as f:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            staging = False
+            # Накопленные INSERT с одинаковым началом: (начало, [(значения, запрос)])
+            batch_head, batch = None, []
             try:
-                cursor.execute(query)
-            except sqlite3.Error as e:
-                print(f"⚠️  Ошибка выполнения запроса: {e}")
-                print(f"Запрос: {query[:100]}...")
-        
-        conn.commit()
-        conn.close()
-        
-        return True
-        
+                for statement in iter_statements(f):
+                    stats['statements'] += 1
+                    table, queries = translate_statement(statement)
+                    if not queries or (table and has_table(cursor, table)):
+                        stats['skipped'] += 1
+                        continue
+
+                    for query in queries:
+                        movies_insert = _MOVIES_INSERT.match(query)
+                        if movies_insert is not None:
+                            if not staging:
+                                start_movies_staging(cursor)
+                                staging = True
+                            query = movies_insert.group(1) + 'movies_staging' + query[movies_insert.end():]
+                        insert = split_insert(query)
+                        if insert is not None and insert[0] == batch_head and len(batch) < INSERT_BATCH_ROWS:
+                            batch.append((insert[1], query))
+                            continue
+                        execute_dump_batch(cursor, batch_head, batch, stats)
+                        if insert is not None:
+                            batch_head, batch = insert[0], [(insert[1], query)]
+                        else:
+                            batch_head, batch = None, []
+                            execute_dump_query(cursor, query, stats)
+                    if table:
+                        _known_tables.pop(table, None)
+                execute_dump_batch(cursor, batch_head, batch, stats)
+
+                if staging:
+                    swap_movies_table(cursor)
+                else:
+                    normalize_sources(cursor)
+                    refresh_weighted_ratings(cursor)
+                    rebuild_movie_genres(cursor)
+                    refresh_catalog_stats(cursor)
+                bump_data_version(cursor)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        stats['statements_per_sec'] = int(stats['statements'] / stats['seconds']) if stats['seconds'] else stats['statements']
+        print(f"✅ SQL загружен: {stats['statements']} операторов за {stats['seconds']} с "
+              f"({stats['statements_per_sec']} оп/с), пропущено {stats['skipped']}, ошибок {stats['failed']}")
+        return stats
+
     except Exception as e:
         print(f"❌ Ошибка загрузки SQL файла: {e}")
-        return False
+        return None
+
+def execute_dump_query(cursor, query, stats):
+    """Выполняет оператор дампа. Ошибка откатывает только его и попадает в stats"""
+    try:
+        cursor.execute(query)
+        stats['executed'] += 1
+    except sqlite3.Error as e:
+        stats['failed'] += 1
+        if stats['failed'] <= 10:
+            print(f"⚠️  Ошибка выполнения запроса: {e}")
+            print(f"Запрос: {query[:100]}...")
+
+def execute_dump_batch(cursor, head, batch, stats):
+    """Выполняет накопленные INSERT одним оператором, при ошибке - по одному"""
+    if not batch:
+        return
+    if len(batch) == 1:
+        execute_dump_query(cursor, batch[0][1], stats)
+        return
+    try:
+        cursor.execute(head + ' ' + ',\n'.join(values for values, _ in batch))
+        stats['executed'] += len(batch)
+    except sqlite3.Error:
+        # Упавший оператор откатился целиком - повторяем построчно, чтобы найти ошибки
+        for _, query in batch:
+            execute_dump_query(cursor, query, stats)
+
+# INSERT в movies из дампа -> INSERT в movies_staging
+_MOVIES_INSERT = re.compile(r'^(\s*(?:INSERT|REPLACE)(?:\s+OR\s+\w+)?\s+INTO\s+)[`"]?movies[`"]?(?=[\s(])', re.I)
+
+def start_movies_staging(cursor):
+    """Создаёт movies_staging и копирует в неё уже загруженные фильмы (с их id)"""
+    cursor.execute("DROP TABLE IF EXISTS movies_staging")
+    cursor.execute(MOVIES_TABLE_SQL.format(table='movies_staging'))
+    cursor.execute("PRAGMA table_info(movies)")
+    existing = {row[1] for row in cursor.fetchall()}
+    columns = ', '.join(name for name in ['id'] + MOVIE_COLUMNS + ['created_at'] if name in existing)
+    if columns:
+        cursor.execute(f"INSERT INTO movies_staging ({columns}) SELECT {columns} FROM movies")
+
 app = Flask(__name__)
 CORS(app)
 
 # Пути
 BASE_DIR = Path(__file__).parent
-DB_PATH = BASE_DIR / 'database' / 'movies.db'
+DB_PATH = Path(Config.DATABASE_PATH) if Config.DATABASE_PATH else BASE_DIR / 'database' / 'movies.db'
 DATA_DIR = BASE_DIR.parent / 'data'
 FRONTEND_DIR = BASE_DIR.parent / 'frontend'
+SNAPSHOT_PATH = Path(Config.DATABASE_SNAPSHOT) if Config.DATABASE_SNAPSHOT else DB_PATH.parent / 'movies.snapshot.db'
 
-# Создаём БД при старте если нет
-def init_database():
-    """Создаёт базу данных и таблицы если их нет"""
+# Версия схемы в PRAGMA user_version: если совпадает, init_database не выполняет DDL
+SCHEMA_VERSION = 3
+
+# Какие вспомогательные таблицы есть в БД (проверяется один раз на процесс,
+# сбрасывается в init_database). Без них API работает по-старому.
+_known_tables = {}
+
+def has_table(cursor, name):
+    """Проверяет, есть ли в БД таблица (в том числе виртуальная) с таким именем"""
+    if name not in _known_tables:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+        _known_tables[name] = cursor.fetchone() is not None
+    return _known_tables[name]
+
+# Колонки таблиц (для проверки fields=), сбрасывается вместе с _known_tables
+_table_columns = {}
+
+def table_columns(cursor, name):
+    """Список колонок таблицы в порядке схемы"""
+    if name not in _table_columns:
+        cursor.execute(f"PRAGMA table_info({name})")
+        _table_columns[name] = [row[1] for row in cursor.fetchall()]
+    return _table_columns[name]
+
+def parse_fields(value, cursor, default=None):
+    """Разбирает параметр fields=id,title,... для таблицы movies.
+
+    Пустое значение - default или все колонки. Неизвестные поля - ValueError.
+    """
+    fields = []
+    for name in (value or '').split(','):
+        name = name.strip()
+        if name and name not in fields:
+            fields.append(name)
+    columns = table_columns(cursor, 'movies')
+    unknown = [name for name in fields if name not in columns]
+    if unknown:
+        raise ValueError(f'Неизвестные поля: {", ".join(unknown)}')
+    return fields or list(default or columns)
+
+# Полнотекстовый поиск (SQLite FTS5)
+
+def create_search_index(cursor):
+    """Создаёт FTS5 индекс по названию, описанию и жанру и триггеры синхронизации.
+
+    Возвращает False, если SQLite собран без FTS5 (тогда поиск работает через LIKE).
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'movies_fts'")
+    if cursor.fetchone() is None:
+        try:
+            # external content таблица: текст хранится только в movies
+            cursor.execute("""
+                CREATE VIRTUAL TABLE movies_fts USING fts5(
+                    title, description, genre,
+                    content='movies', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2',
+                    prefix='2 3'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            print(f"⚠️  FTS5 недоступен, поиск будет работать через LIKE: {e}")
+            return False
+
+        # Индексируем уже загруженные фильмы
+        cursor.execute("INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')")
+
+    # Триггеры держат индекс в синхронизации с таблицей movies
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS movies_fts_ai AFTER INSERT ON movies BEGIN
+            INSERT INTO movies_fts(rowid, title, description, genre)
+            VALUES (new.id, new.title, new.description, new.genre);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS movies_fts_ad AFTER DELETE ON movies BEGIN
+            INSERT INTO movies_fts(movies_fts, rowid, title, description, genre)
+            VALUES ('delete', old.id, old.title, old.description, old.genre);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS movies_fts_au AFTER UPDATE OF title, description, genre ON movies BEGIN
+            INSERT INTO movies_fts(movies_fts, rowid, title, description, genre)
+            VALUES ('delete', old.id, old.title, old.description, old.genre);
+            INSERT INTO movies_fts(rowid, title, description, genre)
+            VALUES (new.id, new.title, new.description, new.genre);
+        END
+    """)
+    return True
+
+def fts_enabled(cursor):
+    """Есть ли в БД FTS5 индекс"""
+    return has_table(cursor, 'movies_fts')
+
+def build_fts_query(text, column=None):
+    """Превращает пользовательский ввод в FTS5 выражение с префиксным поиском.
+
+    Каждое слово экранируется кавычками и получает '*', слова объединяются через AND.
+    Возвращает None, если в строке нет ни одного слова.
+    """
+    tokens = re.findall(r'\w+', text.lower())
+    if not tokens:
+        return None
+    prefix = f"{column} : " if column else ""
+    return " AND ".join(f'{prefix}"{token}"*' for token in tokens)
+
+# Счётчики каталога: число фильмов поддерживается триггерами,
+# версия данных увеличивается загрузчиками и сбрасывает кэши
+def create_counters(cursor):
+    """Создаёт таблицу catalog_counters, триггеры и пересчитывает число фильмов"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO catalog_counters (name, value) VALUES ('movies', 0), ('data_version', 0)")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS movies_count_ai AFTER INSERT ON movies BEGIN
+            UPDATE catalog_counters SET value = value + 1 WHERE name = 'movies';
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS movies_count_ad AFTER DELETE ON movies BEGIN
+            UPDATE catalog_counters SET value = value - 1 WHERE name = 'movies';
+        END
+    """)
+    # Данные могли меняться, пока триггеров не было
+    cursor.execute("UPDATE catalog_counters SET value = (SELECT COUNT(*) FROM movies) WHERE name = 'movies'")
+
+def read_counters(cursor):
+    """Возвращает счётчики каталога словарём или None, если таблицы ещё нет"""
+    try:
+        cursor.execute("SELECT name, value FROM catalog_counters")
+    except sqlite3.OperationalError:
+        return None
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+def bump_data_version(cursor):
+    """Отмечает, что данные каталога перезагружены (кэши с прежней версией устаревают)"""
+    cursor.execute("UPDATE catalog_counters SET value = value + 1 WHERE name = 'data_version'")
+    with _count_cache_lock:
+        _count_cache.clear()
+    _response_cache.clear()
+    _data_version['checked'] = None
+
+# Кэш количества фильмов под фильтром: (версия данных, FROM, WHERE, параметры) -> total
+_count_cache = OrderedDict()
+_count_cache_lock = threading.Lock()
+
+def count_movies(cursor, from_clause, where_clause, params, mode='exact'):
+    """Количество фильмов под фильтром для total в /api/movies.
+
+    Без фильтров число берётся из catalog_counters, с фильтрами - из LRU кэша
+    или запросом COUNT. В режиме 'estimate' при промахе кэша считается не больше
+    Config.COUNT_ESTIMATE_LIMIT строк. Возвращает (total, точное ли значение).
+    """
+    counters = read_counters(cursor)
+    if counters is not None and from_clause == 'movies' and not where_clause:
+        return counters['movies'], True
     
-    # Создаём папки если их нет
-    DB_PATH.parent.mkdir(exist_ok=True)
-    DATA_DIR.mkdir(exist_ok=True)
+    key = None
+    if counters is not None:
+        key = (counters['data_version'], from_clause, where_clause, tuple(params))
+        with _count_cache_lock:
+            if key in _count_cache:
+                _count_cache.move_to_end(key)
+                return _count_cache[key], True
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    if mode == 'estimate':
+        limit = Config.COUNT_ESTIMATE_LIMIT
+        count_query = f"""
+            SELECT COUNT(*) as total
+            FROM (SELECT 1 FROM {from_clause} WHERE 1=1{where_clause} LIMIT ?)
+        """
+        count_params = list(params) + [limit]
+    else:
+        limit = None
+        count_query = f"""
+            SELECT COUNT(*) as total
+            FROM {from_clause}
+            WHERE 1=1{where_clause}
+        """
+        count_params = list(params)
+    
+    cursor.execute(count_query, count_params)
+    total = cursor.fetchone()[0]
+    
+    if limit is not None and total >= limit:
+        # Упёрлись в лимит - это только нижняя оценка, в кэш не кладём
+        return total, False
     
-    # Создаём таблицу movies если её нет
+    if key is not None:
+        with _count_cache_lock:
+            _count_cache[key] = total
+            _count_cache.move_to_end(key)
+            while len(_count_cache) > Config.COUNT_CACHE_SIZE:
+                _count_cache.popitem(last=False)
+    return total, True
+
+# Жанры: строка "Comedy, Drama" раскладывается в таблицы genres и movie_genres
+def split_genres(genre):
+    """Разбивает строку жанров через запятую на отдельные названия"""
+    if not genre:
+        return []
+    return [name.strip() for name in genre.split(',') if name.strip()]
+
+def create_genre_tables(cursor):
+    """Создаёт genres и movie_genres. Возвращает True, если связи нужно заполнить."""
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS movies (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            canonical_key TEXT UNIQUE,
-            title TEXT NOT NULL,
-            release_year INTEGER,
-            imdb_rating REAL,
-            imdb_votes INTEGER,
-            genre TEXT,
-            description TEXT,
-            poster_url TEXT NOT NULL,
-            language TEXT,
-            imdb_id TEXT,
-            sources TEXT,
-            num_sources INTEGER,
-            netflix_id TEXT,
-            netflix_director TEXT,
-            netflix_cast TEXT,
-            netflix_country TEXT,
-            netflix_date_added TEXT,
-            netflix_rating TEXT,
-            netflix_duration TEXT,
-            netflix_listed_in TEXT,
-            amazon_id TEXT,
-            amazon_director TEXT,
-            amazon_cast TEXT,
-            amazon_country TEXT,
-            amazon_date_added TEXT,
-            amazon_rating TEXT,
-            amazon_duration TEXT,
-            amazon_listed_in TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        CREATE TABLE IF NOT EXISTS genres (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE COLLATE NOCASE
         )
     """)
+    # Ключ (genre_id, movie_id) - это и есть индекс для фильтра по жанру
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS movie_genres (
+            movie_id INTEGER NOT NULL,
+            genre_id INTEGER NOT NULL,
+            PRIMARY KEY (genre_id, movie_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_movie_genres_movie ON movie_genres(movie_id)")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS movie_genres_ad AFTER DELETE ON movies BEGIN
+            DELETE FROM movie_genres WHERE movie_id = old.id;
+        END
+    """)
     
-    # Создаём индексы
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM movie_genres), EXISTS (SELECT 1 FROM movies WHERE genre IS NOT NULL)")
+    has_links, has_genres = cursor.fetchone()
+    return bool(has_genres) and not has_links
+
+def rebuild_movie_genres(cursor, batch_size=10000):
+    """Заново заполняет movie_genres по колонке movies.genre (после загрузки данных)"""
+    cursor.execute("DELETE FROM movie_genres")
+    cursor.execute("SELECT id, name FROM genres")
+    genre_ids = {row[1].lower(): row[0] for row in cursor.fetchall()}
+    
+    movies_cursor = cursor.connection.cursor()
+    movies_cursor.execute("SELECT id, genre FROM movies WHERE genre IS NOT NULL AND genre != ''")
+    links = []
+    for movie_id, genre in movies_cursor:
+        for name in split_genres(genre):
+            key = name.lower()
+            if key not in genre_ids:
+                cursor.execute("INSERT INTO genres (name) VALUES (?)", (name,))
+                genre_ids[key] = cursor.lastrowid
+            links.append((movie_id, genre_ids[key]))
+        if len(links) >= batch_size:
+            cursor.executemany("INSERT OR IGNORE INTO movie_genres (movie_id, genre_id) VALUES (?, ?)", links)
+            links = []
+    cursor.executemany("INSERT OR IGNORE INTO movie_genres (movie_id, genre_id) VALUES (?, ?)", links)
+    
+    # Жанры, у которых не осталось фильмов
+    cursor.execute("DELETE FROM genres WHERE id NOT IN (SELECT genre_id FROM movie_genres)")
+
+# Биты платформ в movies.source_mask (как PLATFORM_BITS в catalog_engine.py)
+SOURCE_BITS = {
+    'netflix': 1,
+    'amazon': 2,
+    'imdb': 4,
+}
+SOURCE_MASK_SQL = ' + '.join(
+    f"(INSTR(',' || COALESCE(sources, '') || ',', ',{name},') > 0) * {bit}" for name, bit in SOURCE_BITS.items()
+)
+
+def normalize_sources(cursor):
+    """Приводит movies.sources к виду "netflix,imdb" один раз при загрузке данных.
+
+    В CSV источники записаны как "['netflix', 'imdb']", у части строк их нет
+    вовсе - тогда они выводятся из netflix_id / amazon_id / poster_url, а
+    num_sources пересчитывается. По строке sources заполняется битовая маска
+    source_mask, по которой работают фильтры и статистика платформ.
+    Возвращает число изменённых строк.
+    """
+    cursor.execute("""
+        UPDATE movies
+        SET sources = REPLACE(REPLACE(REPLACE(REPLACE(sources, '[', ''), ']', ''), '''', ''), ' ', '')
+        WHERE sources LIKE '[%' OR sources LIKE '% %'
+    """)
+    changed = cursor.rowcount
+    cursor.execute("""
+        UPDATE movies
+        SET sources = derived,
+            num_sources = LENGTH(derived) - LENGTH(REPLACE(derived, ',', '')) + 1
+        FROM (
+            SELECT id AS movie_id, TRIM(
+                CASE WHEN netflix_id IS NOT NULL AND netflix_id != '' THEN 'netflix,' ELSE '' END ||
+                CASE WHEN amazon_id IS NOT NULL AND amazon_id != '' THEN 'amazon,' ELSE '' END ||
+                CASE WHEN poster_url IS NOT NULL AND poster_url != '' THEN 'imdb,' ELSE '' END,
+                ',') AS derived
+            FROM movies
+            WHERE sources IS NULL OR sources = ''
+        )
+        WHERE movies.id = movie_id AND derived != ''
+    """)
+    changed += cursor.rowcount
+    cursor.execute(f"UPDATE movies SET source_mask = {SOURCE_MASK_SQL} WHERE source_mask != {SOURCE_MASK_SQL}")
+    return changed + cursor.rowcount
+
+def refresh_weighted_ratings(cursor):
+    """Пересчитывает movies.weighted_rating - байесовский рейтинг с учётом числа голосов.
+
+    WR = (v * R + m * C) / (v + m): R - рейтинг фильма, v - его голоса,
+    C - средний рейтинг каталога, m - Config.WEIGHTED_RATING_MIN_VOTES
+    (0 - медиана голосов). У фильма с десятком голосов WR почти равен C,
+    и он не обгоняет фильмы с тысячами оценок. Считается при загрузке
+    данных, потому что C и m зависят от всего каталога.
+    """
+    cursor.execute("SELECT AVG(imdb_rating), COUNT(imdb_votes) FROM movies WHERE imdb_rating IS NOT NULL")
+    mean_rating, voted = cursor.fetchone()
+    min_votes = Config.WEIGHTED_RATING_MIN_VOTES
+    if not min_votes and voted:
+        cursor.execute("""
+            SELECT imdb_votes FROM movies
+            WHERE imdb_rating IS NOT NULL AND imdb_votes IS NOT NULL
+            ORDER BY imdb_votes LIMIT 1 OFFSET ?
+        """, (voted // 2,))
+        min_votes = cursor.fetchone()[0]
+    min_votes = max(min_votes or 0, 1)
+    cursor.execute("""
+        UPDATE movies
+        SET weighted_rating = CASE WHEN imdb_rating IS NULL THEN NULL ELSE
+            (COALESCE(imdb_votes, 0) * imdb_rating + :m * :c) / (COALESCE(imdb_votes, 0) + :m) END
+    """, {'m': min_votes, 'c': mean_rating or 0})
+    return {'mean_rating': mean_rating, 'min_votes': min_votes}
+
+def parse_genre_filter(args):
+    """Жанры из параметров genre (можно несколько или через запятую) и режим genre_mode.
+
+    Возвращает (список названий без повторов, 'or' | 'and').
+    """
+    names = {}
+    for value in args.getlist('genre'):
+        for name in split_genres(value):
+            names.setdefault(name.lower(), name)
+    mode = args.get('genre_mode', 'or').lower()
+    return list(names.values()), ('and' if mode == 'and' else 'or')
+
+# Сводная статистика каталога для /api/stats: (вид, ключ) -> количество и сумма.
+# Виды: platform (netflix/amazon/imdb), year, rating_bucket (0..10, 10 - "10 и выше"),
+# rating (сумма рейтингов фильмов с годом и рейтингом, для среднего), genre.
+# Пересчитывается загрузчиками за один проход, между загрузками - триггерами.
+
+def _stats_rows_sql(row, sign):
+    """SELECT строк catalog_stats, которые даёт фильм row ('new' или 'old') со знаком sign"""
+    return f"""
+        SELECT 'platform', 'netflix', {sign}, 0 WHERE {row}.source_mask & {SOURCE_BITS['netflix']}
+        UNION ALL SELECT 'platform', 'amazon', {sign}, 0 WHERE {row}.source_mask & {SOURCE_BITS['amazon']}
+        UNION ALL SELECT 'platform', 'imdb', {sign}, 0 WHERE {row}.source_mask & {SOURCE_BITS['imdb']}
+        UNION ALL SELECT 'year', {row}.release_year, {sign}, 0 WHERE {row}.release_year IS NOT NULL
+        UNION ALL SELECT 'rating_bucket', MIN(CAST({row}.imdb_rating AS INTEGER), 10), {sign}, 0
+            WHERE {row}.imdb_rating IS NOT NULL
+        UNION ALL SELECT 'rating', 'sum', {sign}, {sign} * {row}.imdb_rating
+            WHERE {row}.release_year IS NOT NULL AND {row}.imdb_rating IS NOT NULL
+    """
+
+STATS_UPSERT = " ON CONFLICT(kind, key) DO UPDATE SET count = count + excluded.count, total = total + excluded.total;"
+
+def create_catalog_stats(cursor):
+    """Создаёт catalog_stats и триггеры. Возвращает True, если таблицу нужно заполнить."""
+    created = not has_table(cursor, 'catalog_stats')
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_stats (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID
+    """)
+    columns = "source_mask, release_year, imdb_rating"
+    insert = "INSERT INTO catalog_stats (kind, key, count, total)"
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS movies_stats_ai AFTER INSERT ON movies BEGIN
+            {insert} {_stats_rows_sql('new', 1)} {STATS_UPSERT}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS movies_stats_ad AFTER DELETE ON movies BEGIN
+            {insert} {_stats_rows_sql('old', -1)} {STATS_UPSERT}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS movies_stats_au AFTER UPDATE OF {columns} ON movies BEGIN
+            {insert} {_stats_rows_sql('old', -1)} {STATS_UPSERT}
+            {insert} {_stats_rows_sql('new', 1)} {STATS_UPSERT}
+        END
+    """)
+    # Жанры считаются по связям movie_genres
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS movie_genres_stats_ai AFTER INSERT ON movie_genres BEGIN
+            {insert} SELECT 'genre', name, 1, 0 FROM genres WHERE id = new.genre_id {STATS_UPSERT}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS movie_genres_stats_ad AFTER DELETE ON movie_genres BEGIN
+            {insert} SELECT 'genre', name, -1, 0 FROM genres WHERE id = old.genre_id {STATS_UPSERT}
+        END
+    """)
+    _known_tables['catalog_stats'] = True
+    return created
+
+def refresh_catalog_stats(cursor):
+    """Пересчитывает catalog_stats за один проход по movies.
+
+    Один GROUP BY по (год, корзина рейтинга, платформы) даёт немного строк,
+    из которых собираются все гистограммы.
+    """
+    cursor.execute("""
+        SELECT release_year,
+               MIN(CAST(imdb_rating AS INTEGER), 10),
+               source_mask & ?,
+               source_mask & ?,
+               source_mask & ?,
+               COUNT(*),
+               SUM(imdb_rating)
+        FROM movies
+        GROUP BY 1, 2, 3, 4, 5
+    """, tuple(SOURCE_BITS.values()))
+    stats = {}
+    def add(kind, key, count, total=0):
+        entry = stats.setdefault((kind, str(key)), [0, 0])
+        entry[0] += count
+        entry[1] += total
+    
+    for year, bucket, netflix, amazon, imdb, count, rating_sum in cursor.fetchall():
+        if netflix:
+            add('platform', 'netflix', count)
+        if amazon:
+            add('platform', 'amazon', count)
+        if imdb:
+            add('platform', 'imdb', count)
+        if year is not None:
+            add('year', year, count)
+        if bucket is not None:
+            add('rating_bucket', bucket, count)
+            if year is not None:
+                add('rating', 'sum', count, rating_sum)
+    
+    cursor.execute("""
+        SELECT g.name, COUNT(*)
+        FROM movie_genres mg
+        JOIN genres g ON g.id = mg.genre_id
+        GROUP BY mg.genre_id
+    """)
+    for name, count in cursor.fetchall():
+        add('genre', name, count)
+    
+    cursor.execute("DELETE FROM catalog_stats")
+    cursor.executemany(
+        "INSERT INTO catalog_stats (kind, key, count, total) VALUES (?, ?, ?, ?)",
+        [(kind, key, count, total) for (kind, key), (count, total) in stats.items()]
+    )
+
+def read_catalog_stats(cursor):
+    """Читает catalog_stats: {вид: {ключ: (количество, сумма)}} без нулевых записей"""
+    cursor.execute("SELECT kind, key, count, total FROM catalog_stats WHERE count != 0")
+    result = {}
+    for kind, key, count, total in cursor.fetchall():
+        result.setdefault(kind, {})[key] = (count, total)
+    return result
+
+# Схема таблицы фильмов ({table} - movies или промежуточная таблица загрузки)
+MOVIES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        canonical_key TEXT UNIQUE,
+        title TEXT NOT NULL,
+        release_year INTEGER,
+        imdb_rating REAL,
+        imdb_votes INTEGER,
+        weighted_rating REAL,
+        genre TEXT,
+        description TEXT,
+        poster_url TEXT NOT NULL,
+        language TEXT,
+        imdb_id TEXT,
+        sources TEXT,
+        num_sources INTEGER,
+        source_mask INTEGER NOT NULL DEFAULT 0,
+        netflix_id TEXT,
+        netflix_director TEXT,
+        netflix_cast TEXT,
+        netflix_country TEXT,
+        netflix_date_added TEXT,
+        netflix_rating TEXT,
+        netflix_duration TEXT,
+        netflix_listed_in TEXT,
+        amazon_id TEXT,
+        amazon_director TEXT,
+        amazon_cast TEXT,
+        amazon_country TEXT,
+        amazon_date_added TEXT,
+        amazon_rating TEXT,
+        amazon_duration TEXT,
+        amazon_listed_in TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Колонки, которые заполняются из файлов данных
+MOVIE_COLUMNS = [
+    'canonical_key', 'title', 'release_year', 'imdb_rating', 'imdb_votes', 'genre',
+    'description', 'poster_url', 'language', 'imdb_id', 'sources', 'num_sources',
+    'netflix_id', 'netflix_director', 'netflix_cast', 'netflix_country',
+    'netflix_date_added', 'netflix_rating', 'netflix_duration', 'netflix_listed_in',
+    'amazon_id', 'amazon_director', 'amazon_cast', 'amazon_country',
+    'amazon_date_added', 'amazon_rating', 'amazon_duration', 'amazon_listed_in',
+]
+
+def create_similar_table(cursor):
+    """Таблица заранее посчитанных похожих фильмов (заполняет similar.refresh_similar)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS movie_similar (
+            movie_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            similar_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (movie_id, rank)
+        ) WITHOUT ROWID
+    """)
+
+def refresh_similar_movies(full=False):
+    """Пересчитывает похожие фильмы на подключении из пула. None, если NumPy нет.
+
+    Пересчёты идут по одному (_similar_refresh_lock). Если во время
+    пересчёта данные перезагрузили, refresh_similar отбрасывает результат
+    (stale) - следующий пересчёт уже поставлен загрузчиком.
+    """
+    try:
+        from similar import refresh_similar
+    except ImportError:
+        print("⚠️  NumPy не установлен - похожие фильмы недоступны")
+        return None
+    with _similar_refresh_lock:
+        with db_pool.connection() as conn:
+            stats = refresh_similar(conn, Config.SIMILAR_TOP_K, Config.SIMILAR_WORKERS, full,
+                                    Config.SIMILAR_REBUILD_RATIO)
+    if stats['stale']:
+        print(f"⚠️  Похожие фильмы: данные изменились во время пересчёта, результат отброшен")
+        return stats
+    print(f"🎯 Похожие фильмы: пересчитано {stats['recomputed']} из {stats['movies']} "
+          f"за {stats['seconds']} с ({stats['backend']})")
+    return stats
+
+_similar_refresh_lock = threading.Lock()
+
+def schedule_similar_refresh():
+    """Запускает пересчёт похожих фильмов в фоновом потоке (Config.SIMILAR_ON_LOAD)"""
+    if not Config.SIMILAR_ON_LOAD:
+        return
+    
+    def run():
+        try:
+            refresh_similar_movies()
+        except Exception as e:
+            print(f"❌ Ошибка пересчёта похожих фильмов: {e}")
+    
+    threading.Thread(target=run, name='similar-refresh', daemon=True).start()
+
+def create_movie_indexes(cursor):
+    """Создаёт индексы таблицы movies"""
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_title ON movies(title)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_year ON movies(release_year)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_rating ON movies(imdb_rating)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_sources ON movies(num_sources)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_weighted_rating ON movies(weighted_rating)")
+
+def peak_memory_mb():
+    """Пиковое потребление памяти процессом (RSS) в МБ или None, если не узнать"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS - байты
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def import_csv_file(conn, csv_path, chunk_size=None):
+    """Потоково загружает CSV в movies с атомарной заменой таблицы (см. import_rows).
+
+    Колонки файла, которых нет в схеме (например movie_id), пропускаются,
+    пустые ячейки - NULL (в NOT NULL колонках - значение из
+    NOT_NULL_DEFAULTS), числа приводит аффинность колонок.
+    """
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        positions = [(i, name) for i, name in enumerate(header) if name in MOVIE_COLUMNS]
+        rows = (
+            tuple((record[i] if i < len(record) and record[i] != '' else None) for i, _ in positions)
+            for record in reader
+        )
+        return import_rows(conn, [name for _, name in positions], rows, chunk_size)
+
+def import_rows(conn, columns, rows, chunk_size=None):
+    """Потоково загружает строки (кортежи по columns) в movies с атомарной заменой таблицы.
+
+    Строки пачками по chunk_size вставляются через executemany в
+    промежуточную таблицу без индексов. Затем в той же транзакции старая
+    таблица удаляется, новая переименовывается в movies, и заново строятся
+    индексы, триггеры, FTS, жанры и счётчики. Читатели до COMMIT видят
+    прежние данные, при ошибке всё откатывается.
+
+    Пустые NOT NULL колонки заполняются из NOT_NULL_DEFAULTS. Повторный
+    canonical_key пропускается (duplicates), а строки, нарушающие остальные
+    ограничения (например без title), не теряются молча: пачка с такой
+    строкой повторяется построчно, нарушения считаются в failed, первые
+    из них - в errors.
+    """
+    chunk_size = chunk_size or Config.IMPORT_CHUNK_SIZE
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    if 'title' not in columns:
+        raise ValueError('В данных нет колонки title')
+    
+    # NOT NULL колонки: NULL из данных -> значение по умолчанию, отсутствующие - константой
+    values = [f"COALESCE(?, '{NOT_NULL_DEFAULTS[name]}')" if name in NOT_NULL_DEFAULTS else '?'
+              for name in columns]
+    missing = [name for name in NOT_NULL_DEFAULTS if name not in columns]
+    insert_query = f"""
+        INSERT INTO movies_staging ({', '.join(list(columns) + missing)})
+        VALUES ({', '.join(values + [f"'{NOT_NULL_DEFAULTS[name]}'" for name in missing])})
+        ON CONFLICT (canonical_key) DO NOTHING
+    """
+    stats = {'read': 0, 'loaded': 0, 'failed': 0, 'errors': []}
+    
+    if conn.in_transaction:
+        conn.commit()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute("DROP TABLE IF EXISTS movies_staging")
+        cursor.execute(MOVIES_TABLE_SQL.format(table='movies_staging'))
+        
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                insert_chunk(cursor, insert_query, chunk, stats)
+                chunk = []
+        if chunk:
+            insert_chunk(cursor, insert_query, chunk, stats)
+        load_seconds = time.perf_counter() - started
+        
+        swap_movies_table(cursor)
+        # id фильмов выдаются заново - прежние соседи не годятся
+        create_similar_table(cursor)
+        cursor.execute("DELETE FROM movie_similar")
+        bump_data_version(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    if stats['failed']:
+        print(f"⚠️  Не загружено {stats['failed']} строк с ошибками: {'; '.join(stats['errors'])}")
+    seconds = time.perf_counter() - started
+    rows_loaded = stats['loaded']
+    duplicates = stats['read'] - rows_loaded - stats['failed']
+    return {
+        'rows': rows_loaded,
+        'duplicates': duplicates,
+        'failed': stats['failed'],
+        'errors': stats['errors'],
+        'skipped': duplicates + stats['failed'],
+        'seconds': round(seconds, 3),
+        'load_seconds': round(load_seconds, 3),
+        'rows_per_sec': round(rows_loaded / seconds) if seconds else None,
+        'peak_memory_mb': peak_memory_mb(),
+    }
+
+# Значения для NOT NULL колонок movies, когда в данных пусто
+NOT_NULL_DEFAULTS = {'poster_url': ''}
+# Сколько текстов ошибок импорта возвращать
+IMPORT_ERROR_SAMPLES = 5
+
+def insert_chunk(cursor, insert_query, chunk, stats):
+    """Вставляет пачку одним executemany, при нарушении ограничений - построчно.
+
+    Пачка выполняется под SAVEPOINT: если одна строка упала, вставленная
+    часть пачки откатывается и строки вставляются по одной, чтобы сохранить
+    остальные и посчитать ошибки.
+    """
+    conn = cursor.connection
+    stats['read'] += len(chunk)
+    changes_before = conn.total_changes
+    cursor.execute("SAVEPOINT import_chunk")
+    try:
+        cursor.executemany(insert_query, chunk)
+    except sqlite3.IntegrityError:
+        cursor.execute("ROLLBACK TO import_chunk")
+        changes_before = conn.total_changes
+        for number, row in enumerate(chunk, stats['read'] - len(chunk) + 1):
+            try:
+                cursor.execute(insert_query, row)
+            except sqlite3.IntegrityError as e:
+                stats['failed'] += 1
+                if len(stats['errors']) < IMPORT_ERROR_SAMPLES:
+                    stats['errors'].append(f"строка {number}: {e}")
+    cursor.execute("RELEASE import_chunk")
+    stats['loaded'] += conn.total_changes - changes_before
+
+def swap_movies_table(cursor):
+    """Подменяет movies таблицей movies_staging и перестраивает всё, что от неё зависит.
+
+    Выполняется в транзакции вызывающего. Триггеры старой таблицы удаляются
+    вместе с ней, поэтому источники и взвешенный рейтинг заполняются до
+    их пересоздания, без срабатывания на каждую строку.
+    """
+    cursor.execute("DROP TABLE IF EXISTS movies")
+    cursor.execute("ALTER TABLE movies_staging RENAME TO movies")
+    normalize_sources(cursor)
+    refresh_weighted_ratings(cursor)
+    create_movie_indexes(cursor)
+    if create_search_index(cursor):
+        cursor.execute("INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')")
+    create_counters(cursor)
+    create_genre_tables(cursor)
+    create_catalog_stats(cursor)
+    rebuild_movie_genres(cursor)
+    refresh_catalog_stats(cursor)
+
+# Приведение колонок при миграции: пустые строки - NULL, "1992.0" - 1992, "1,234" - 1234
+MIGRATION_CASTS = {
+    'release_year': "CAST(CAST(NULLIF(release_year, '') AS REAL) AS INTEGER)",
+    'imdb_votes': "CAST(CAST(NULLIF(REPLACE(imdb_votes, ',', ''), '') AS REAL) AS INTEGER)",
+    'num_sources': "CAST(CAST(NULLIF(num_sources, '') AS REAL) AS INTEGER)",
+    'imdb_rating': "CAST(NULLIF(imdb_rating, '') AS REAL)",
+    **{name: f"COALESCE({name}, '{default}')" for name, default in NOT_NULL_DEFAULTS.items()},
+}
+
+def movies_table_outdated(cursor):
+    """Отличается ли movies от MOVIES_TABLE_SQL: колонки, их типы или значения не того типа.
+
+    Базы, созданные через pandas.to_sql, хранят годы и голоса как REAL
+    (1992.0), содержат лишнюю колонку movie_id и не имеют новых колонок.
+    """
+    cursor.execute("PRAGMA table_info(movies)")
+    actual = [(row[1], (row[2] or '').upper()) for row in cursor.fetchall()]
+    cursor.execute(MOVIES_TABLE_SQL.format(table='temp.movies_expected'))
+    cursor.execute("PRAGMA temp.table_info(movies_expected)")
+    expected = [(row[1], (row[2] or '').upper()) for row in cursor.fetchall()]
+    cursor.execute("DROP TABLE temp.movies_expected")
+    if sorted(actual) != sorted(expected):
+        return True
+    cursor.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM movies
+            WHERE typeof(release_year) NOT IN ('integer', 'null')
+               OR typeof(imdb_votes) NOT IN ('integer', 'null')
+               OR typeof(num_sources) NOT IN ('integer', 'null')
+               OR typeof(imdb_rating) NOT IN ('real', 'integer', 'null')
+        )
+    """)
+    return bool(cursor.fetchone()[0])
+
+def migrate_movies_table(cursor):
+    """Переносит movies в таблицу по MOVIES_TABLE_SQL с приведением типов.
+
+    Данные копируются одним INSERT ... SELECT (лишние колонки вроде movie_id
+    отбрасываются), затем таблица подменяется как при загрузке CSV. id
+    сохраняются, поэтому похожие фильмы остаются действительными. Пропускаются
+    только повторы id и canonical_key; строки без title перенести нельзя -
+    их число выводится предупреждением.
+    """
+    started = time.perf_counter()
+    cursor.execute("PRAGMA table_info(movies)")
+    existing = {row[1] for row in cursor.fetchall()}
+    columns = [name for name in ['id'] + MOVIE_COLUMNS + ['created_at'] if name in existing]
+    values = [MIGRATION_CASTS.get(name, name) for name in columns]
+    for name, default in NOT_NULL_DEFAULTS.items():
+        if name not in existing:
+            columns.append(name)
+            values.append(f"'{default}'")
+    
+    cursor.execute("SAVEPOINT migrate_movies")
+    try:
+        cursor.execute("SELECT COUNT(*), COUNT(title) FROM movies")
+        total, with_title = cursor.fetchone()
+        cursor.execute("DROP TABLE IF EXISTS movies_staging")
+        cursor.execute(MOVIES_TABLE_SQL.format(table='movies_staging'))
+        # WHERE обязателен: без него ON CONFLICT разбирается как часть SELECT
+        cursor.execute(f"""
+            INSERT INTO movies_staging ({', '.join(columns)})
+            SELECT {', '.join(values)} FROM movies WHERE title IS NOT NULL
+            ON CONFLICT DO NOTHING
+        """)
+        rows = cursor.rowcount
+        if total != rows:
+            print(f"⚠️  При миграции не перенесено {total - rows} строк: "
+                  f"без title {total - with_title}, повторы id/canonical_key {with_title - rows}")
+        swap_movies_table(cursor)
+        if 'id' not in existing:
+            create_similar_table(cursor)
+            cursor.execute("DELETE FROM movie_similar")
+        bump_data_version(cursor)
+        cursor.execute("RELEASE migrate_movies")
+    except Exception:
+        cursor.execute("ROLLBACK TO migrate_movies")
+        cursor.execute("RELEASE migrate_movies")
+        raise
+    print(f"🔁 Таблица movies приведена к схеме {SCHEMA_VERSION}: {rows} фильмов за {time.perf_counter() - started:.2f} с")
+    return rows
+
+def copy_database(source_path, target):
+    """Копирует базу source_path через backup API в подключение target"""
+    source = sqlite3.connect(Path(source_path).resolve().as_uri() + '?mode=ro', uri=True)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+
+def open_snapshot():
+    """Старт прямо со снимком: без DDL и загрузки данных, только проверка версии схемы"""
+    started = time.perf_counter()
+    if Config.SNAPSHOT_MODE == 'memory':
+        # Подключение держит общую базу в памяти, пока жив процесс
+        global _snapshot_keeper
+        _snapshot_keeper = sqlite3.connect(snapshot_uri(), uri=True, check_same_thread=False)
+        copy_database(SNAPSHOT_PATH, _snapshot_keeper)
+    
+    with db_pool.connection(readonly=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA user_version")
+        schema_version = cursor.fetchone()[0]
+        count = (read_counters(cursor) or {}).get('movies', 0)
+    
+    if schema_version != SCHEMA_VERSION:
+        print(f"⚠️  Снимок собран для схемы {schema_version}, нужна {SCHEMA_VERSION}: "
+              f"пересоберите его (python app.py --build-snapshot)")
+    print(f"✅ Снимок {SNAPSHOT_PATH} открыт ({Config.SNAPSHOT_MODE}) за "
+          f"{time.perf_counter() - started:.3f} с: {count} фильмов")
+    return True
+
+_snapshot_keeper = None
+
+def apply_schema(cursor):
+    """Создаёт таблицы, индексы и служебные структуры (все операции идемпотентны)"""
+    # Создаём таблицу movies если её нет, старую приводим к текущей схеме
+    cursor.execute(MOVIES_TABLE_SQL.format(table='movies'))
+    if movies_table_outdated(cursor):
+        migrate_movies_table(cursor)
+    
+    # Создаём индексы
+    create_movie_indexes(cursor)
+    
+    # Полнотекстовый индекс для поиска и подсказок
+    create_search_index(cursor)
+    
+    # Счётчики каталога (число фильмов, версия данных)
+    create_counters(cursor)
     
-    conn.commit()
-    conn.close()
+    # Нормализованные жанры
+    if create_genre_tables(cursor):
+        rebuild_movie_genres(cursor)
+    
+    # Источники в едином формате (для баз, загруженных старыми версиями)
+    if normalize_sources(cursor):
+        bump_data_version(cursor)
+    
+    # Сводная статистика для /api/stats
+    if create_catalog_stats(cursor):
+        refresh_catalog_stats(cursor)
+    
+    # Похожие фильмы
+    create_similar_table(cursor)
+    
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+# Создаём БД при старте если нет
+def init_database():
+    """Создаёт базу данных и таблицы если их нет.
+
+    Если версия схемы в базе совпадает с SCHEMA_VERSION, DDL не выполняется,
+    а если в базе есть фильмы - не ищутся и файлы для загрузки, так что
+    повторный старт стоит пары запросов. Отсутствующая база сначала
+    восстанавливается из снимка SNAPSHOT_PATH, если он есть.
+    """
+    if serving_snapshot():
+        return open_snapshot()
+    
+    # Создаём папки если их нет
+    DB_PATH.parent.mkdir(exist_ok=True)
+    DATA_DIR.mkdir(exist_ok=True)
+    
+    if not DB_PATH.exists() and SNAPSHOT_PATH.exists():
+        print(f"📦 Восстанавливаю базу из снимка {SNAPSHOT_PATH}...")
+        target = sqlite3.connect(DB_PATH)
+        try:
+            copy_database(SNAPSHOT_PATH, target)
+        finally:
+            target.close()
+    
+    # Одно подключение на всю инициализацию
+    conn = db_pool.acquire()
+    cursor = conn.cursor()
+    
+    cursor.execute("PRAGMA user_version")
+    if cursor.fetchone()[0] != SCHEMA_VERSION:
+        apply_schema(cursor)
+        conn.commit()
+    _known_tables.clear()
+    _table_columns.clear()
+    
+    # Проверяем есть ли данные (счётчик ведут триггеры, COUNT(*) не нужен)
+    count = read_counters(cursor)['movies']
+    
+    print(f"📊 Начальное состояние базы: {count} фильмов")
+    
+    if count == 0:
+        print("📦 База данных пуста, ищу данные для загрузки...")
+        
+        # Список возможных файлов с данными
+        possible_files = [
+            # SQL файлы
+            DATA_DIR / 'movies.sql',
+            DATA_DIR / 'database.sql',
+            DATA_DIR / 'data.sql',
+            BASE_DIR.parent / 'movies.sql',
+            BASE_DIR.parent / 'database.sql',
+            BASE_DIR.parent / 'data.sql',
+            DB_PATH.parent / 'movies.sql',
+            
+            # CSV файлы
+            DATA_DIR / 'integrated_movies_with_posters.csv',
+            DATA_DIR / 'integrated_movies.csv',
+            BASE_DIR.parent / 'integrated_movies_with_posters.csv',
+            BASE_DIR.parent / 'integrated_movies.csv',
+        ]
+        
+        data_loaded = False
+        
+        for data_file in possible_files:
+            if data_file.exists():
+                print(f"📁 Найден файл: {data_file}")
+                
+                if data_file.suffix.lower() == '.sql':
+                    print(f"   Загружаю SQL файл...")
+                    stats = load_sql_file(data_file, conn)
+                    if stats and stats['executed']:
+                        data_loaded = True
+                        break
+                
+                elif data_file.suffix.lower() == '.csv':
+                    print(f"   Загружаю CSV файл...")
+                    try:
+                        stats = import_csv_file(conn, data_file)
+                        print(f"✅ Загружено {stats['rows']} фильмов из CSV ({stats['rows_per_sec']} строк/с)")
+                        data_loaded = True
+                        break
+                    except Exception as e:
+                        print(f"❌ Ошибка загрузки CSV: {e}")
+        
+        # Если не нашли файлы данных, создаём тестовые
+        if not data_loaded:
+            print("⚠️  Файлы данных не найдены, создаю тестовую базу...")
+        
+        count = read_counters(cursor)['movies']
+    
+    # Соседи ещё не посчитаны (новая база или обновлённая схема)
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM movie_similar)")
+    similar_ready = cursor.fetchone()[0]
+    db_pool.release(conn)
+    if count and not similar_ready:
+        schedule_similar_refresh()
+    
+    print(f"✅ База данных готова: {count} фильмов")
+    return True
+
+def build_snapshot(target=None):
+    """Собирает снимок базы для быстрого старта других процессов и машин.
+
+    База инициализируется как обычно (с загрузкой данных), затем через
+    backup API копируется во временный файл, переводится из WAL в обычный
+    журнал, сжимается VACUUM и атомарно заменяет прежний снимок.
+    """
+    target = Path(target) if target else SNAPSHOT_PATH
+    if serving_snapshot():
+        print("❌ Сервер настроен работать со снимком (SNAPSHOT_MODE), снимок собирается из основной базы")
+        return None
+    
+    init_database()
+    started = time.perf_counter()
+    tmp_path = target.with_name(target.name + '.tmp')
+    tmp_path.unlink(missing_ok=True)
+    with db_pool.connection() as conn:
+        conn.execute("PRAGMA optimize")
+        snapshot = sqlite3.connect(tmp_path)
+        try:
+            conn.backup(snapshot)
+            snapshot.execute("PRAGMA journal_mode=DELETE")
+            snapshot.execute("VACUUM")
+        finally:
+            snapshot.close()
+    os.replace(tmp_path, target)
+    
+    stats = {
+        'path': str(target),
+        'size_mb': round(target.stat().st_size / (1024 * 1024), 1),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    print(f"✅ Снимок сохранён: {stats['path']} ({stats['size_mb']} МБ за {stats['seconds']} с)")
+    return stats
+
+# Подключение к БД
+class ConnectionPool:
+    """Пул переиспользуемых подключений к SQLite.
+
+    Подключения на чтение (query_only) и на запись хранятся раздельно,
+    каждого вида открывается не больше max_size. Подключение создаётся с
+    check_same_thread=False, потому что между запросами переходит из потока в поток.
+    """
+
+    def __init__(self, db_path, max_size=8, timeout=30.0, uri=False):
+        self.db_path = db_path
+        self.uri = uri
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = {True: queue.LifoQueue(), False: queue.LifoQueue()}
+        self._opened = {True: 0, False: 0}
+        self._lock = threading.Lock()
+        self._stats = {'created': 0, 'reused': 0, 'waits': 0, 'wait_seconds': 0.0, 'in_use': 0}
+
+    def _connect(self, readonly):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False,
+                               factory=metrics.connection_factory(), uri=self.uri)
+        conn.row_factory = sqlite3.Row  # Возвращает словари
+        cursor = conn.cursor()
+        if not readonly and not self.uri:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{int(Config.DB_CACHE_SIZE_KB)}")
+        cursor.execute(f"PRAGMA mmap_size={int(Config.DB_MMAP_SIZE)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if readonly:
+            cursor.execute("PRAGMA query_only=ON")
+        return conn
+
+    def acquire(self, readonly=False):
+        """Берёт свободное подключение, при необходимости открывает новое или ждёт"""
+        started = time.perf_counter()
+        conn = self._acquire(readonly)
+        metrics.pool_wait.observe(time.perf_counter() - started, 'read' if readonly else 'write')
+        return conn
+
+    def _acquire(self, readonly):
+        idle = self._idle[readonly]
+        try:
+            conn = idle.get_nowait()
+            with self._lock:
+                self._stats['reused'] += 1
+                self._stats['in_use'] += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened[readonly] < self.max_size
+            if can_open:
+                self._opened[readonly] += 1
+
+        if can_open:
+            try:
+                conn = self._connect(readonly)
+            except Exception:
+                with self._lock:
+                    self._opened[readonly] -= 1
+                raise
+            with self._lock:
+                self._stats['created'] += 1
+                self._stats['in_use'] += 1
+            return conn
+
+        # Все подключения заняты - ждём, пока какое-нибудь вернут
+        started = time.perf_counter()
+        try:
+            conn = idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError('Нет свободных подключений к базе данных')
+        with self._lock:
+            self._stats['waits'] += 1
+            self._stats['wait_seconds'] += time.perf_counter() - started
+            self._stats['in_use'] += 1
+        return conn
+
+    def release(self, conn, readonly=False):
+        """Возвращает подключение в пул, откатывая незавершённую транзакцию"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Сломанное подключение в пул не возвращаем
+            conn.close()
+            with self._lock:
+                self._opened[readonly] -= 1
+                self._stats['in_use'] -= 1
+            return
+        with self._lock:
+            self._stats['in_use'] -= 1
+        self._idle[readonly].put(conn)
+
+    @contextmanager
+    def connection(self, readonly=False, existing=None):
+        """Контекстный менеджер: подключение из пула (или уже открытое existing)"""
+        if existing is not None:
+            yield existing
+            return
+        conn = self.acquire(readonly)
+        try:
+            yield conn
+        finally:
+            self.release(conn, readonly)
+
+    def close_all(self):
+        """Закрывает все свободные подключения"""
+        for readonly, idle in self._idle.items():
+            while True:
+                try:
+                    conn = idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                with self._lock:
+                    self._opened[readonly] -= 1
+
+    def stats(self):
+        """Статистика пула для /health"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['wait_seconds'] = round(stats['wait_seconds'], 4)
+            stats['open_read'] = self._opened[True]
+            stats['open_write'] = self._opened[False]
+        stats['idle_read'] = self._idle[True].qsize()
+        stats['idle_write'] = self._idle[False].qsize()
+        stats['max_size'] = self.max_size
+        return stats
+
+def serving_snapshot():
+    """Работает ли сервер прямо со снимком (SNAPSHOT_MODE readonly или memory)"""
+    return Config.SNAPSHOT_MODE in ('readonly', 'memory') and SNAPSHOT_PATH.exists()
+
+def snapshot_uri():
+    """URI базы для подключений пула в режиме снимка"""
+    if Config.SNAPSHOT_MODE == 'memory':
+        # Общая для всех подключений процесса база в памяти
+        return 'file:movies_snapshot?mode=memory&cache=shared'
+    # immutable: файл не меняется, SQLite не нужны блокировки и журнал
+    return SNAPSHOT_PATH.resolve().as_uri() + '?mode=ro&immutable=1'
+
+if serving_snapshot():
+    db_pool = ConnectionPool(snapshot_uri(), Config.DB_POOL_SIZE, Config.DB_POOL_TIMEOUT, uri=True)
+else:
+    db_pool = ConnectionPool(DB_PATH, Config.DB_POOL_SIZE, Config.DB_POOL_TIMEOUT)
+
+def get_db_connection(readonly=None):
+    """Возвращает подключение из пула, привязанное к текущему запросу.
+
+    GET/HEAD запросы получают подключение только для чтения. Подключение
+    возвращается в пул в teardown-хуке, закрывать его вручную не нужно.
+    """
+    conn = g.get('db_conn')
+    if conn is None:
+        if readonly is None:
+            readonly = request.method in ('GET', 'HEAD')
+        conn = db_pool.acquire(readonly)
+        g.db_conn = conn
+        g.db_conn_readonly = readonly
+    return conn
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    """Возвращает подключение запроса в пул"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db_pool.release(conn, g.pop('db_conn_readonly', False))
+
+# Фильтрация и пагинация списка фильмов
+MOVIE_LIST_COLUMNS = """id, canonical_key, title, release_year, 
+                   imdb_rating, genre, description, poster_url, 
+                   sources, num_sources,
+                   netflix_id, amazon_id, imdb_id"""
+MOVIE_LIST_FIELDS = [name.strip() for name in MOVIE_LIST_COLUMNS.split(',')]
+
+# Поля сортировки. Индексы SQLite хранят rowid последним ключом, поэтому
+# idx_title, idx_year, idx_rating, idx_sources и idx_weighted_rating фактически (поле, id) и
+# подходят для курсорной пагинации без отдельных составных индексов.
+VALID_SORT_FIELDS = ['title', 'release_year', 'imdb_rating', 'num_sources', 'weighted_rating']
+
+# Платформы (параметр sources и фасет platform) -> условие на строку movies
+PLATFORM_CONDITIONS = {name: f"(source_mask & {bit}) != 0" for name, bit in SOURCE_BITS.items()}
+
+def build_movie_filters(args, cursor):
+    """Собирает FROM и WHERE запроса к movies по параметрам /api/movies.
+
+    Возвращает (from_clause, where_clause, params, fts_query, capped). where_clause
+    пустой или начинается с " AND ", параметры идут в порядке FROM, затем WHERE.
+    capped - поиск с опечатками нашёл больше Config.FUZZY_MAX_RESULTS фильмов
+    и выборка ограничена первыми по релевантности.
+    """
+    from_clause = "movies"
+    where_clause = ""
+    params = []
+    
+    # Поиск: с опечатками (fuzzy=true), через FTS5 индекс, если он есть, иначе через LIKE
+    search = args.get('search', '').strip()
+    fuzzy = bool(search) and fuzzy_requested(args)
+    fts_query = build_fts_query(search) if search and not fuzzy and fts_enabled(cursor) else None
+    
+    capped = False
+    if fuzzy:
+        # Найденные индексом id в порядке релевантности (fuzzy_rank - позиция в списке).
+        # Лишний id показывает, что совпадений больше предела
+        limit = Config.FUZZY_MAX_RESULTS
+        ids = get_fuzzy_index().search_ids(search, limit + 1, extra=bool(Config.FUZZY_EXTRA_FIELDS))
+        capped = len(ids) > limit
+        ids = ids[:limit]
+        from_clause += """
+            JOIN (
+                SELECT key AS fuzzy_rank, value AS fuzzy_id
+                FROM json_each(?)
+            ) AS fuzzy ON fuzzy.fuzzy_id = movies.id
+        """
+        params.append(json.dumps(ids))
+    elif fts_query:
+        # bm25: совпадение в названии важнее жанра, жанр важнее описания
+        from_clause += """
+            JOIN (
+                SELECT rowid AS fts_id, bm25(movies_fts, 10.0, 1.0, 5.0) AS fts_rank
+                FROM movies_fts
+                WHERE movies_fts MATCH ?
+            ) AS fts ON fts.fts_id = movies.id
+        """
+        params.append(fts_query)
+    elif search:
+        where_clause += " AND (title LIKE ? OR description LIKE ? OR genre LIKE ?)"
+        search_term = f"%{search}%"
+        params.extend([search_term, search_term, search_term])
+    
+    genres, genre_mode = parse_genre_filter(args)
+    if genres and has_table(cursor, 'movie_genres'):
+        # Индексный поиск по movie_genres вместо LIKE по строке жанров
+        placeholders = ','.join('?' * len(genres))
+        where_clause += f"""
+            AND id IN (
+                SELECT mg.movie_id
+                FROM movie_genres mg
+                JOIN genres g ON g.id = mg.genre_id
+                WHERE g.name IN ({placeholders})
+        """
+        params.extend(genres)
+        if genre_mode == 'and' and len(genres) > 1:
+            where_clause += " GROUP BY mg.movie_id HAVING COUNT(*) = ?"
+            params.append(len(genres))
+        where_clause += ")"
+    elif genres:
+        joiner = " AND " if genre_mode == 'and' else " OR "
+        where_clause += " AND (" + joiner.join(["genre LIKE ?"] * len(genres)) + ")"
+        params.extend(f"%{name}%" for name in genres)
+    
+    year_from = args.get('year_from', '').strip()
+    if year_from:
+        where_clause += " AND release_year >= ?"
+        params.append(int(year_from))
+    
+    year_to = args.get('year_to', '').strip()
+    if year_to:
+        where_clause += " AND release_year <= ?"
+        params.append(int(year_to))
+    
+    min_rating = args.get('min_rating', '').strip()
+    if min_rating:
+        where_clause += " AND imdb_rating >= ?"
+        params.append(float(min_rating))
+    
+    # Фильтр по платформам
+    platforms = sorted(set(args.getlist('sources')))
+    if platforms:
+        platform_conditions = [PLATFORM_CONDITIONS[platform] for platform in platforms
+                               if platform in PLATFORM_CONDITIONS]
+        
+        if platform_conditions:
+            # Для фильтров платформ параметры не нужны
+            where_clause += " AND (" + " OR ".join(platform_conditions) + ")"
+    
+    return from_clause, where_clause, params, fts_query, capped
+
+# Фасеты /api/movies (facets=genre,year,platform,rating_bucket): те же виды, что в catalog_stats
+MOVIE_FACETS = ['genre', 'year', 'platform', 'rating_bucket']
+
+def parse_facets(value):
+    """Список фасетов из параметра facets= (ValueError для неизвестных)"""
+    names = list(dict.fromkeys(name.strip() for name in (value or '').split(',') if name.strip()))
+    unknown = [name for name in names if name not in MOVIE_FACETS]
+    if unknown:
+        raise ValueError(f"Неизвестные фасеты: {', '.join(unknown)}. Доступны: {', '.join(MOVIE_FACETS)}")
+    return names
+
+def sort_facets(counts):
+    """{фасет: {значение: количество}} -> {фасет: [{value, count}]} в порядке для фильтров.
+
+    Жанры - по убыванию количества, годы и корзины рейтинга - по убыванию
+    значения, платформы - в порядке PLATFORM_CONDITIONS.
+    """
+    facets = {}
+    for name, values in counts.items():
+        items = [(value, count) for value, count in values.items() if count]
+        if name == 'genre':
+            items.sort(key=lambda item: (-item[1], item[0]))
+        elif name == 'platform':
+            items.sort(key=lambda item: list(PLATFORM_CONDITIONS).index(item[0]))
+        else:
+            items.sort(key=lambda item: item[0], reverse=True)
+        facets[name] = [{'value': value, 'count': count} for value, count in items]
+    return facets
+
+def count_facets(cursor, from_clause, where_clause, params, names):
+    """Количество фильмов по значениям фасетов под текущим фильтром.
+
+    Без фильтров ответ берётся из catalog_stats. С фильтрами выборка
+    материализуется один раз (WITH ... AS MATERIALIZED), и каждый фасет -
+    GROUP BY по ней в том же запросе: LIKE, FTS и жанровые условия
+    выполняются один раз, сколько бы фасетов ни запросили.
+    """
+    counts = {name: {} for name in names}
+    if from_clause == 'movies' and not where_clause and has_table(cursor, 'catalog_stats'):
+        stats = read_catalog_stats(cursor)
+        for name in names:
+            for key, (count, _) in stats.get(name, {}).items():
+                counts[name][int(key) if name in ('year', 'rating_bucket') else key] = count
+        return sort_facets(counts)
+    
+    parts = []
+    if 'genre' in names and has_table(cursor, 'movie_genres'):
+        parts.append("""
+            SELECT 'genre', g.name, COUNT(*)
+            FROM filtered
+            JOIN movie_genres mg ON mg.movie_id = filtered.id
+            JOIN genres g ON g.id = mg.genre_id
+            GROUP BY mg.genre_id
+        """)
+    if 'year' in names:
+        parts.append("""
+            SELECT 'year', release_year, COUNT(*) FROM filtered
+            WHERE release_year IS NOT NULL GROUP BY release_year
+        """)
+    if 'rating_bucket' in names:
+        # Корзины как в catalog_stats: целая часть рейтинга, 10 - "10 и выше"
+        parts.append("""
+            SELECT 'rating_bucket', MIN(CAST(imdb_rating AS INTEGER), 10), COUNT(*) FROM filtered
+            WHERE imdb_rating IS NOT NULL GROUP BY MIN(CAST(imdb_rating AS INTEGER), 10)
+        """)
+    if 'platform' in names:
+        for platform, condition in PLATFORM_CONDITIONS.items():
+            parts.append(f"SELECT 'platform', '{platform}', COUNT(*) FROM filtered WHERE {condition}")
+    if not parts:
+        return sort_facets(counts)
+    
+    cursor.execute(f"""
+        WITH filtered AS MATERIALIZED (
+            SELECT movies.id AS id, release_year, imdb_rating, source_mask
+            FROM {from_clause}
+            WHERE 1=1{where_clause}
+        )
+        {' UNION ALL '.join(parts)}
+    """, params)
+    for name, value, count in cursor.fetchall():
+        counts[name][value] = count
+    return sort_facets(counts)
+
+def encode_cursor(sort_by, sort_order, value, movie_id):
+    """Кодирует позицию последнего фильма страницы в непрозрачный курсор"""
+    raw = json.dumps([sort_by, sort_order, value, movie_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, sort_by, sort_order):
+    """Разбирает курсор. Возвращает (значение, id) или None для первой страницы.
+
+    Курсор, выданный для другой сортировки, считается некорректным (ValueError).
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        cursor_sort_by, cursor_order, value, movie_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Некорректный курсор')
+    if cursor_sort_by != sort_by or cursor_order != sort_order or not isinstance(movie_id, int):
+        raise ValueError('Курсор не соответствует параметрам сортировки')
+    return value, movie_id
+
+def fetch_keyset_page(cursor, from_clause, where_clause, params, sort_by, sort_order, after, limit,
+                      columns=MOVIE_LIST_COLUMNS):
+    """Читает до limit фильмов после позиции after без OFFSET.
+
+    NULL в SQLite меньше любого значения: при DESC такие фильмы идут после
+    остальных, при ASC - перед ними. Поэтому выборка делится на сегменты
+    "NULL" и "не NULL", и каждый читается диапазоном по индексу (sort_by, id).
+    """
+    op = '<' if sort_order == 'DESC' else '>'
+    segments = ['not_null', 'null'] if sort_order == 'DESC' else ['null', 'not_null']
+    if after is not None:
+        segments = segments[segments.index('null' if after[0] is None else 'not_null'):]
+    
+    rows = []
+    for segment in segments:
+        segment_params = []
+        if segment == 'null':
+            condition = f" AND {sort_by} IS NULL"
+            if after is not None and after[0] is None:
+                condition += f" AND id {op} ?"
+                segment_params.append(after[1])
+        else:
+            condition = f" AND {sort_by} IS NOT NULL"
+            if after is not None and after[0] is not None:
+                condition += f" AND ({sort_by}, id) {op} (?, ?)"
+                segment_params.extend(after)
+        
+        query = f"""
+            SELECT {columns}
+            FROM {from_clause}
+            WHERE 1=1{where_clause}{condition}
+            ORDER BY {sort_by} {sort_order}, id {sort_order}
+            LIMIT ?
+        """
+        cursor.execute(query, params + segment_params + [limit - len(rows)])
+        rows.extend(cursor.fetchall())
+        if len(rows) >= limit:
+            break
+    return rows
+
+# Колоночный каталог в памяти (Config.CATALOG_ENGINE = 'memory')
+# (версия данных, движок или None, если построить не удалось)
+_catalog_engine = (None, None)
+_catalog_engine_lock = threading.Lock()
+
+def get_catalog_engine(cursor):
+    """Возвращает каталог в памяти для текущей версии данных или None.
+
+    Каталог перестраивается, когда загрузчики увеличивают data_version.
+    """
+    global _catalog_engine
+    # NumPy импортируется только здесь: без CATALOG_ENGINE=memory старт процесса его не ждёт
+    try:
+        from catalog_engine import CatalogEngine, UnsupportedQuery
+    except ImportError:  # NumPy не установлен - доступен только SQL
+        return None
+    counters = read_counters(cursor)
+    if counters is None:
+        return None
+    version = counters['data_version']
+    
+    if _catalog_engine[0] != version:
+        with _catalog_engine_lock:
+            if _catalog_engine[0] != version:
+                try:
+                    engine = CatalogEngine.from_connection(cursor.connection, version)
+                except UnsupportedQuery as e:
+                    print(f"⚠️  Каталог в памяти недоступен: {e}")
+                    engine = None
+                _catalog_engine = (version, engine)
+    return _catalog_engine[1]
+
+# Индекс подсказок поиска в памяти (Config.SUGGEST_INDEX)
+# (версия данных, индекс)
+_suggest_index = (None, None)
+_suggest_index_lock = threading.Lock()
+
+def get_suggest_index():
+    """Возвращает индекс подсказок для текущей версии данных (перестраивает при смене версии).
+
+    Версия берётся из current_data_version, поэтому на попадание в готовый
+    индекс база не нужна.
+    """
+    global _suggest_index
+    version = current_data_version()
+    if _suggest_index[0] != version:
+        with _suggest_index_lock:
+            if _suggest_index[0] != version:
+                started = time.perf_counter()
+                with db_pool.connection(readonly=True) as conn:
+                    index = SuggestIndex.from_connection(conn, version)
+                print(f"🔤 Индекс подсказок: {len(index)} фильмов за {time.perf_counter() - started:.2f} с")
+                _suggest_index = (version, index)
+    return _suggest_index[1]
+
+# N-граммный индекс для поиска с опечатками (fuzzy=true)
+# (версия данных, индекс)
+_fuzzy_index = (None, None)
+_fuzzy_index_lock = threading.Lock()
+
+def fuzzy_requested(args):
+    """Включён ли поиск с опечатками параметром fuzzy"""
+    return Config.FUZZY_SEARCH and args.get('fuzzy', '').lower() in ('true', '1', 'yes')
+
+def get_fuzzy_index():
+    """Возвращает n-граммный индекс для текущей версии данных (как get_suggest_index)"""
+    global _fuzzy_index
+    version = current_data_version()
+    if _fuzzy_index[0] != version:
+        with _fuzzy_index_lock:
+            if _fuzzy_index[0] != version:
+                started = time.perf_counter()
+                with db_pool.connection(readonly=True) as conn:
+                    extra_columns = [name for name in Config.FUZZY_EXTRA_FIELDS
+                                     if name in table_columns(conn.cursor(), 'movies')]
+                    index = FuzzyIndex.from_connection(conn, version, extra_columns)
+                print(f"🔤 Индекс опечаток: {len(index.words)} слов за {time.perf_counter() - started:.2f} с")
+                _fuzzy_index = (version, index)
+    return _fuzzy_index[1]
+
+# Кэш ответов read-only эндпоинтов с ETag
+# Версия данных читается из БД не чаще раза в DATA_VERSION_CHECK_INTERVAL секунд,
+# чтобы попадание в кэш не требовало запросов к базе. Загрузка в этом же
+# процессе сбрасывает её сразу, в других воркерах - не позже чем через интервал.
+_data_version = {'value': 0, 'checked': None}
+_data_version_lock = threading.Lock()
+
+def current_data_version():
+    """Версия данных каталога (catalog_counters.data_version) с коротким кэшированием"""
+    checked = _data_version['checked']
+    if checked is not None and time.monotonic() - checked < Config.DATA_VERSION_CHECK_INTERVAL:
+        return _data_version['value']
+    with _data_version_lock:
+        with db_pool.connection(readonly=True) as conn:
+            counters = read_counters(conn.cursor())
+        _data_version['value'] = counters['data_version'] if counters else 0
+        _data_version['checked'] = time.monotonic()
+        return _data_version['value']
+
+class ResponseCache:
+    """LRU кэш готовых тел ответов с ограничением по числу записей и времени жизни"""
+
+    def __init__(self, max_size=256, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def put(self, key, body, etag):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), body, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+_response_cache = ResponseCache(Config.RESPONSE_CACHE_SIZE, Config.RESPONSE_CACHE_TTL)
+
+def make_etag(body):
+    """Сильный ETag по содержимому ответа"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(etag):
+    """Совпадает ли ETag с заголовком If-None-Match запроса"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    candidates = [strip_etag_encoding(value.strip()) for value in header.split(',')]
+    return '*' in candidates or etag in candidates
+
+# Форматы тела ответа API по заголовку Accept
+RESPONSE_MIMETYPES = ['application/json', 'application/msgpack', 'application/x-msgpack']
+
+def response_format():
+    """MIME тип ответа, выбранный по Accept (msgpack - только если установлен)"""
+    if msgpack is None:
+        return 'application/json'
+    best = request.accept_mimetypes.best_match(RESPONSE_MIMETYPES, default='application/json')
+    return 'application/msgpack' if best != 'application/json' else best
+
+def api_response(data, status=200):
+    """Сериализует ответ API в JSON (orjson, если есть) или MessagePack по Accept"""
+    mimetype = response_format()
+    if mimetype == 'application/msgpack':
+        body = msgpack.packb(data, use_bin_type=True)
+    elif orjson is not None:
+        body = orjson.dumps(data)
+    else:
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    response = app.response_class(body, status=status, mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+def cached_response(view):
+    """Кэширует успешные JSON ответы GET эндпоинта и отвечает 304 по If-None-Match.
+
+    Ключ - путь, отсортированные параметры запроса и версия данных, так что
+    после загрузки данных старые записи просто перестают находиться.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        mimetype = response_format()
+        key = (
+            request.path,
+            tuple(sorted(request.args.items(multi=True))),
+            mimetype,
+            current_data_version()
+        )
+        
+        cached = _response_cache.get(key)
+        if cached is not None:
+            body, etag = cached
+            cache_status = 'HIT'
+        else:
+            result = view(*args, **kwargs)
+            response = app.make_response(result)
+            if response.status_code != 200 or response.mimetype != mimetype:
+                return response
+            body = response.get_data()
+            etag = make_etag(body)
+            _response_cache.put(key, body, etag)
+            cache_status = 'MISS'
+        
+        if etag_matches(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(body, status=200, mimetype=mimetype)
+        response.vary.add('Accept')
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = f'public, max-age={Config.RESPONSE_CACHE_MAX_AGE}'
+        response.headers['X-Cache'] = cache_status
+        return response
+    return wrapper
+
+# Метрики запросов и профилирование (metrics.py). Хук after_request
+# объявлен раньше сжатия, поэтому выполняется после него и видит итоговый размер
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    if Config.PROFILING_ENABLED and request.headers.get('X-Profile'):
+        # None, если сейчас профилируется другой запрос
+        g.request_profile = metrics.RequestProfile.start()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.http_duration.observe(time.perf_counter() - started, route, request.method, response.status_code)
+    if not response.is_streamed and not response.direct_passthrough:
+        metrics.http_response_size.observe(response.calculate_content_length() or 0, route)
     
-    # Проверяем есть ли данные
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM movies")
-    count = cursor.fetchone()[0]
-    conn.close()
+    if 'request_profile' in g:
+        profile = g.pop('request_profile')
+        if profile is None:
+            response.headers['X-Profile-Skipped'] = 'busy'
+        else:
+            profile_id, elapsed_ms, top = profile.finish(f'{request.method} {request.full_path}')
+            response.headers['X-Profile-Id'] = profile_id
+            response.headers['X-Profile-Time-Ms'] = f'{elapsed_ms:.2f}'
+            response.headers['X-Profile-Top'] = top
+    return response
+
+@app.teardown_request
+def stop_request_profile(error=None):
+    # Профиль, до которого after_request не дошёл, не должен держать профайлер
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        profile.stop()
+
+# Сжатие ответов (gzip, brotli). Сжатые тела кэшируются по (ETag, кодировка),
+# так что ответ из кэша не сжимается заново
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/msgpack', 'text/html', 'text/css',
+    'text/javascript', 'application/javascript', 'text/plain',
+}
+_compressed_cache = ResponseCache(Config.RESPONSE_CACHE_SIZE, Config.RESPONSE_CACHE_TTL)
+
+def strip_etag_encoding(etag):
+    """"abc-gzip" -> "abc": ETag сжатого варианта сводится к исходному"""
+    for encoding in ('gzip', 'br'):
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+def choose_encoding():
+    """Лучшая поддерживаемая кодировка из Accept-Encoding или None"""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+def compress_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=Config.COMPRESS_LEVEL)
+    return gzip.compress(body, compresslevel=Config.COMPRESS_LEVEL)
+
+@app.after_request
+def compress_response(response):
+    """Сжимает ответы API, если клиент это поддерживает.
+
+    У сжатого варианта свой ETag ("...-gzip"), If-None-Match с ним тоже
+    даёт 304. Потоковые ответы и файлы не трогаются.
+    """
+    if (not Config.RESPONSE_COMPRESSION or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    etag = response.headers.get('ETag')
     
-    print(f"📊 Начальное состояние базы: {count} фильмов")
+    if response.status_code == 304:
+        # Повторяем ETag того варианта, который клиент прислал
+        if encoding and etag and etag[:-1] + f'-{encoding}"' in request.headers.get('If-None-Match', ''):
+            response.headers['ETag'] = etag[:-1] + f'-{encoding}"'
+        return response
     
-    if count == 0:
-        print("📦 База данных пуста, ищу данные для загрузки...")
-        
-        # Список возможных файлов с данными
-        possible_files = [
-            # SQL файлы
-            DATA_DIR / 'movies.sql',
-            DATA_DIR / 'database.sql',
-            DATA_DIR / 'data.sql',
-            BASE_DIR.parent / 'movies.sql',
-            BASE_DIR.parent / 'database.sql',
-            BASE_DIR.parent / 'data.sql',
-            
-            # CSV файлы
-            DATA_DIR / 'integrated_movies_with_posters.csv',
-            DATA_DIR / 'integrated_movies.csv',
-            BASE_DIR.parent / 'integrated_movies_with_posters.csv',
-            BASE_DIR.parent / 'integrated_movies.csv',
-        ]
-        
-        data_loaded = False
-        
-        for data_file in possible_files:
-            if data_file.exists():
-                print(f"📁 Найден файл: {data_file}")
-                
-                if data_file.suffix.lower() == '.sql':
-                    print(f"   Загружаю SQL файл...")
-                    if load_sql_file(data_file):
-                        data_loaded = True
-                        break
-                
-                elif data_file.suffix.lower() == '.csv':
-                    print(f"   Загружаю CSV файл...")
-                    try:
-                        df = pd.read_csv(data_file, encoding='utf-8-sig')
-                        conn = sqlite3.connect(DB_PATH)
-                        df.to_sql('movies', conn, if_exists='append', index=False)
-                        conn.commit()
-                        conn.close()
-                        print(f"✅ Загружено {len(df)} фильмов из CSV")
-                        data_loaded = True
-                        break
-                    except Exception as e:
-                        print(f"❌ Ошибка загрузки CSV: {e}")
-        
-        # Если не нашли файлы данных, создаём тестовые
-        if not data_loaded:
-            print("⚠️  Файлы данных не найдены, создаю тестовую базу...")
-            
+    if encoding is None or response.status_code != 200:
+        return response
+    body = response.get_data()
+    if len(body) < Config.COMPRESS_MIN_SIZE:
+        return response
     
-    # Проверяем финальное количество
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM movies")
-    final_count = cursor.fetchone()[0]
-    conn.close()
+    cached = _compressed_cache.get((etag, encoding)) if etag else None
+    if cached is not None:
+        compressed = cached[0]
+    else:
+        compressed = compress_body(body, encoding)
+        if etag:
+            _compressed_cache.put((etag, encoding), compressed, etag)
     
-    print(f"✅ База данных готова: {final_count} фильмов")
-    return True
-
-# Подключение к БД
-def get_db_connection():
-    """Создаёт подключение к БД"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # Возвращает словари
-    return conn
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        response.headers['ETag'] = etag[:-1] + f'-{encoding}"'
+    return response
 
 # API Роуты
 @app.route('/api/movies', methods=['GET'])
 # Более надёжный способ создания COUNT запроса
+@cached_response
 def get_movies():
-    """Получить все фильмы с пагинацией и фильтрацией"""
+    """Получить все фильмы с пагинацией и фильтрацией
+
+    С параметром cursor страницы читаются по индексу (sort_by, id), поэтому
+    сортировка по релевантности в этом режиме недоступна: по умолчанию
+    используется imdb_rating даже при поиске, а явный sort_by=relevance
+    вместе с cursor отклоняется ответом 400.
+    """
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -197,154 +1936,164 @@ def get_movies():
         per_page = int(request.args.get('per_page', 20))
         offset = (page - 1) * per_page
         
-        # Базовый запрос для данных
-        query = """
-            SELECT id, canonical_key, title, release_year, 
-                   imdb_rating, genre, description, poster_url, 
-                   sources, num_sources,
-                   netflix_id, amazon_id, imdb_id
-            FROM movies 
-            WHERE 1=1
-        """
-        
-        # Базовый запрос для подсчёта
-        count_query = """
-            SELECT COUNT(*) as total
-            FROM movies 
-            WHERE 1=1
-        """
-        
-        params = []
-        count_params = []
-        
-        # Фильтры
-        search = request.args.get('search', '').strip()
-        if search:
-            where_clause = " AND (title LIKE ? OR description LIKE ? OR genre LIKE ?)"
-            search_term = f"%{search}%"
-            query += where_clause
-            count_query += where_clause
-            params.extend([search_term, search_term, search_term])
-            count_params.extend([search_term, search_term, search_term])
-        
-        genre = request.args.get('genre', '').strip()
-        if genre:
-            where_clause = " AND genre LIKE ?"
-            query += where_clause
-            count_query += where_clause
-            params.append(f"%{genre}%")
-            count_params.append(f"%{genre}%")
-        
-        year_from = request.args.get('year_from', '').strip()
-        if year_from:
-            where_clause = " AND release_year >= ?"
-            query += where_clause
-            count_query += where_clause
-            params.append(int(year_from))
-            count_params.append(int(year_from))
-        
-        year_to = request.args.get('year_to', '').strip()
-        if year_to:
-            where_clause = " AND release_year <= ?"
-            query += where_clause
-            count_query += where_clause
-            params.append(int(year_to))
-            count_params.append(int(year_to))
-        
-        min_rating = request.args.get('min_rating', '').strip()
-        if min_rating:
-            where_clause = " AND imdb_rating >= ?"
-            query += where_clause
-            count_query += where_clause
-            params.append(float(min_rating))
-            count_params.append(float(min_rating))
-        
-        # Фильтр по платформам
-        platforms = request.args.getlist('sources')
-        if platforms:
-            platform_conditions = []
-            for platform in platforms:
-                if platform == 'netflix':
-                    platform_conditions.append("netflix_id IS NOT NULL AND netflix_id != ''")
-                elif platform == 'amazon':
-                    platform_conditions.append("amazon_id IS NOT NULL AND amazon_id != ''")
-                elif platform == 'imdb':
-                    platform_conditions.append("poster_url IS NOT NULL AND poster_url != ''")
-            
-            if platform_conditions:
-                where_clause = " AND (" + " OR ".join(platform_conditions) + ")"
-                query += where_clause
-                count_query += where_clause
-                # Для фильтров платформ параметры не нужны
-        
-        # Получаем общее количество
-        print(f"🔍 COUNT Query: {count_query}")
-        print(f"🔍 COUNT Params: {count_params}")
-        
-        cursor.execute(count_query, count_params)
-        result = cursor.fetchone()
-        
-        # Исправляем получение значения total
-        if result and len(result) > 0:
-            total = result[0]  # Получаем по индексу
-        else:
-            total = 0
+        # Фильтры (поиск, жанр, годы, рейтинг, платформы)
+        from_clause, where_clause, params, fts_query, search_capped = build_movie_filters(request.args, cursor)
         
         # Сортировка
-        sort_by = request.args.get('sort_by', 'imdb_rating')
-        sort_order = request.args.get('sort_order', 'DESC')
-        
-        valid_sort_fields = ['title', 'release_year', 'imdb_rating', 'num_sources']
-        if sort_by in valid_sort_fields:
-            query += f" ORDER BY {sort_by} {sort_order}"
+        fuzzy = fuzzy_requested(request.args) and bool(request.args.get('search', '').strip())
+        use_cursor = 'cursor' in request.args
+        if use_cursor:
+            sort_by = request.args.get('sort_by', 'imdb_rating')
         else:
-            query += " ORDER BY imdb_rating DESC"
+            sort_by = request.args.get('sort_by', 'relevance' if fts_query or fuzzy else 'imdb_rating')
+        sort_order = request.args.get('sort_order', 'DESC').upper()
+        if sort_order not in ('ASC', 'DESC'):
+            sort_order = 'DESC'
+        
+        # Какие колонки читать: fields= или стандартный набор для списка.
+        # id и поле сортировки читаются всегда (нужны каталогу и курсору)
+        try:
+            fields = parse_fields(request.args.get('fields'), cursor, MOVIE_LIST_FIELDS)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        select_fields = list(fields)
+        for name in ('id', sort_by if sort_by in VALID_SORT_FIELDS else 'imdb_rating'):
+            if name not in select_fields:
+                select_fields.append(name)
+        select_columns = ', '.join(select_fields)
+        try:
+            facet_names = parse_facets(request.args.get('facets'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         
-        # Пагинация
-        query += " LIMIT ? OFFSET ?"
-        params.extend([per_page, offset])
+        # Колоночный каталог в памяти отвечает на фильтры без поиска,
+        # поиск и курсорная пагинация всегда идут через SQLite
+        engine_page = None
+        if (Config.CATALOG_ENGINE == 'memory' and 'cursor' not in request.args
+                and not request.args.get('search', '').strip()):
+            engine = get_catalog_engine(cursor)
+            if engine is not None:
+                from catalog_engine import UnsupportedQuery
+                try:
+                    engine_page = engine.query(request.args, sort_by, sort_order, offset, per_page)
+                except UnsupportedQuery:
+                    engine_page = None
         
-        print(f"🔍 Main Query: {query}")
-        print(f"🔍 Main Params: {params}")
+        # Общее количество: точное (из счётчика или кэша), оценка или не нужно
+        include_total = request.args.get('include_total', 'true').lower()
+        if include_total in ('false', '0', 'no'):
+            total, total_exact = None, False
+        elif engine_page is not None:
+            total, total_exact = engine_page[0], True
+        else:
+            mode = 'estimate' if include_total == 'estimate' else 'exact'
+            total, total_exact = count_movies(cursor, from_clause, where_clause, params, mode)
         
-        # Выполняем запрос
-        cursor.execute(query, params)
-        movies = [dict(row) for row in cursor.fetchall()]
+        response = {
+            'success': True,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': max(1, (total + per_page - 1) // per_page) if total is not None else None
+        }
+        if include_total == 'estimate':
+            response['total_is_estimate'] = not total_exact
+        if fuzzy:
+            # Поиск с опечатками возвращает не больше FUZZY_MAX_RESULTS фильмов:
+            # при total_capped total - число показанных, а не всех совпадений
+            response['total_capped'] = search_capped
+            response['max_results'] = Config.FUZZY_MAX_RESULTS
         
-        conn.close()
+        # Фасеты считаются по той же выборке, что и список (без учёта страницы)
+        if facet_names:
+            if engine_page is not None:
+                response['facets'] = sort_facets(engine.facet_counts(request.args, facet_names))
+            else:
+                response['facets'] = count_facets(cursor, from_clause, where_clause, params, facet_names)
         
-        # Форматируем источники
-        for movie in movies:
-            if movie.get('sources'):
-                movie['sources'] = movie['sources'].split(',')
+        if use_cursor:
+            # Курсорная пагинация: страница читается диапазоном по индексу (sort_by, id)
+            if sort_by == 'relevance':
+                return jsonify({
+                    'success': False,
+                    'error': 'Сортировка по релевантности не поддерживает cursor'
+                }), 400
+            if sort_by not in VALID_SORT_FIELDS:
+                sort_by = 'imdb_rating'
+            try:
+                after = decode_cursor(request.args.get('cursor', ''), sort_by, sort_order)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+            
+            rows = fetch_keyset_page(cursor, from_clause, where_clause, params,
+                                     sort_by, sort_order, after, per_page + 1, select_columns)
+            movies = [dict(row) for row in rows[:per_page]]
+            
+            next_cursor = None
+            if len(rows) > per_page:
+                last = movies[-1]
+                next_cursor = encode_cursor(sort_by, sort_order, last[sort_by], last['id'])
+            response['next_cursor'] = next_cursor
+            response['has_more'] = next_cursor is not None
+        elif engine_page is not None:
+            # Страницу выбрал каталог в памяти, строки читаем по первичному ключу
+            page_ids = engine_page[1]
+            movies = []
+            if page_ids:
+                placeholders = ','.join('?' * len(page_ids))
+                cursor.execute(f"SELECT {select_columns} FROM movies WHERE id IN ({placeholders})", page_ids)
+                rows_by_id = {row['id']: row for row in cursor.fetchall()}
+                movies = [dict(rows_by_id[movie_id]) for movie_id in page_ids if movie_id in rows_by_id]
+            response['has_more'] = engine_page[2]
+        else:
+            query = f"""
+                SELECT {select_columns}
+                FROM {from_clause}
+                WHERE 1=1{where_clause}
+            """
+            
+            if sort_by == 'relevance' and fts_query:
+                # Релевантность bm25 (чем меньше, тем лучше) усиливаем рейтингом IMDb
+                query += " ORDER BY fts.fts_rank * (1.0 + MIN(COALESCE(imdb_rating, 0), 10) / 10.0), id"
+            elif sort_by == 'relevance' and fuzzy:
+                # Меньше опечаток, затем выше рейтинг - порядок уже задан индексом
+                query += " ORDER BY fuzzy.fuzzy_rank"
+            elif sort_by in VALID_SORT_FIELDS:
+                query += f" ORDER BY {sort_by} {sort_order}, id {sort_order}"
             else:
-                # Определяем источники по наличию данных
-                sources = []
-                if movie.get('netflix_id'):
-                    sources.append('netflix')
-                if movie.get('amazon_id'):
-                    sources.append('amazon')
-                if movie.get('poster_url'):
-                    sources.append('imdb')
-                movie['sources'] = sources
-                movie['num_sources'] = len(sources) or 1
+                query += " ORDER BY imdb_rating DESC, id DESC"
             
-            # Гарантируем наличие постера
-            if not movie.get('poster_url'):
-                movie['poster_url'] = 'https://via.placeholder.com/300x450/667eea/ffffff?text=Постер+не+найден'
+            # Пагинация (лишняя строка показывает, есть ли следующая страница)
+            query += " LIMIT ? OFFSET ?"
+            params.extend([per_page + 1, offset])
             
-            # Гарантируем наличие рейтинга
-            if movie.get('imdb_rating') is None:
+            # Выполняем запрос
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            movies = [dict(row) for row in rows[:per_page]]
+            response['has_more'] = len(rows) > per_page
+        
+        # Источники уже нормализованы при загрузке (normalize_sources),
+        # здесь остаются готовый список из sources_list, заглушка постера и рейтинг по умолчанию
+        extra_fields = len(select_fields) != len(fields)
+        for i, movie in enumerate(movies):
+            format_movie(movie)
+            if movie.get('imdb_rating', 0) is None:
                 movie['imdb_rating'] = 0
+            if extra_fields:
+                movies[i] = {name: movie[name] for name in fields}
         
-        return jsonify({
-            'success': True,
-            'movies': movies,
-            'total': total,
-            'page': page,
-            'per_page': per_page,
-            'total_pages': max(1, (total + per_page - 1) // per_page)
-        })
+        response['movies'] = movies
+        return api_response(response)
     
     except Exception as e:
         print(f"❌ Ошибка в get_movies: {e}")
@@ -354,6 +2103,31 @@ def get_movies():
             'success': False,
             'error': str(e)
         }), 500
+PLACEHOLDER_POSTER = '/api/posters/placeholder'
+
+@lru_cache(maxsize=64)
+def sources_list(sources):
+    """Список платформ из movies.sources ("netflix,imdb").
+
+    Строка уже нормализована при загрузке (normalize_sources), а различных
+    значений всего несколько, поэтому каждое разбирается один раз на процесс.
+    """
+    return tuple(sources.split(',')) if sources else ()
+
+def format_movie(movie):
+    """Приводит строку фильма к виду API: sources списком, постер всегда есть.
+
+    Работает и с неполным набором колонок (fields=) - трогает только
+    присутствующие поля.
+    """
+    if 'sources' in movie:
+        movie['sources'] = sources_list(movie['sources'])
+
+    # Гарантируем наличие постера
+    if 'poster_url' in movie and not movie['poster_url']:
+        movie['poster_url'] = PLACEHOLDER_POSTER
+    return movie
+
 @app.route('/api/movies/<int:movie_id>', methods=['GET'])
 def get_movie(movie_id):
     """Получить детальную информацию о фильме"""
@@ -367,31 +2141,10 @@ def get_movie(movie_id):
         cursor.execute(query, (movie_id,))
         movie = cursor.fetchone()
         
-        conn.close()
-        
         if movie:
-            movie_dict = dict(movie)
-            
-            # Форматируем источники
-            if movie_dict.get('sources'):
-                movie_dict['sources'] = movie_dict['sources'].split(',')
-            else:
-                sources = []
-                if movie_dict.get('netflix_id'):
-                    sources.append('netflix')
-                if movie_dict.get('amazon_id'):
-                    sources.append('amazon')
-                if movie_dict.get('poster_url'):
-                    sources.append('imdb')
-                movie_dict['sources'] = sources
-            
-            # Гарантируем наличие постера
-            if not movie_dict.get('poster_url'):
-                movie_dict['poster_url'] = 'https://via.placeholder.com/300x450/667eea/ffffff?text=Постер+не+найден'
-            
             return jsonify({
                 'success': True,
-                'movie': movie_dict
+                'movie': format_movie(dict(movie))
             })
         else:
             return jsonify({
@@ -405,30 +2158,286 @@ def get_movie(movie_id):
             'error': str(e)
         }), 500
 
+@app.route('/api/movies/<int:movie_id>/similar', methods=['GET'])
+def get_similar_movies(movie_id):
+    """Похожие фильмы: соседи по TF-IDF описания, жанров, актёров и режиссёров (similar.py).
+
+    Соседи считаются заранее при загрузке данных, здесь только чтение по
+    первичному ключу movie_similar. ready=false - для фильма ещё не посчитано.
+    """
+    try:
+        limit = max(1, min(int(request.args.get('limit', Config.SIMILAR_TOP_K)), Config.SIMILAR_TOP_K))
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        try:
+            fields = parse_fields(request.args.get('fields'), cursor, MOVIE_LIST_FIELDS)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        cursor.execute("SELECT 1 FROM movies WHERE id = ?", (movie_id,))
+        if cursor.fetchone() is None:
+            return jsonify({
+                'success': False,
+                'error': 'Фильм не найден'
+            }), 404
+        
+        select_columns = ', '.join(f"movies.{name}" for name in fields)
+        cursor.execute(f"""
+            SELECT {select_columns}, s.score AS similarity
+            FROM movie_similar s
+            JOIN movies ON movies.id = s.similar_id
+            WHERE s.movie_id = ?
+            ORDER BY s.rank
+            LIMIT ?
+        """, (movie_id, limit))
+        movies = []
+        for row in cursor.fetchall():
+            movie = format_movie(dict(row))
+            similar = {name: movie[name] for name in fields}
+            similar['similarity'] = row['similarity']
+            movies.append(similar)
+        
+        return api_response({
+            'success': True,
+            'movie_id': movie_id,
+            'ready': bool(movies),
+            'movies': movies
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# Кэш постеров (posters.py), создаётся при первом обращении
+_poster_cache = None
+_poster_cache_lock = threading.Lock()
+
+def get_poster_cache():
+    global _poster_cache
+    if _poster_cache is None:
+        with _poster_cache_lock:
+            if _poster_cache is None:
+                from posters import PosterCache
+                directory = Config.POSTER_CACHE_DIR or BASE_DIR / 'cache' / 'posters'
+                _poster_cache = PosterCache(
+                    directory, Config.POSTER_CACHE_MB * 1024 * 1024, Config.POSTER_WIDTHS,
+                    workers=Config.POSTER_WORKERS, timeout=Config.POSTER_TIMEOUT, origin=Config.POSTER_ORIGIN
+                )
+    return _poster_cache
+
+def poster_response(body, etag, mimetype, max_age):
+    """Ответ с картинкой: 304 по If-None-Match, иначе тело (файл или байты). max_age=None - no-cache"""
+    etag = f'"{etag}"'
+    if etag_matches(etag):
+        response = app.response_class(status=304)
+    elif isinstance(body, Path):
+        response = send_file(body, mimetype=mimetype, conditional=False, etag=False)
+    else:
+        response = app.response_class(body, mimetype=mimetype)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = f'public, max-age={max_age}' if max_age is not None else 'no-cache'
+    return response
+
+@app.route('/api/posters/placeholder', methods=['GET'])
+def get_poster_placeholder():
+    """Заглушка постера (SVG)"""
+    from posters import PLACEHOLDER_SVG, PLACEHOLDER_ETAG
+    return poster_response(PLACEHOLDER_SVG, PLACEHOLDER_ETAG, 'image/svg+xml', Config.POSTER_MAX_AGE)
+
+@app.route('/api/posters/<int:movie_id>', methods=['GET'])
+def get_poster(movie_id):
+    """Постер фильма из локального кэша: ?w=ширина, format=webp|jpeg (по умолчанию по Accept).
+
+    Картинка из кэша отдаётся с ETag по содержимому и долгим Cache-Control.
+    При промахе оригинал скачивается и режется в пуле posters.py; запрос
+    ждёт не дольше Config.POSTER_WAIT, а пока загрузка идёт, отдаёт
+    заглушку с no-cache. Если постера нет или загрузить не удалось -
+    заглушка с коротким max-age.
+    """
+    try:
+        from posters import PLACEHOLDER_SVG, PLACEHOLDER_ETAG, FORMATS
+        try:
+            width = int(request.args.get('w', 0))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'w должен быть целым числом'
+            }), 400
+        image_format = request.args.get('format')
+        if image_format not in FORMATS:
+            image_format = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+        
+        # Своё подключение, а не подключение запроса: загрузка может занять
+        # время, и держать его из пула до конца запроса незачем
+        with db_pool.connection(readonly=True) as conn:
+            row = conn.execute("SELECT poster_url FROM movies WHERE id = ?", (movie_id,)).fetchone()
+        if row is None:
+            return jsonify({
+                'success': False,
+                'error': 'Фильм не найден'
+            }), 404
+        
+        poster_url = row['poster_url']
+        cache = get_poster_cache()
+        found = cache.get(poster_url, width, image_format, wait=Config.POSTER_WAIT) if poster_url else None
+        if found is None:
+            # Загрузка не удалась - заглушку кэшируем ненадолго; ещё идёт - не кэшируем
+            max_age = 300 if not poster_url or cache.recently_failed(poster_url) else None
+            response = poster_response(PLACEHOLDER_SVG, PLACEHOLDER_ETAG, 'image/svg+xml', max_age)
+        else:
+            path, etag, mimetype = found
+            response = poster_response(path, etag, mimetype, Config.POSTER_MAX_AGE)
+        if 'format' not in request.args:
+            response.vary.add('Accept')
+        return response
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# По какому полю можно искать в /api/movies/batch: параметр -> колонка
+BATCH_KEYS = {
+    'ids': 'id',
+    'imdb_ids': 'imdb_id',
+    'canonical_keys': 'canonical_key',
+}
+
+@app.route('/api/movies/batch', methods=['GET', 'POST'])
+def get_movies_batch():
+    """Получить несколько фильмов одним запросом
+
+    GET: ?ids=1,2,3 (или imdb_ids=..., canonical_keys=...), fields=id,title,...
+    POST: {"ids": [1, 2, 3], "fields": ["id", "title"]}
+
+    Фильмы возвращаются в порядке запроса, на месте ненайденных - null,
+    сами ненайденные значения перечислены в not_found.
+    """
+    try:
+        if request.method == 'POST':
+            payload = request.get_json(silent=True) or {}
+            lookups = {name: payload[name] for name in BATCH_KEYS if payload.get(name)}
+            fields = payload.get('fields') or ''
+            if isinstance(fields, list):
+                fields = ','.join(str(name) for name in fields)
+        else:
+            lookups = {}
+            for name in BATCH_KEYS:
+                values = [v.strip() for value in request.args.getlist(name) for v in value.split(',') if v.strip()]
+                if values:
+                    lookups[name] = values
+            fields = request.args.get('fields', '')
+
+        if len(lookups) != 1:
+            return jsonify({
+                'success': False,
+                'error': 'Нужен ровно один из параметров: ' + ', '.join(BATCH_KEYS)
+            }), 400
+
+        name, values = lookups.popitem()
+        column = BATCH_KEYS[name]
+        if not isinstance(values, list):
+            values = [values]
+        if len(values) > Config.BATCH_MAX_IDS:
+            return jsonify({
+                'success': False,
+                'error': f'Не больше {Config.BATCH_MAX_IDS} значений за запрос'
+            }), 400
+        if column == 'id':
+            try:
+                values = [int(value) for value in values]
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'error': 'ids должны быть целыми числами'
+                }), 400
+        else:
+            values = [str(value) for value in values]
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        try:
+            columns = parse_fields(fields, cursor)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+
+        # Ключ нужен для сопоставления, источники без sources вычисляются по id платформ
+        select_columns = list(columns)
+        extra = [column]
+        if 'sources' in columns:
+            extra += ['netflix_id', 'amazon_id', 'poster_url']
+        for name in extra:
+            if name not in select_columns:
+                select_columns.append(name)
+
+        unique_values = list(dict.fromkeys(values))
+        placeholders = ', '.join('?' * len(unique_values))
+        cursor.execute(
+            f"SELECT {', '.join(select_columns)} FROM movies WHERE {column} IN ({placeholders})",
+            unique_values
+        )
+        found = {}
+        for row in cursor.fetchall():
+            movie = format_movie(dict(row))
+            found[row[column]] = {name: movie[name] for name in columns}
+
+        return api_response({
+            'success': True,
+            'movies': [found.get(value) for value in values],
+            'not_found': [value for value in unique_values if value not in found]
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/genres', methods=['GET'])
+@cached_response
 def get_genres():
     """Получить список всех жанров"""
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Получаем все уникальные жанры
-        cursor.execute("""
-            SELECT DISTINCT genre FROM movies WHERE genre IS NOT NULL AND genre != ''
-        """)
-        
-        all_genres = set()
-        for row in cursor.fetchall():
-            if row['genre']:
+        if has_table(cursor, 'movie_genres'):
+            # Небольшая таблица жанров с числом фильмов
+            cursor.execute("""
+                SELECT g.name, COUNT(*) AS count
+                FROM movie_genres mg
+                JOIN genres g ON g.id = mg.genre_id
+                GROUP BY mg.genre_id
+            """)
+            counts = {row['name']: row['count'] for row in cursor.fetchall()}
+        else:
+            # Получаем все уникальные жанры
+            cursor.execute("""
+                SELECT genre FROM movies WHERE genre IS NOT NULL AND genre != ''
+            """)
+            
+            counts = {}
+            for row in cursor.fetchall():
                 # Разделяем жанры через запятую
-                genres = [g.strip() for g in row['genre'].split(',')]
-                all_genres.update(genres)
-        
-        conn.close()
+                for name in split_genres(row['genre']):
+                    counts[name] = counts.get(name, 0) + 1
         
         return jsonify({
             'success': True,
-            'genres': sorted(list(all_genres))
+            'genres': sorted(counts),
+            'counts': counts
         })
     
     except Exception as e:
@@ -438,12 +2447,19 @@ def get_genres():
         }), 500
 
 @app.route('/api/stats', methods=['GET'])
+@cached_response
 def get_stats():
     """Получить статистику по фильмам"""
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
+        if has_table(cursor, 'catalog_stats'):
+            return jsonify({
+                'success': True,
+                'stats': stats_from_summary(cursor)
+            })
+        
         # Общее количество
         cursor.execute("SELECT COUNT(*) as total FROM movies")
         total = cursor.fetchone()['total']
@@ -461,15 +2477,13 @@ def get_stats():
         # Количество фильмов на платформах
         cursor.execute("""
             SELECT 
-                SUM(CASE WHEN netflix_id IS NOT NULL AND netflix_id != '' THEN 1 ELSE 0 END) as netflix_count,
-                SUM(CASE WHEN amazon_id IS NOT NULL AND amazon_id != '' THEN 1 ELSE 0 END) as amazon_count,
-                SUM(CASE WHEN poster_url IS NOT NULL AND poster_url != '' THEN 1 ELSE 0 END) as imdb_count
+                SUM((source_mask & ?) != 0) as netflix_count,
+                SUM((source_mask & ?) != 0) as amazon_count,
+                SUM((source_mask & ?) != 0) as imdb_count
             FROM movies
-        """)
+        """, tuple(SOURCE_BITS.values()))
         platform_stats = cursor.fetchone()
         
-        conn.close()
-        
         return jsonify({
             'success': True,
             'stats': {
@@ -493,6 +2507,33 @@ def get_stats():
             'error': str(e)
         }), 500
 
+def stats_from_summary(cursor):
+    """Собирает ответ /api/stats из catalog_stats и catalog_counters без обхода movies"""
+    summary = read_catalog_stats(cursor)
+    counters = read_counters(cursor) or {}
+    
+    years = {int(key): count for key, (count, _) in summary.get('year', {}).items()}
+    rating_count, rating_total = summary.get('rating', {}).get('sum', (0, 0))
+    platforms = summary.get('platform', {})
+    buckets = summary.get('rating_bucket', {})
+    
+    return {
+        'total_movies': counters.get('movies', 0),
+        'year_range': {
+            'min': min(years) if years else None,
+            'max': max(years) if years else None
+        },
+        'average_rating': round(rating_total / rating_count, 2) if rating_count else 0,
+        'platforms': {
+            name: platforms.get(name, (0, 0))[0] for name in ('netflix', 'amazon', 'imdb')
+        },
+        'years': {str(year): years[year] for year in sorted(years)},
+        'genres': {name: count for name, (count, _) in summary.get('genre', {}).items()},
+        'rating_buckets': {
+            str(bucket): buckets.get(str(bucket), (0, 0))[0] for bucket in range(11)
+        }
+    }
+
 @app.route('/api/search/suggestions', methods=['GET'])
 def get_search_suggestions():
     """Получить подсказки для поиска"""
@@ -504,22 +2545,44 @@ def get_search_suggestions():
                 'suggestions': []
             })
         
+        if fuzzy_requested(request.args):
+            return jsonify({
+                'success': True,
+                'suggestions': get_fuzzy_index().suggestions(query)
+            })
+        
+        if Config.SUGGEST_INDEX:
+            return jsonify({
+                'success': True,
+                'suggestions': get_suggest_index().search(query)
+            })
+        
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        search_query = """
-            SELECT id, title, release_year 
-            FROM movies 
-            WHERE title LIKE ? 
-            ORDER BY imdb_rating DESC 
-            LIMIT 10
-        """
-        
-        cursor.execute(search_query, (f"%{query}%",))
+        fts_query = build_fts_query(query, column='title') if fts_enabled(cursor) else None
+        if fts_query:
+            # Префиксный поиск по словам названия через FTS5 индекс
+            search_query = """
+                SELECT m.id, m.title, m.release_year
+                FROM movies_fts
+                JOIN movies m ON m.id = movies_fts.rowid
+                WHERE movies_fts MATCH ?
+                ORDER BY m.imdb_rating DESC
+                LIMIT 10
+            """
+            cursor.execute(search_query, (fts_query,))
+        else:
+            search_query = """
+                SELECT id, title, release_year 
+                FROM movies 
+                WHERE title LIKE ? 
+                ORDER BY imdb_rating DESC 
+                LIMIT 10
+            """
+            cursor.execute(search_query, (f"%{query}%",))
         suggestions = [dict(row) for row in cursor.fetchall()]
         
-        conn.close()
-        
         return jsonify({
             'success': True,
             'suggestions': suggestions
@@ -544,26 +2607,22 @@ def load_csv():
                 'error': 'CSV файл не найден'
             }), 404
         
-        # Читаем CSV
-        df = pd.read_csv(csv_file, encoding='utf-8-sig')
-        
-        # Подключаемся к БД
-        conn = sqlite3.connect(DB_PATH)
-        
-        # Очищаем таблицу
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM movies")
-        conn.commit()
+        # Потоковая загрузка с атомарной заменой таблицы
+        conn = get_db_connection()
+        stats = import_csv_file(conn, csv_file)
         
-        # Загружаем данные
-        df.to_sql('movies', conn, if_exists='append', index=False)
-        conn.commit()
-        conn.close()
+        # Индексы в памяти перестраиваем сразу, а не на первом запросе
+        if Config.SUGGEST_INDEX:
+            get_suggest_index()
+        if Config.FUZZY_SEARCH:
+            get_fuzzy_index()
+        schedule_similar_refresh()
         
         return jsonify({
             'success': True,
-            'message': f'Загружено {len(df)} фильмов',
-            'count': len(df)
+            'message': f"Загружено {stats['rows']} фильмов",
+            'count': stats['rows'],
+            'stats': stats
         })
     
     except Exception as e:
@@ -573,48 +2632,146 @@ def load_csv():
         }), 500
 
 # Экспорт данных в CSV
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'json': ('application/json', 'json'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+def iter_export_chunks(cursor, columns, export_format, batch_size):
+    """Отдаёт выгрузку кусками по batch_size строк, не держа весь каталог в памяти"""
+    if export_format == 'csv':
+        # BOM, чтобы Excel открыл UTF-8 без вопросов (как раньше utf-8-sig)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield '\ufeff' + buffer.getvalue()
+    elif export_format == 'json':
+        yield '['
+
+    first = True
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(tuple(row) for row in rows)
+            yield buffer.getvalue()
+            continue
+
+        lines = [json.dumps(dict(zip(columns, row)), ensure_ascii=False) for row in rows]
+        if export_format == 'ndjson':
+            yield '\n'.join(lines) + '\n'
+        else:
+            yield ('\n' if first else ',\n') + ',\n'.join(lines)
+        first = False
+
+    if export_format == 'json':
+        yield '\n]\n'
+
 @app.route('/api/admin/export-csv', methods=['GET'])
 def export_csv():
-    """Экспортировать данные в CSV файл"""
+    """Потоковая выгрузка каталога в CSV, JSON или NDJSON
+
+    Параметры: format=csv|json|ndjson, fields=id,title,... (по умолчанию все
+    колонки), gzip=true, а также фильтры /api/movies (search, genre, year_from,
+    year_to, min_rating, sources). Строки читаются через fetchmany и сразу
+    отправляются клиенту.
+    """
     try:
+        export_format = request.args.get('format', 'csv').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': f'Неизвестный формат: {export_format}'
+            }), 400
+
         conn = get_db_connection()
         cursor = conn.cursor()
-        
-        # Получаем все фильмы
-        cursor.execute("SELECT * FROM movies")
-        movies = [dict(row) for row in cursor.fetchall()]
-        
-        conn.close()
-        
-        if not movies:
+
+        try:
+            columns = parse_fields(request.args.get('fields'), cursor)
+        except ValueError as e:
             return jsonify({
                 'success': False,
-                'error': 'Нет данных для экспорта'
-            }), 404
-        
-        # Создаём CSV
-        csv_file = DATA_DIR / 'exported_movies.csv'
-        df = pd.DataFrame(movies)
-        df.to_csv(csv_file, index=False, encoding='utf-8-sig')
-        
-        return jsonify({
-            'success': True,
-            'message': f'Экспортировано {len(movies)} фильмов',
-            'file': str(csv_file),
-            'count': len(movies)
-        })
-    
+                'error': str(e)
+            }), 400
+
+        from_clause, where_clause, params, _, _ = build_movie_filters(request.args, cursor)
+        select_columns = ', '.join(f'movies.{name}' for name in columns)
+        cursor.execute(f"""
+            SELECT {select_columns}
+            FROM {from_clause}
+            WHERE 1=1{where_clause}
+            ORDER BY movies.id
+        """, params)
+
+        use_gzip = request.args.get('gzip', 'false').lower() == 'true'
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        filename = f'exported_movies.{extension}'
+
+        def generate():
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if use_gzip else None
+            for chunk in iter_export_chunks(cursor, columns, export_format, Config.EXPORT_BATCH_SIZE):
+                data = chunk.encode('utf-8')
+                if compressor is None:
+                    yield data
+                else:
+                    data = compressor.compress(data)
+                    if data:
+                        yield data
+            if compressor is not None:
+                yield compressor.flush()
+
+        if use_gzip:
+            mimetype = 'application/gzip'
+            filename += '.gz'
+
+        response = Response(stream_with_context(generate()), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-# Статические файлы фронтенда
+# Статические файлы фронтенда. Если есть сборка (build_assets.py), все файлы
+# и их сжатые варианты читаются в память при старте
+FRONTEND_DIST = Path(Config.FRONTEND_DIST) if Config.FRONTEND_DIST else FRONTEND_DIR / 'dist'
+_static_assets = load_assets(FRONTEND_DIST)
+
+def static_asset_response(asset):
+    """Ответ собранным файлом: вариант по Accept-Encoding, 304 по ETag.
+
+    Файлы с хэшем в имени не меняются - кэшируются навсегда (immutable),
+    index.html и исходные имена браузер перепроверяет каждый раз.
+    """
+    encodings = [encoding for encoding in ('br', 'gzip') if encoding in asset.variants]
+    encoding = request.accept_encodings.best_match(encodings) if encodings else None
+    etag = asset.etag[:-1] + f'-{encoding}"' if encoding else asset.etag
+    if etag_matches(asset.etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(asset.variants[encoding] if encoding else asset.body,
+                                      content_type=asset.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable' if asset.immutable else 'no-cache'
+    if encodings:
+        response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve_frontend(path):
     """Обслуживание фронтенда"""
+    if _static_assets is not None:
+        return static_asset_response(_static_assets.get(path) or _static_assets['index.html'])
     if path and os.path.exists(FRONTEND_DIR / path):
         return send_from_directory(FRONTEND_DIR, path)
     return send_from_directory(FRONTEND_DIR, 'index.html')
@@ -625,14 +2782,14 @@ def health_check():
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) as count FROM movies")
-        count = cursor.fetchone()['count']
-        conn.close()
+        # Число фильмов из catalog_counters, без прохода по таблице
+        count, _ = count_movies(cursor, 'movies', '', [])
         
         return jsonify({
             'status': 'healthy',
             'database': 'connected',
             'movies_count': count,
+            'pool': db_pool.stats(),
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -641,8 +2798,37 @@ def health_check():
             'error': str(e)
         }), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Метрики в текстовом формате Prometheus"""
+    pool = db_pool.stats()
+    gauges = {
+        'movies_sqlite_pool_in_use': ('Подключений выдано', pool['in_use']),
+        'movies_sqlite_pool_open_read': ('Открыто подключений на чтение', pool['open_read']),
+        'movies_sqlite_pool_open_write': ('Открыто подключений на запись', pool['open_write']),
+        'movies_sqlite_pool_waits': ('Сколько раз ждали свободное подключение', pool['waits']),
+        'movies_response_cache_entries': ('Ответов в кэше', len(_response_cache._entries)),
+        'movies_data_version': ('Версия данных каталога', current_data_version()),
+    }
+    return Response(metrics.registry.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/profiles/<profile_id>', methods=['GET'])
+def profile_report(profile_id):
+    """Полный отчёт cProfile запроса с заголовком X-Profile (id из X-Profile-Id)"""
+    report = metrics.get_profile(profile_id)
+    if report is None:
+        return jsonify({
+            'success': False,
+            'error': 'Профиль не найден'
+        }), 404
+    return Response(report, mimetype='text/plain')
+
 # Запуск приложения
 if __name__ == '__main__':
+    # python app.py --build-snapshot [путь] - только собрать снимок базы
+    if len(sys.argv) > 1 and sys.argv[1] == '--build-snapshot':
+        sys.exit(0 if build_snapshot(sys.argv[2] if len(sys.argv) > 2 else None) else 1)
+    
     print("=" * 60)
     print("🎬 КИНОТЕКА - Запуск сервера")
     print("=" * 60)
@@ -654,6 +2840,16 @@ if __name__ == '__main__':
     print("🔧 Инициализация базы данных...")
     init_database()
     
+    if Config.CATALOG_ENGINE == 'memory':
+        print("🧮 Загружаю каталог в память...")
+        with db_pool.connection(readonly=True) as conn:
+            get_catalog_engine(conn.cursor())
+    
+    if Config.SUGGEST_INDEX:
+        get_suggest_index()
+    if Config.FUZZY_SEARCH:
+        get_fuzzy_index()
+    
     print("\n✅ Сервер готов!")
     print(f"📊 База данных: {DB_PATH}")
     print(f"🌐 Сервер запущен: http://localhost:5000")
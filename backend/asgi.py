@@ -0,0 +1,274 @@
+"""ASGI точка входа: те же маршруты Flask, запросы выполняются в ограниченном пуле потоков.
+
+Запуск (из папки backend):
+    uvicorn asgi:application --workers 4
+    python asgi.py                       # один процесс, порт 5000
+
+Событийный цикл только принимает соединения и раздаёт ответы, а
+обработчики Flask (работа с SQLite, сериализация) выполняются в
+ThreadPoolExecutor на Config.ASGI_THREADS потоков. Одинаковые GET запросы
+к /api/*, пришедшие одновременно, объединяются: выполняется один, остальные
+получают его ответ (Config.ASGI_COALESCE). Когда в работе и очереди больше
+Config.ASGI_MAX_PENDING запросов, новые сразу получают 503.
+
+Как выбирать число процессов и потоков
+--------------------------------------
+- Процессы (--workers): по числу ядер. Из-за GIL один процесс занимает
+  не больше одного ядра на Python коде (разбор параметров, JSON), так что
+  ядра загружаются только процессами. У каждого процесса свои пул
+  подключений, кэши ответов и каталог в памяти - память растёт линейно.
+- Потоки (ASGI_THREADS): по умолчанию DB_POOL_SIZE. Каждый поток держит не
+  больше одного подключения на чтение, поэтому потоков больше пула не
+  нужно - лишние будут ждать в db_pool.acquire. Потоки полезны, пока
+  SQLite ждёт диск (страницы не в кэше и не в mmap); при тёплом кэше
+  запрос почти весь на CPU, и 2-4 потоков на процесс хватает.
+- Всего одновременных читателей SQLite: workers * ASGI_THREADS. В режиме
+  WAL они не мешают друг другу; запись (загрузка данных) одна на всю базу.
+- ASGI_MAX_PENDING: сколько запросов процесс готов держать в очереди.
+  При времени ответа t и ASGI_THREADS потоках очередь из N запросов
+  ждёт примерно N * t / ASGI_THREADS - ограничение не даёт этому времени
+  расти без предела под перегрузкой.
+
+init_database выполняется при старте каждого процесса (lifespan). Если база
+пуста, удобнее один раз заполнить её до запуска нескольких процессов:
+    python -c "import app; app.init_database()"
+или собрать снимок (python app.py --build-snapshot) и запускать процессы с
+SNAPSHOT_MODE=readonly - тогда старт процесса не трогает схему и данные.
+"""
+import asyncio
+import contextvars
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import app as movies_app
+from config import Config
+
+# Заголовки, от которых зависит тело ответа: по ним различаются объединяемые запросы
+COALESCE_HEADERS = (b'accept', b'accept-encoding', b'if-none-match')
+
+# Сколько байт ответа читать в потоке обработчика, прежде чем отдавать частями
+BUFFER_LIMIT = 64 * 1024
+
+
+def build_environ(scope, body):
+    """WSGI environ по ASGI scope HTTP запроса"""
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    server = scope.get('server') or ('localhost', 80)
+    environ['SERVER_NAME'] = server[0]
+    environ['SERVER_PORT'] = str(server[1])
+    client = scope.get('client')
+    if client:
+        environ['REMOTE_ADDR'] = client[0]
+
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = 'HTTP_' + name
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def call_wsgi(wsgi_app, environ, buffer_all):
+    """Вызывает WSGI приложение (в потоке пула).
+
+    Возвращает (статус, заголовки, прочитанные куски, остаток или None).
+    Остаток (контекст, итератор, результат) бывает, если ответ длиннее
+    BUFFER_LIMIT и buffer_all=False - он дочитывается по кускам, возможно
+    в других потоках пула. Контекст нужен, потому что stream_with_context
+    держит контекст Flask в contextvars, и продолжать генератор надо в нём же.
+    """
+    context = contextvars.Context()
+    return context.run(_call_wsgi, context, wsgi_app, environ, buffer_all)
+
+
+def _call_wsgi(context, wsgi_app, environ, buffer_all):
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                              for name, value in headers]
+        return chunks.append
+
+    chunks = []
+    result = wsgi_app(environ, start_response)
+    iterator = iter(result)
+    size = 0
+    try:
+        for chunk in iterator:
+            if chunk:
+                chunks.append(chunk)
+                size += len(chunk)
+            if not buffer_all and size >= BUFFER_LIMIT:
+                return started['status'], started['headers'], chunks, (context, iterator, result)
+    except BaseException:
+        close_result(result)
+        raise
+    close_result(result)
+    return started['status'], started['headers'], chunks, None
+
+
+def close_result(result):
+    close = getattr(result, 'close', None)
+    if close is not None:
+        close()
+
+
+def next_chunk(context, iterator):
+    """Следующий кусок потокового ответа или None в конце"""
+    return context.run(next, iterator, None)
+
+
+class AsgiApp:
+    """ASGI адаптер для WSGI приложения Flask"""
+
+    def __init__(self, wsgi_app, threads=None, max_pending=None, coalesce=None):
+        self.wsgi_app = wsgi_app
+        self.threads = threads or Config.ASGI_THREADS
+        self.max_pending = max_pending or Config.ASGI_MAX_PENDING
+        self.coalesce = Config.ASGI_COALESCE if coalesce is None else coalesce
+        self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='movies-asgi')
+        self.pending = 0
+        self.inflight = {}
+        self.stats = {'requests': 0, 'coalesced': 0, 'rejected': 0}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise RuntimeError(f"Неподдерживаемый тип соединения: {scope['type']}")
+
+    async def lifespan(self, receive, send):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await loop.run_in_executor(self.executor, startup)
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                movies_app.db_pool.close_all()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = b''
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        self.stats['requests'] += 1
+        key = self.coalesce_key(scope)
+        if key is not None and key in self.inflight:
+            # Такой же запрос уже выполняется - ждём его ответ
+            self.stats['coalesced'] += 1
+            status, headers, chunks = await asyncio.shield(self.inflight[key])
+            await send_response(send, status, headers, chunks)
+            return
+
+        if self.pending >= self.max_pending:
+            self.stats['rejected'] += 1
+            await send_response(send, 503, [(b'content-type', b'application/json'), (b'retry-after', b'1')],
+                                ['{"success": false, "error": "Сервер перегружен"}'.encode('utf-8')])
+            return
+
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, body)
+        future = None
+        if key is not None:
+            future = self.inflight[key] = loop.create_future()
+
+        self.pending += 1
+        try:
+            status, headers, chunks, rest = await loop.run_in_executor(
+                self.executor, call_wsgi, self.wsgi_app, environ, future is not None)
+        except BaseException as e:
+            if future is not None:
+                future.set_exception(e)
+                future.exception()  # без ожидающих исключение не считается потерянным
+            raise
+        finally:
+            self.pending -= 1
+            if future is not None:
+                del self.inflight[key]
+
+        if future is not None:
+            future.set_result((status, headers, chunks))
+        await send_response(send, status, headers, chunks, more_body=rest is not None)
+
+        if rest is not None:
+            # Длинный (потоковый) ответ: каждый следующий кусок читается в пуле
+            context, iterator, result = rest
+            try:
+                while True:
+                    chunk = await loop.run_in_executor(self.executor, next_chunk, context, iterator)
+                    if chunk is None:
+                        break
+                    if chunk:
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                await send({'type': 'http.response.body', 'body': b''})
+            finally:
+                await loop.run_in_executor(self.executor, context.run, close_result, result)
+
+    def coalesce_key(self, scope):
+        """Ключ объединения для GET /api/* (кроме админских) или None"""
+        if not self.coalesce or scope['method'] != 'GET':
+            return None
+        path = scope['path']
+        if not path.startswith('/api/') or path.startswith('/api/admin/'):
+            return None
+        headers = tuple(sorted((name, value) for name, value in scope['headers'] if name in COALESCE_HEADERS))
+        return path, scope['query_string'], headers
+
+
+async def send_response(send, status, headers, chunks, more_body=False):
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b''.join(chunks), 'more_body': more_body})
+
+
+def startup():
+    """Инициализация процесса: база и, если включены, каталог и индексы поиска в памяти"""
+    movies_app.init_database()
+    if Config.CATALOG_ENGINE == 'memory':
+        with movies_app.db_pool.connection(readonly=True) as conn:
+            movies_app.get_catalog_engine(conn.cursor())
+    if Config.SUGGEST_INDEX:
+        movies_app.get_suggest_index()
+    if Config.FUZZY_SEARCH:
+        movies_app.get_fuzzy_index()
+
+
+application = AsgiApp(movies_app.app)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run('asgi:application', host='0.0.0.0', port=5000)
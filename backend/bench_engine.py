@@ -0,0 +1,128 @@
+"""Сравнение SQL и колоночного каталога в памяти для /api/movies.
+
+Запуск (из папки backend):
+    python bench_engine.py                 # текущая база
+    python bench_engine.py --scale 100     # каталог, размноженный в 100 раз
+
+Для каждого набора фильтров запрос выполняется через Flask test client
+в обоих режимах (Config.CATALOG_ENGINE = 'sql' / 'memory'), ответы
+сравниваются на полное совпадение JSON, печатается медиана времени.
+"""
+import argparse
+import contextlib
+import io
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import app as movies_app
+from config import Config
+
+QUERIES = [
+    '',
+    'genre=Drama',
+    'genre=Comedy&min_rating=7',
+    'year_from=2000&year_to=2009',
+    'sources=netflix',
+    'sources=amazon&sources=netflix&sort_by=release_year&sort_order=ASC',
+    'sort_by=title&sort_order=ASC',
+    'genre=Drama&year_from=2010&sort_by=num_sources',
+    'genre=Drama,Romance&genre_mode=and&sort_by=release_year',
+    'genre=Thriller&genre=Horror&sort_by=title&sort_order=ASC',
+    'min_rating=6&page=20',
+]
+
+MOVIE_COLUMNS = """canonical_key, title, release_year, imdb_rating, imdb_votes, genre,
+    description, poster_url, language, imdb_id, sources, num_sources,
+    source_mask, weighted_rating, netflix_id, netflix_director, netflix_cast, netflix_country,
+    netflix_date_added, netflix_rating, netflix_duration, netflix_listed_in,
+    amazon_id, amazon_director, amazon_cast, amazon_country,
+    amazon_date_added, amazon_rating, amazon_duration, amazon_listed_in"""
+
+
+def make_scaled_copy(db_path, scale):
+    """Копирует базу во временный файл и размножает фильмы scale раз"""
+    tmp_dir = Path(tempfile.mkdtemp(prefix='movies_bench_'))
+    target = tmp_dir / 'movies.db'
+    shutil.copyfile(db_path, target)
+
+    conn = sqlite3.connect(target)
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(id) FROM movies")
+    max_id = cursor.fetchone()[0] or 0
+    select_columns = MOVIE_COLUMNS.replace('canonical_key,', "canonical_key || '#' || ?,", 1)
+    for copy in range(1, scale):
+        cursor.execute(
+            f"INSERT INTO movies ({MOVIE_COLUMNS}) SELECT {select_columns} FROM movies WHERE id <= ?",
+            (copy, max_id)
+        )
+    movies_app.rebuild_movie_genres(cursor)
+    movies_app.bump_data_version(cursor)
+    conn.commit()
+    conn.close()
+    return tmp_dir, target
+
+
+def run_query(client, query_string):
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        response = client.get(f'/api/movies?per_page=20&{query_string}')
+        elapsed = time.perf_counter() - started
+    return elapsed, response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=str(movies_app.DB_PATH), help='путь к базе SQLite')
+    parser.add_argument('--scale', type=int, default=1, help='во сколько раз размножить каталог')
+    parser.add_argument('--repeat', type=int, default=20, help='повторов на запрос')
+    parser.add_argument('--count-cache', action='store_true', help='не отключать кэш COUNT в SQL режиме')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    db_path = Path(args.db)
+    if args.scale > 1:
+        tmp_dir, db_path = make_scaled_copy(db_path, args.scale)
+
+    movies_app.db_pool = movies_app.ConnectionPool(db_path, Config.DB_POOL_SIZE, Config.DB_POOL_TIMEOUT)
+    if not args.count_cache:
+        Config.COUNT_CACHE_SIZE = 0
+    # Кэш готовых ответов сравнивал бы кэш с кэшем
+    movies_app._response_cache.max_size = 0
+    client = movies_app.app.test_client()
+
+    try:
+        # Прогрев: загрузка каталога в память не входит в замер
+        Config.CATALOG_ENGINE = 'memory'
+        started = time.perf_counter()
+        run_query(client, '')
+        print(f"Каталог в памяти построен за {time.perf_counter() - started:.3f} с")
+
+        print(f"{'запрос':<70} {'sql, мс':>9} {'memory, мс':>11} {'ускорение':>10}")
+        for query_string in QUERIES:
+            timings = {}
+            answers = {}
+            for engine in ('sql', 'memory'):
+                Config.CATALOG_ENGINE = engine
+                samples = []
+                for _ in range(args.repeat):
+                    elapsed, answers[engine] = run_query(client, query_string)
+                    samples.append(elapsed)
+                timings[engine] = statistics.median(samples) * 1000
+
+            if answers['sql'] != answers['memory']:
+                raise SystemExit(f"❌ Ответы различаются для запроса: {query_string or '(без фильтров)'}")
+
+            speedup = timings['sql'] / timings['memory'] if timings['memory'] else float('inf')
+            print(f"{query_string or '(без фильтров)':<70} {timings['sql']:>9.2f} {timings['memory']:>11.2f} {speedup:>9.1f}x")
+    finally:
+        movies_app.db_pool.close_all()
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,491 @@
+"""Нагрузочный тест и микробенчмарки API на синтетических каталогах.
+
+Запуск (из папки backend):
+    python benchmark.py                               # 1k фильмов, test client
+    python benchmark.py --sizes 1000,100000,1000000   # несколько размеров каталога
+    python benchmark.py --mode server --workers 4     # gunicorn с несколькими процессами
+    python benchmark.py --save-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json --threshold 20
+
+Каталог генерируется в CSV той же формы, что integrated_movies_with_posters.csv,
+и загружается штатным import_csv_file во временную базу (с --cache-dir
+базы переиспользуются между запусками). Генератор детерминирован (--seed).
+
+Смесь запросов: страницы /api/movies с каждым фильтром и сортировкой,
+курсорная пагинация, поиск, последовательности нажатий клавиш в
+/api/search/suggestions, /api/stats, /api/genres и /api/movies/<id>.
+По каждой группе печатаются число запросов в секунду и p50/p95/p99
+задержки, по прогону - пиковая память. С --baseline результаты
+сравниваются с сохранёнными, рост p95 больше --threshold процентов
+отмечается как регрессия (код выхода 1).
+"""
+import argparse
+import contextlib
+import csv
+import http.client
+import io
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import app as movies_app
+from config import Config
+
+CSV_COLUMNS = [
+    'movie_id', 'canonical_key', 'sources', 'num_sources', 'title', 'release_year',
+    'imdb_rating', 'imdb_votes', 'genre', 'description', 'poster_url', 'language', 'imdb_id',
+]
+
+GENRES = [
+    'Drama', 'Comedy', 'Action', 'Thriller', 'Romance', 'Crime', 'Horror', 'Adventure',
+    'Documentary', 'Family', 'Fantasy', 'Mystery', 'Sci-Fi', 'Biography', 'Animation',
+    'History', 'Music', 'War', 'Sport', 'Western',
+]
+LANGUAGES = ['English', 'Hindi', 'Spanish', 'French', 'Japanese', 'Korean', 'German', 'Russian']
+SYLLABLES = ['ka', 'mo', 'ri', 'ta', 'ne', 'lo', 'sa', 'vi', 'dor', 'mar', 'len', 'tis',
+             'ran', 'bel', 'cho', 'gra', 'fen', 'pul', 'zor', 'qui', 'the', 'nor', 'wil', 'ast']
+
+# Группа запросов -> вес в смеси
+MIX = {
+    'movies_page': 30,
+    'movies_filter': 25,
+    'movies_cursor': 5,
+    'movies_search': 10,
+    'suggestions': 15,
+    'movie_detail': 10,
+    'stats': 3,
+    'genres': 2,
+}
+
+
+def make_vocabulary(rng, size=3000):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def write_catalog_csv(path, size, seed):
+    """Пишет синтетический каталог size фильмов в CSV формы integrated_movies_with_posters.csv"""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for movie_id in range(1, size + 1):
+            title = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4))).title()
+            year = rng.randint(1920, 2023) if rng.random() > 0.02 else None
+            sources = ['imdb'] if rng.random() < 0.9 else []
+            if rng.random() < 0.3:
+                sources.insert(0, 'netflix')
+            if rng.random() < 0.15:
+                sources.append('amazon')
+            sources = sources or ['imdb']
+            description = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(15, 120)))
+            writer.writerow([
+                movie_id,
+                f"{title.lower()}_{year}.0_{movie_id}",
+                repr(sources),
+                len(sources),
+                title,
+                f"{year}.0" if year else '',
+                round(rng.uniform(1.0, 9.6), 1) if rng.random() > 0.05 else '',
+                f"{rng.randint(5, 500000)}.0",
+                ', '.join(rng.sample(GENRES, rng.randint(1, 3))),
+                description.capitalize() + '.',
+                f"http://ia.media-imdb.com/images/M/{movie_id:09d}._V1_SX300.jpg",
+                rng.choice(LANGUAGES),
+                f"tt{movie_id:07d}",
+            ])
+
+
+def build_catalog(size, seed, cache_dir):
+    """Возвращает путь к базе с синтетическим каталогом (создаёт при необходимости).
+
+    В базе должно быть ровно size фильмов: иначе отчёт подписан не тем
+    размером. Базу из кэша с другим числом фильмов (старый генератор)
+    собираем заново, свежую - считаем ошибкой.
+    """
+    db_path = cache_dir / f'bench_{size}_{seed}.db'
+    if db_path.exists():
+        if count_movies(db_path) == size:
+            return db_path
+        print(f"♻️  В {db_path.name} не {size} фильмов - собираю заново")
+        db_path.unlink()
+
+    csv_path = cache_dir / f'bench_{size}_{seed}.csv'
+    started = time.perf_counter()
+    write_catalog_csv(csv_path, size, seed)
+    print(f"📝 CSV на {size} фильмов сгенерирован за {time.perf_counter() - started:.1f} с")
+
+    use_database(db_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        movies_app.init_database()
+    with movies_app.db_pool.connection() as conn:
+        stats = movies_app.import_csv_file(conn, csv_path)
+    movies_app.db_pool.close_all()
+    csv_path.unlink()
+    print(f"📦 Загружено {stats['rows']} фильмов за {stats['seconds']} с ({stats['rows_per_sec']} строк/с)")
+    loaded = count_movies(db_path)
+    if loaded != size:
+        db_path.unlink()
+        raise RuntimeError(f"В каталог загружено {loaded} фильмов вместо {size}: {stats.get('errors')}")
+    return db_path
+
+
+def count_movies(db_path):
+    conn = movies_app.sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM movies").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def use_database(db_path):
+    """Переключает модуль app на другую базу (для test client)"""
+    movies_app.db_pool.close_all()
+    movies_app.DB_PATH = Path(db_path)
+    movies_app.db_pool = movies_app.ConnectionPool(db_path, Config.DB_POOL_SIZE, Config.DB_POOL_TIMEOUT)
+    movies_app._known_tables.clear()
+    movies_app._table_columns.clear()
+    movies_app._response_cache.clear()
+    movies_app._data_version['checked'] = None
+    movies_app._catalog_engine = (None, None)
+    movies_app._suggest_index = (None, None)
+    movies_app._fuzzy_index = (None, None)
+
+
+def load_samples(db_path, rng, count=500):
+    """Случайные существующие id и слова из названий для построения запросов"""
+    conn = movies_app.sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(id) FROM movies")
+    max_id = cursor.fetchone()[0] or 1
+    probes = [rng.randint(1, max_id) for _ in range(count)]
+    placeholders = ','.join('?' * len(probes))
+    cursor.execute(f"SELECT id, title FROM movies WHERE id IN ({placeholders})", probes)
+    rows = cursor.fetchall()
+    conn.close()
+    ids = [movie_id for movie_id, _ in rows]
+    words = [word for _, title in rows for word in title.split() if len(word) >= 3]
+    return ids or [1], words or ['love']
+
+
+def build_requests(db_path, total, seed):
+    """Список (группа, URL) заданной длины по весам MIX"""
+    rng = random.Random(seed)
+    ids, words = load_samples(db_path, rng)
+    groups = list(MIX)
+    weights = [MIX[group] for group in groups]
+    sort_fields = ['imdb_rating', 'release_year', 'title', 'num_sources']
+
+    requests = []
+    while len(requests) < total:
+        group = rng.choices(groups, weights)[0]
+        if group == 'movies_page':
+            requests.append((group, f"/api/movies?page={rng.randint(1, 50)}&per_page=20"
+                                    f"&sort_by={rng.choice(sort_fields)}&sort_order={rng.choice(['ASC', 'DESC'])}"))
+        elif group == 'movies_filter':
+            filters = [
+                f"genre={rng.choice(GENRES)}",
+                f"genre={rng.choice(GENRES)},{rng.choice(GENRES)}&genre_mode=and",
+                f"year_from={rng.randint(1950, 2015)}&year_to=2023",
+                f"min_rating={rng.choice([5, 6, 7, 8])}",
+                f"sources={rng.choice(['netflix', 'amazon', 'imdb'])}",
+            ]
+            query = '&'.join(rng.sample(filters, rng.randint(1, 3)))
+            requests.append((group, f"/api/movies?{query}&page={rng.randint(1, 5)}&per_page=20"))
+        elif group == 'movies_cursor':
+            # Первая страница курсорной пагинации; следующие берутся из ответа при выполнении
+            requests.append((group, f"/api/movies?cursor=&per_page=20&sort_by={rng.choice(sort_fields)}"))
+        elif group == 'movies_search':
+            requests.append((group, f"/api/movies?search={rng.choice(words)}&per_page=20"))
+        elif group == 'suggestions':
+            # Последовательность нажатий: префиксы слова от 2 букв
+            word = rng.choice(words).lower()
+            for length in range(2, len(word) + 1):
+                requests.append((group, f"/api/search/suggestions?q={word[:length]}"))
+        elif group == 'movie_detail':
+            requests.append((group, f"/api/movies/{rng.choice(ids)}"))
+        else:
+            requests.append((group, f"/api/{group}"))
+    return requests[:total]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, wall_seconds):
+    """{группа: статистика} по списку (группа, секунды, ok)"""
+    by_group = defaultdict(list)
+    errors = defaultdict(int)
+    for group, elapsed, ok in samples:
+        by_group[group].append(elapsed)
+        by_group['all'].append(elapsed)
+        if not ok:
+            errors[group] += 1
+            errors['all'] += 1
+
+    result = {}
+    for group, values in by_group.items():
+        values.sort()
+        result[group] = {
+            'requests': len(values),
+            'errors': errors[group],
+            'rps': round(len(values) / wall_seconds, 1),
+            'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+        }
+    return result
+
+
+def next_cursor_url(url, body):
+    """Для курсорной группы: URL следующей страницы или None"""
+    try:
+        cursor = json.loads(body).get('next_cursor')
+    except (ValueError, AttributeError):
+        return None
+    if not cursor:
+        return None
+    base = url.split('&cursor=')[0].replace('cursor=&', '')
+    return f"{base}&cursor={cursor}"
+
+
+def run_client(db_path, requests):
+    """Прогон через Flask test client в текущем процессе (без сети, последовательно)"""
+    use_database(db_path)
+    client = movies_app.app.test_client()
+    samples = []
+    started = time.perf_counter()
+    for group, url in requests:
+        pages = 3 if group == 'movies_cursor' else 1
+        for _ in range(pages):
+            request_started = time.perf_counter()
+            response = client.get(url)
+            samples.append((group, time.perf_counter() - request_started, response.status_code in (200, 304)))
+            if group != 'movies_cursor':
+                break
+            url = next_cursor_url(url, response.get_data())
+            if url is None:
+                break
+    wall = time.perf_counter() - started
+    return summarize(samples, wall), {'peak_rss_mb': movies_app.peak_memory_mb()}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def process_tree_rss_mb(pid):
+    """RSS процесса и его потомков (Linux /proc) в МБ или None"""
+    total_kb = 0
+    pending = [pid]
+    seen = set()
+    try:
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+            children_file = Path(f'/proc/{current}/task/{current}/children')
+            if children_file.exists():
+                pending.extend(int(child) for child in children_file.read_text().split())
+    except (OSError, ValueError):
+        return None
+    return round(total_kb / 1024, 1)
+
+
+def run_server(db_path, requests, workers, threads, concurrency):
+    """Прогон против gunicorn с workers процессами, concurrency клиентских потоков"""
+    port = free_port()
+    env = dict(os.environ, DATABASE_PATH=str(db_path))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+         '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app'],
+        cwd=Path(__file__).parent, env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        # Ждём, пока сервер начнёт отвечать
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                conn.request('GET', '/health')
+                conn.getresponse().read()
+                conn.close()
+                break
+            except OSError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError('gunicorn не запустился')
+                time.sleep(0.2)
+
+        local = threading.local()
+        peak_rss = [0.0]
+
+        def fetch(item):
+            group, url = item
+            conn = getattr(local, 'conn', None)
+            if conn is None:
+                conn = local.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            results = []
+            pages = 3 if group == 'movies_cursor' else 1
+            for _ in range(pages):
+                request_started = time.perf_counter()
+                try:
+                    conn.request('GET', url)
+                    response = conn.getresponse()
+                    body = response.read()
+                    ok = response.status in (200, 304)
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    local.conn = None
+                    body, ok = b'', False
+                results.append((group, time.perf_counter() - request_started, ok))
+                if group != 'movies_cursor' or not ok:
+                    break
+                url = next_cursor_url(url, body)
+                if url is None:
+                    break
+            return results
+
+        def watch_memory(stop):
+            while not stop.wait(0.5):
+                rss = process_tree_rss_mb(server.pid)
+                if rss is not None:
+                    peak_rss[0] = max(peak_rss[0], rss)
+
+        stop = threading.Event()
+        watcher = threading.Thread(target=watch_memory, args=(stop,), daemon=True)
+        watcher.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = [sample for batch in executor.map(fetch, requests) for sample in batch]
+        wall = time.perf_counter() - started
+        stop.set()
+        watcher.join()
+        return summarize(samples, wall), {'peak_rss_mb': peak_rss[0] or None}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def print_report(title, summary, memory):
+    print(f"\n📊 {title}  (пиковая память: {memory['peak_rss_mb']} МБ)")
+    print(f"{'группа':<16} {'запросов':>9} {'ошибок':>7} {'зап/с':>9} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+    for group in sorted(summary, key=lambda name: (name == 'all', name)):
+        row = summary[group]
+        print(f"{group:<16} {row['requests']:>9} {row['errors']:>7} {row['rps']:>9} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """Печатает изменения p95 и пропускной способности. Возвращает число регрессий."""
+    regressions = 0
+    print(f"\n📐 Сравнение с базовой линией (порог {threshold}%)")
+    for key, run in results.items():
+        base_run = baseline.get(key)
+        if base_run is None:
+            print(f"   {key}: нет в базовой линии")
+            continue
+        for group, row in run['summary'].items():
+            base = base_run['summary'].get(group)
+            if base is None or not base['p95_ms']:
+                continue
+            change = (row['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100
+            mark = '✅'
+            if change > threshold:
+                mark = '❌'
+                regressions += 1
+            print(f"   {mark} {key} {group:<16} p95 {base['p95_ms']:>9} -> {row['p95_ms']:>9} мс ({change:+.1f}%), "
+                  f"зап/с {base['rps']} -> {row['rps']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000', help='размеры каталога через запятую')
+    parser.add_argument('--mode', choices=['client', 'server', 'both'], default='client')
+    parser.add_argument('--requests', type=int, default=2000, help='запросов на прогон')
+    parser.add_argument('--workers', type=int, default=4, help='процессов gunicorn (режим server)')
+    parser.add_argument('--threads', type=int, default=4, help='потоков на процесс gunicorn')
+    parser.add_argument('--concurrency', type=int, default=16, help='параллельных клиентов (режим server)')
+    parser.add_argument('--no-cache', action='store_true', help='отключить кэш ответов и COUNT')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cache-dir', help='куда сохранять сгенерированные базы')
+    parser.add_argument('--output', help='сохранить результаты в JSON')
+    parser.add_argument('--save-baseline', help='сохранить результаты как базовую линию')
+    parser.add_argument('--baseline', help='сравнить с базовой линией')
+    parser.add_argument('--threshold', type=float, default=20.0, help='допустимый рост p95, %%')
+    args = parser.parse_args()
+
+    # Фоновый пересчёт похожих фильмов исказил бы замеры
+    os.environ['SIMILAR_ON_LOAD'] = 'false'
+    Config.SIMILAR_ON_LOAD = False
+
+    if args.no_cache:
+        os.environ['RESPONSE_CACHE_SIZE'] = os.environ['COUNT_CACHE_SIZE'] = '0'
+        movies_app._response_cache.max_size = 0
+        Config.COUNT_CACHE_SIZE = 0
+
+    tmp_dir = None
+    if args.cache_dir:
+        cache_dir = Path(args.cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+    else:
+        cache_dir = tmp_dir = Path(tempfile.mkdtemp(prefix='movies_benchmark_'))
+
+    modes = ['client', 'server'] if args.mode == 'both' else [args.mode]
+    results = {}
+    try:
+        for size in [int(value) for value in args.sizes.split(',')]:
+            db_path = build_catalog(size, args.seed, cache_dir)
+            requests = build_requests(db_path, args.requests, args.seed)
+            for mode in modes:
+                if mode == 'client':
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        summary, memory = run_client(db_path, requests)
+                    title = f"{size} фильмов, test client"
+                else:
+                    summary, memory = run_server(db_path, requests, args.workers, args.threads, args.concurrency)
+                    title = f"{size} фильмов, gunicorn {args.workers}x{args.threads}, клиентов {args.concurrency}"
+                print_report(title, summary, memory)
+                results[f"{size}/{mode}"] = {'summary': summary, 'memory': memory}
+    finally:
+        movies_app.db_pool.close_all()
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for target in (args.output, args.save_baseline):
+        if target:
+            Path(target).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+            print(f"💾 Результаты сохранены: {target}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        if compare_with_baseline(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""Сборка статики фронтенда: минификация, хэш в имени файла, .gz и .br варианты.
+
+Запуск (из папки backend):
+    python build_assets.py              # frontend/ -> frontend/dist/
+    python build_assets.py --no-minify  # только хэши и сжатие
+
+Каждый файл фронтенда (кроме index.html) минифицируется и сохраняется под
+именем с хэшем содержимого: script.js -> script.3f2a9c1b7e.js. Рядом кладутся
+script.3f2a9c1b7e.js.gz и .br (brotli - если модуль установлен). В
+index.html ссылки на файлы заменяются хэшированными именами, а manifest.json
+описывает всё собранное.
+
+Сервер (app.py) при старте читает manifest.json и все варианты в память
+(load_assets): на запрос файл выбирается по словарю, без обращений к
+диску, сжатый вариант - по Accept-Encoding. Имена с хэшем меняются вместе
+с содержимым, поэтому отдаются с Cache-Control immutable на год, а
+index.html - с no-cache и ETag. Если dist/ нет, сервер отдаёт исходные
+файлы как раньше.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import re
+import shutil
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # без brotli - только .gz
+    brotli = None
+
+FRONTEND_DIR = Path(__file__).parent.parent / 'frontend'
+DIST_NAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Что сжимать заранее (картинки и шрифты уже сжаты)
+COMPRESSIBLE_SUFFIXES = {'.js', '.css', '.html', '.svg', '.json', '.txt'}
+# Меньше этого сжатие не окупается
+MIN_COMPRESS_SIZE = 256
+
+# Кодировки вариантов: Content-Encoding -> расширение файла
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE = re.compile(r'\s+')
+# Без "+": в calc() пробелы вокруг него обязательны. Без ":": в селекторе
+# "a :hover" пробел перед ним значимый (потомок, а не псевдокласс самого a)
+_CSS_PUNCT = re.compile(r'\s*([{};,>~])\s*')
+# После ":" пробел не значим ни в объявлении, ни в селекторе
+_CSS_COLON = re.compile(r':\s+')
+# Символы, вокруг которых пробелы в JS не нужны. Без "+" и "-": "a + +b" и "a - -b"
+_JS_PUNCT = set('{}()[];,:=<>!&|?')
+
+
+def minify_css(text):
+    """Убирает комментарии и лишние пробелы. Строки в CSS фронтенда без значимых пробелов"""
+    text = _CSS_COMMENT.sub('', text)
+    text = _CSS_SPACE.sub(' ', text)
+    text = _CSS_PUNCT.sub(r'\1', text)
+    text = _CSS_COLON.sub(':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """Консервативная минификация: комментарии, отступы и пробелы у скобок и операторов.
+
+    Строки, шаблоны (`...${...}...`) и регулярные выражения переносятся
+    как есть. Переводы строк сохраняются - автоматическая расстановка
+    точек с запятой работает так же, как в исходнике.
+    """
+    out = []
+    i = 0
+    length = len(text)
+    # Стек вложенности: '`' - внутри шаблона, '{' - внутри ${...} или обычного блока в нём
+    stack = []
+    pending_space = False
+    pending_newline = False
+
+    def last_char():
+        return out[-1][-1] if out and out[-1] else ''
+
+    def emit(chunk):
+        nonlocal pending_space, pending_newline
+        if out:
+            if pending_newline and last_char() != '\n':
+                out.append('\n')
+            elif pending_space and last_char() not in _JS_PUNCT and chunk[0] not in _JS_PUNCT:
+                out.append(' ')
+        pending_space = pending_newline = False
+        out.append(chunk)
+
+    def read_template(start):
+        """Текст шаблона от start до "`" или "${" (не включая). Возвращает (текст, конец)"""
+        j = start
+        while j < length:
+            char = text[j]
+            if char == '\\':
+                j += 2
+                continue
+            if char == '`' or text.startswith('${', j):
+                break
+            j += 1
+        return text[start:j], j
+
+    while i < length:
+        if stack and stack[-1] == '`':
+            chunk, i = read_template(i)
+            out.append(chunk)
+            if i >= length:
+                break
+            if text[i] == '`':
+                stack.pop()
+                out.append('`')
+                i += 1
+            else:
+                stack.append('${')
+                out.append('${')
+                i += 2
+            continue
+
+        char = text[i]
+        if char in ' \t\r':
+            pending_space = True
+            i += 1
+        elif char == '\n':
+            pending_newline = True
+            i += 1
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = length if end == -1 else end
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+            pending_space = True
+        elif char in '\'"':
+            j = i + 1
+            while j < length and text[j] != char:
+                j += 2 if text[j] == '\\' else 1
+            emit(text[i:j + 1])
+            i = j + 1
+        elif char == '`':
+            emit('`')
+            stack.append('`')
+            i += 1
+        elif char == '/' and (not out or last_char() in '(,=:[!&|?{};\n'):
+            # Регулярное выражение: после оператора "/" не может быть делением
+            j = i + 1
+            in_class = False
+            while j < length and (in_class or text[j] != '/'):
+                if text[j] == '\\':
+                    j += 1
+                elif text[j] == '[':
+                    in_class = True
+                elif text[j] == ']':
+                    in_class = False
+                j += 1
+            j += 1
+            while j < length and text[j].isalpha():
+                j += 1
+            emit(text[i:j])
+            i = j
+        else:
+            if char == '{' and stack:
+                stack.append('{')
+            elif char == '}' and stack:
+                opened = stack.pop()
+                if opened == '${':
+                    # Конец подстановки - дальше снова текст шаблона
+                    pending_space = pending_newline = False
+                    out.append('}')
+                    i += 1
+                    continue
+            if char in _JS_PUNCT:
+                # Пробел перед знаком не нужен, перевод строки - сохраняем
+                pending_space = False
+            emit(char)
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def compress_variants(data):
+    """{кодировка: байты} для сжатых вариантов, которые меньше исходника"""
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+
+def build(source=FRONTEND_DIR, minify=True):
+    """Собирает source/ в source/dist/ и возвращает манифест"""
+    source = Path(source)
+    dist = source / DIST_NAME
+    if dist.exists():
+        shutil.rmtree(dist)
+    dist.mkdir()
+
+    manifest = {'files': {}, 'index': 'index.html'}
+    renames = {}
+    for path in sorted(source.rglob('*')):
+        if not path.is_file() or dist in path.parents or path.name == 'index.html':
+            continue
+        name = path.relative_to(source).as_posix()
+        data = path.read_bytes()
+        minifier = MINIFIERS.get(path.suffix) if minify else None
+        if minifier is not None:
+            data = minifier(data.decode('utf-8')).encode('utf-8')
+        hashed = f'{path.with_suffix("").relative_to(source).as_posix()}.{content_hash(data)}{path.suffix}'
+        manifest['files'][hashed] = write_asset(dist / hashed, data, original=name)
+        renames[name] = hashed
+
+    # index.html: ссылки на собранные файлы (href="style.css" -> href="style.<хэш>.css")
+    html = (source / 'index.html').read_text(encoding='utf-8')
+    for name, hashed in renames.items():
+        html = re.sub(rf'''((?:src|href)=["'])(?:\./|/)?{re.escape(name)}(["'])''', rf'\g<1>/{hashed}\g<2>', html)
+    manifest['files']['index.html'] = write_asset(dist / 'index.html', html.encode('utf-8'), original='index.html')
+    manifest['renames'] = renames
+
+    (dist / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+    return manifest
+
+
+def write_asset(path, data, original):
+    """Пишет файл и его сжатые варианты, возвращает запись манифеста"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    entry = {
+        'source': original,
+        'size': len(data),
+        'etag': hashlib.sha256(data).hexdigest()[:32],
+        'encodings': {},
+    }
+    if path.suffix in COMPRESSIBLE_SUFFIXES and len(data) >= MIN_COMPRESS_SIZE:
+        for encoding, body in compress_variants(data).items():
+            path.with_name(path.name + ENCODINGS[encoding]).write_bytes(body)
+            entry['encodings'][encoding] = len(body)
+    return entry
+
+
+class StaticAsset:
+    """Собранный файл в памяти: тело, сжатые варианты, заголовки"""
+
+    __slots__ = ('body', 'variants', 'mimetype', 'etag', 'immutable')
+
+    def __init__(self, body, variants, mimetype, etag, immutable):
+        self.body = body
+        self.variants = variants
+        self.mimetype = mimetype
+        self.etag = etag
+        self.immutable = immutable
+
+
+def load_assets(dist):
+    """Читает dist/ по манифесту: {путь в URL: StaticAsset} или None, если сборки нет.
+
+    Исходные имена (script.js) тоже доступны - для страниц, открытых до
+    сборки, - но без immutable: их содержимое может смениться.
+    """
+    dist = Path(dist)
+    manifest_path = dist / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    assets = {}
+    for name, entry in manifest['files'].items():
+        path = dist / name
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if mimetype.startswith('text/') or mimetype == 'application/javascript':
+            mimetype += '; charset=utf-8'
+        variants = {encoding: path.with_name(path.name + ENCODINGS[encoding]).read_bytes()
+                    for encoding in entry['encodings']}
+        immutable = name != manifest['index']
+        assets[name] = StaticAsset(path.read_bytes(), variants, mimetype, f'"{entry["etag"]}"', immutable)
+    for name, hashed in manifest.get('renames', {}).items():
+        asset = assets[hashed]
+        assets.setdefault(name, StaticAsset(asset.body, asset.variants, asset.mimetype, asset.etag, False))
+    return assets
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=str(FRONTEND_DIR), help='папка фронтенда')
+    parser.add_argument('--no-minify', action='store_true', help='не минифицировать JS и CSS')
+    args = parser.parse_args()
+
+    manifest = build(args.source, minify=not args.no_minify)
+    for name, entry in manifest['files'].items():
+        sizes = ', '.join(f'{encoding} {size}' for encoding, size in entry['encodings'].items())
+        print(f"📦 {name}: {entry['size']} байт" + (f" ({sizes})" if sizes else ''))
+    print(f"✅ Сборка готова: {Path(args.source) / DIST_NAME}")
@@ -0,0 +1,196 @@
+"""Колоночный каталог в памяти для фильтрации и сортировки /api/movies.
+
+Колонки таблицы movies загружаются в массивы NumPy один раз (при старте
+и после перезагрузки данных). Фильтры считаются векторными масками, а
+порядок сортировки для каждого поля вычисляется заранее, поэтому страница
+отбирается за один проход без сортировки на каждый запрос.
+
+Результат совпадает с SQL версией в app.py: те же условия, NULL меньше
+любых значений, при равенстве сортировка по id в том же направлении.
+"""
+import numpy as np
+
+# Биты платформ в маске
+PLATFORM_BITS = {
+    'netflix': 1,
+    'amazon': 2,
+    'imdb': 4,
+}
+
+SORT_FIELDS = ['title', 'release_year', 'imdb_rating', 'num_sources', 'weighted_rating']
+
+
+class UnsupportedQuery(Exception):
+    """Каталог нельзя построить или запрос нельзя выполнить в памяти - нужно идти в SQLite"""
+
+
+def _numeric_column(values):
+    """Числовая колонка: (значения float64, маска не-NULL).
+
+    Текст в числовой колонке SQLite сортирует иначе, чем числа, поэтому
+    такие данные движок не поддерживает.
+    """
+    column = np.zeros(len(values), dtype=np.float64)
+    present = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        if value is None:
+            continue
+        if isinstance(value, (str, bytes)):
+            raise UnsupportedQuery('В числовой колонке есть текст')
+        column[i] = value
+        present[i] = True
+    return column, present
+
+
+class CatalogEngine:
+    """Каталог фильмов в виде колонок NumPy"""
+
+    def __init__(self, rows, data_version=None):
+        """rows - последовательность (id, title, release_year, imdb_rating,
+        num_sources, genre, source_mask, weighted_rating)"""
+        self.data_version = data_version
+        rows = list(rows)
+        self.size = len(rows)
+
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.release_year, year_present = _numeric_column([row[2] for row in rows])
+        self.imdb_rating, rating_present = _numeric_column([row[3] for row in rows])
+        num_sources, sources_present = _numeric_column([row[4] for row in rows])
+        weighted_rating, weighted_present = _numeric_column([row[7] for row in rows])
+        self.present = {
+            'release_year': year_present,
+            'imdb_rating': rating_present,
+            'num_sources': sources_present,
+            'weighted_rating': weighted_present,
+        }
+
+        # Платформы: битовая маска movies.source_mask (те же биты, что app.SOURCE_BITS)
+        self.platforms = np.array([row[6] or 0 for row in rows], dtype=np.uint8)
+
+        # Жанры: строка "Comedy, Drama" разбивается один раз, на жанр - булев массив
+        self.genres = {}
+        self.genre_names = {}
+        for i, row in enumerate(rows):
+            if not row[5]:
+                continue
+            for name in row[5].split(','):
+                key = name.strip().lower()
+                if not key:
+                    continue
+                bitmap = self.genres.get(key)
+                if bitmap is None:
+                    bitmap = self.genres[key] = np.zeros(self.size, dtype=bool)
+                    self.genre_names[key] = name.strip()
+                bitmap[i] = True
+
+        # Названия сортируются по кодовым точкам, как BINARY сравнение в SQLite
+        titles = np.array([row[1] if row[1] is not None else '' for row in rows], dtype=str)
+        title_present = np.array([row[1] is not None for row in rows], dtype=bool)
+        title_rank = np.unique(titles, return_inverse=True)[1] if self.size else np.zeros(0)
+        self.present['title'] = title_present
+
+        # Порядок по возрастанию (NULL, значение, id); по убыванию - тот же, развёрнутый
+        sort_keys = {
+            'title': title_rank,
+            'release_year': self.release_year,
+            'imdb_rating': self.imdb_rating,
+            'num_sources': num_sources,
+            'weighted_rating': weighted_rating,
+        }
+        self.orders = {}
+        for field in SORT_FIELDS:
+            self.orders[field] = np.lexsort((self.ids, sort_keys[field], self.present[field]))
+
+    @classmethod
+    def from_connection(cls, conn, data_version=None):
+        """Загружает каталог из таблицы movies"""
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, title, release_year, imdb_rating, num_sources,
+                   genre, source_mask, weighted_rating
+            FROM movies
+        """)
+        return cls(cursor.fetchall(), data_version)
+
+    def filter_mask(self, args):
+        """Маска фильмов под фильтрами /api/movies (кроме поиска)"""
+        mask = np.ones(self.size, dtype=bool)
+
+        # Жанры сравниваются целиком без учёта регистра, как в таблице genres
+        names = {}
+        for value in args.getlist('genre'):
+            for name in value.split(','):
+                if name.strip():
+                    names[name.strip().lower()] = True
+        if names:
+            match_all = args.get('genre_mode', 'or').lower() == 'and'
+            genre_mask = np.full(self.size, match_all, dtype=bool)
+            for name in names:
+                bitmap = self.genres.get(name)
+                if bitmap is None:
+                    bitmap = np.zeros(self.size, dtype=bool)
+                if match_all:
+                    genre_mask &= bitmap
+                else:
+                    genre_mask |= bitmap
+            mask &= genre_mask
+
+        year_from = args.get('year_from', '').strip()
+        if year_from:
+            mask &= self.present['release_year'] & (self.release_year >= int(year_from))
+
+        year_to = args.get('year_to', '').strip()
+        if year_to:
+            mask &= self.present['release_year'] & (self.release_year <= int(year_to))
+
+        min_rating = args.get('min_rating', '').strip()
+        if min_rating:
+            mask &= self.present['imdb_rating'] & (self.imdb_rating >= float(min_rating))
+
+        wanted = 0
+        for platform in args.getlist('sources'):
+            wanted |= PLATFORM_BITS.get(platform, 0)
+        if wanted:
+            mask &= (self.platforms & wanted) != 0
+
+        return mask
+
+    def query(self, args, sort_by, sort_order, offset, limit):
+        """Фильтрует, сортирует и отбирает страницу.
+
+        Возвращает (total, ids страницы, есть ли следующая страница).
+        """
+        if sort_by in SORT_FIELDS:
+            order = self.orders[sort_by]
+            if sort_order == 'DESC':
+                order = order[::-1]
+        else:
+            order = self.orders['imdb_rating'][::-1]
+
+        mask = self.filter_mask(args)
+        selected = order[mask[order]]
+        total = len(selected)
+        page = selected[offset:offset + limit]
+        return total, self.ids[page].tolist(), offset + limit < total
+
+    def facet_counts(self, args, names):
+        """{фасет: {значение: количество}} по фильмам под фильтрами (как app.count_facets)"""
+        mask = self.filter_mask(args)
+        counts = {}
+        if 'genre' in names:
+            counts['genre'] = {self.genre_names[key]: int(np.count_nonzero(bitmap & mask))
+                               for key, bitmap in self.genres.items()}
+        if 'year' in names:
+            years, year_counts = np.unique(self.release_year[mask & self.present['release_year']],
+                                           return_counts=True)
+            counts['year'] = {int(year): int(count) for year, count in zip(years, year_counts)}
+        if 'rating_bucket' in names:
+            # Целая часть рейтинга, 10 - "10 и выше" (как в catalog_stats)
+            buckets = np.minimum(np.trunc(self.imdb_rating[mask & self.present['imdb_rating']]), 10)
+            values, bucket_counts = np.unique(buckets, return_counts=True)
+            counts['rating_bucket'] = {int(value): int(count) for value, count in zip(values, bucket_counts)}
+        if 'platform' in names:
+            selected = self.platforms[mask]
+            counts['platform'] = {platform: int(np.count_nonzero(selected & bit))
+                                  for platform, bit in PLATFORM_BITS.items()}
+        return counts
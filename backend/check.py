@@ -1,4 +1,3 @@
-import pandas as pd
 from pathlib import Path
 
 DATA_DIR = Path(__file__).parent.parent / 'data'
@@ -9,6 +8,8 @@ print(f"Файл существует: {csv_file.exists()}")
 
 if csv_file.exists():
     try:
+        # pandas грузится долго, поэтому только когда есть что читать
+        import pandas as pd
         df = pd.read_csv(csv_file, encoding='utf-8-sig')
         print(f"✅ CSV прочитан успешно!")
         print(f"Размер: {len(df)} строк, {len(df.columns)} колонок")
@@ -7,4 +7,99 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-123'
     SQLALCHEMY_DATABASE_URI = 'sqlite:///movies.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    DEBUG = True
\ No newline at end of file
+    DEBUG = True
+
+    # Путь к базе SQLite (по умолчанию backend/database/movies.db)
+    DATABASE_PATH = os.environ.get('DATABASE_PATH')
+
+    # Готовый снимок базы (по умолчанию backend/database/movies.snapshot.db, собирается
+    # python app.py --build-snapshot): 'copy' - восстановить из него отсутствующую базу,
+    # 'readonly' - работать прямо со снимком только на чтение, 'memory' - скопировать снимок в память
+    DATABASE_SNAPSHOT = os.environ.get('DATABASE_SNAPSHOT')
+    SNAPSHOT_MODE = os.environ.get('SNAPSHOT_MODE', 'copy')
+
+    # Пул подключений к SQLite
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 16384))
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024))
+
+    # Кэш количества фильмов для /api/movies
+    COUNT_CACHE_SIZE = int(os.environ.get('COUNT_CACHE_SIZE', 1024))
+    COUNT_ESTIMATE_LIMIT = int(os.environ.get('COUNT_ESTIMATE_LIMIT', 1000))
+
+    # Движок фильтрации /api/movies: 'sql' - SQLite, 'memory' - колоночный каталог в памяти
+    CATALOG_ENGINE = os.environ.get('CATALOG_ENGINE', 'sql')
+
+    # Подсказки поиска из индекса в памяти (false - запросы к SQLite)
+    SUGGEST_INDEX = os.environ.get('SUGGEST_INDEX', 'true').lower() == 'true'
+
+    # Поиск с опечатками (fuzzy=true): n-граммный индекс по title и дополнительным колонкам
+    FUZZY_SEARCH = os.environ.get('FUZZY_SEARCH', 'true').lower() == 'true'
+    FUZZY_EXTRA_FIELDS = [name for name in os.environ.get('FUZZY_EXTRA_FIELDS', '').split(',') if name]
+    FUZZY_MAX_RESULTS = int(os.environ.get('FUZZY_MAX_RESULTS', 1000))
+
+    # Похожие фильмы (/api/movies/<id>/similar): соседей на фильм, процессов для пересчёта,
+    # пересчёт в фоне после загрузки данных, доля новых фильмов, после которой всё считается заново
+    SIMILAR_TOP_K = int(os.environ.get('SIMILAR_TOP_K', 10))
+    SIMILAR_WORKERS = int(os.environ.get('SIMILAR_WORKERS', os.cpu_count() or 1))
+    SIMILAR_ON_LOAD = os.environ.get('SIMILAR_ON_LOAD', 'true').lower() == 'true'
+    SIMILAR_REBUILD_RATIO = float(os.environ.get('SIMILAR_REBUILD_RATIO', 0.3))
+
+    # Кэш постеров (/api/posters/<id>): каталог (по умолчанию backend/cache/posters), предел размера,
+    # ширины миниатюр, потоки загрузки, таймаут, подмена хоста источника, max-age ответов
+    POSTER_CACHE_DIR = os.environ.get('POSTER_CACHE_DIR')
+    POSTER_CACHE_MB = int(os.environ.get('POSTER_CACHE_MB', 512))
+    POSTER_WIDTHS = [int(width) for width in os.environ.get('POSTER_WIDTHS', '150,300,600').split(',') if width]
+    POSTER_WORKERS = int(os.environ.get('POSTER_WORKERS', 4))
+    POSTER_TIMEOUT = float(os.environ.get('POSTER_TIMEOUT', 10))
+    # Сколько запрос ждёт загрузку постера при промахе кэша, дальше - заглушка
+    POSTER_WAIT = float(os.environ.get('POSTER_WAIT', 0.2))
+    POSTER_ORIGIN = os.environ.get('POSTER_ORIGIN')
+    POSTER_MAX_AGE = int(os.environ.get('POSTER_MAX_AGE', 7 * 24 * 3600))
+
+    # Кэш ответов /api/genres, /api/stats, /api/movies
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 256))
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+    RESPONSE_CACHE_MAX_AGE = int(os.environ.get('RESPONSE_CACHE_MAX_AGE', 60))
+    DATA_VERSION_CHECK_INTERVAL = float(os.environ.get('DATA_VERSION_CHECK_INTERVAL', 1.0))
+
+    # Сжатие ответов API (gzip, brotli при наличии модуля)
+    RESPONSE_COMPRESSION = os.environ.get('RESPONSE_COMPRESSION', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+
+    # Собранная статика фронтенда (python build_assets.py), по умолчанию frontend/dist.
+    # Без сборки фронтенд отдаётся из исходных файлов
+    FRONTEND_DIST = os.environ.get('FRONTEND_DIST')
+
+    # Взвешенный рейтинг (sort_by=weighted_rating): сколько голосов весит средний рейтинг
+    # каталога, 0 - медиана голосов
+    WEIGHTED_RATING_MIN_VOTES = int(os.environ.get('WEIGHTED_RATING_MIN_VOTES', 0))
+
+    # Размер пачки строк при загрузке CSV
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 5000))
+
+    # Сборка каталога из выгрузок Netflix, Amazon и IMDb (ingest.py): процессов для
+    # нормализации и сопоставления, строк в пачке, отдаваемой процессу
+    INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', os.cpu_count() or 1))
+    INGEST_CHUNK_SIZE = int(os.environ.get('INGEST_CHUNK_SIZE', 2000))
+
+    # Размер пачки строк (fetchmany) при потоковой выгрузке
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+    # Максимум значений в одном запросе /api/movies/batch
+    BATCH_MAX_IDS = int(os.environ.get('BATCH_MAX_IDS', 100))
+
+    # Метрики (/metrics): SQL через инструментированные подключения, доля EXPLAIN QUERY PLAN,
+    # порог печати медленных запросов (0 - не печатать); X-Profile включает cProfile запроса
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_PLAN_SAMPLE_RATE = float(os.environ.get('METRICS_PLAN_SAMPLE_RATE', 0.01))
+    METRICS_QUERY_LABEL_LENGTH = int(os.environ.get('METRICS_QUERY_LABEL_LENGTH', 240))
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+
+    # ASGI режим (asgi.py): потоков на процесс, предел очереди, объединение одинаковых GET
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS', DB_POOL_SIZE))
+    ASGI_MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', 256))
+    ASGI_COALESCE = os.environ.get('ASGI_COALESCE', 'true').lower() == 'true'
@@ -0,0 +1,222 @@
+"""Поиск с опечатками: n-граммный индекс слов и ограниченное расстояние Левенштейна.
+
+Слова названий (и, если заданы, других текстовых колонок) нормализуются
+так же, как в подсказках (suggest.tokenize): без регистра и диакритики,
+кириллица транслитерирована. Индексируются не фильмы, а словарь различных
+слов: триграмма (для коротких слов - биграмма) -> номера слов. Для слова
+запроса кандидаты - слова, у которых общих n-грамм не меньше, чем может
+остаться после k правок, и длина отличается не больше чем на k. Кандидаты проверяются расстоянием Левенштейна с
+отсечением по k (перестановка соседних букв - одна правка), найденные слова переводятся в фильмы.
+
+Фильм подходит, если каждое слово запроса нашлось в нём; порядок -
+по сумме расстояний, затем по рейтингу.
+"""
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from suggest import tokenize
+
+
+def allowed_edits(word):
+    """Сколько опечаток допускается в слове запроса такой длины"""
+    if len(word) <= 3:
+        return 0
+    if len(word) <= 8:
+        return 1
+    return 2
+
+
+def ngrams(word, size):
+    """N-граммы слова с границами (для 3: "$ab", "abc", "bc$")"""
+    padded = f'${word}$'
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+def gram_size(word):
+    """В коротких словах триграмм слишком мало, чтобы пережить опечатку - берём биграммы"""
+    return 2 if len(word) <= 5 else 3
+
+
+def bounded_distance(a, b, limit):
+    """Расстояние Левенштейна с перестановкой соседних букв ("lvoe" -> "love" - одна правка).
+
+    Возвращает limit + 1, если расстояние больше limit. Считается только
+    полоса |i - j| <= limit (за её пределами расстояние заведомо больше),
+    счёт прекращается, как только две строки подряд целиком больше limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+    big = limit + 1
+    size = len(a)
+    before = None
+    previous = [i if i <= limit else big for i in range(size + 1)]
+    previous_min = 0
+    for j, char_b in enumerate(b, 1):
+        current = [big] * (size + 1)
+        if j <= limit:
+            current[0] = j
+        row_min = current[0]
+        for i in range(max(1, j - limit), min(size, j + limit) + 1):
+            char_a = a[i - 1]
+            value = previous[i - 1] + (char_a != char_b)
+            if previous[i] + 1 < value:
+                value = previous[i] + 1
+            if current[i - 1] + 1 < value:
+                value = current[i - 1] + 1
+            if before is not None and i > 1 and char_a == b[j - 2] and a[i - 2] == char_b and before[i - 2] + 1 < value:
+                value = before[i - 2] + 1
+            if value > big:
+                value = big
+            current[i] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit and previous_min > limit:
+            return big
+        before, previous, previous_min = previous, current, row_min
+    return previous[-1] if previous[-1] <= limit else big
+
+
+class FuzzyIndex:
+    """N-граммный индекс словаря слов с переходом к фильмам"""
+
+    def __init__(self, movies, version=None):
+        """movies - строки (id, title, release_year, imdb_rating, дополнительный текст...)"""
+        self.version = version
+        # Фильмы по убыванию рейтинга (NULL в конце): номер фильма = его ранг
+        ordered = sorted(movies, key=lambda row: (row[3] is None, -(row[3] or 0), row[0]))
+        self.movies = [(row[0], row[1], row[2]) for row in ordered]
+
+        self.words = []
+        word_ids = {}
+        title_docs = []
+        extra_docs = []
+        for rank, row in enumerate(ordered):
+            title_words = set(tokenize(row[1]))
+            extra_words = set()
+            for text in row[4:]:
+                extra_words.update(tokenize(text))
+            extra_words -= title_words
+            for postings, words in ((title_docs, title_words), (extra_docs, extra_words)):
+                for word in words:
+                    word_id = word_ids.get(word)
+                    if word_id is None:
+                        word_id = word_ids[word] = len(self.words)
+                        self.words.append(word)
+                        title_docs.append(array('i'))
+                        extra_docs.append(array('i'))
+                    postings[word_id].append(rank)
+        self.word_ids = word_ids
+        self.title_docs = title_docs
+        self.extra_docs = extra_docs
+
+        # Словарь по алфавиту - для коротких префиксов при наборе
+        self.sorted_words = sorted(self.words)
+
+        grams = defaultdict(lambda: array('i'))
+        for word_id, word in enumerate(self.words):
+            for gram in ngrams(word, 2) | ngrams(word, 3):
+                grams[gram].append(word_id)
+        self.grams = dict(grams)
+
+    @classmethod
+    def from_connection(cls, conn, version=None, extra_columns=()):
+        cursor = conn.cursor()
+        columns = ', '.join(('id', 'title', 'release_year', 'imdb_rating') + tuple(extra_columns))
+        cursor.execute(f"SELECT {columns} FROM movies")
+        return cls([tuple(row) for row in cursor.fetchall()], version)
+
+    def __len__(self):
+        return len(self.movies)
+
+    def match_words(self, word, prefix=False):
+        """{номер слова словаря: расстояние} для слова запроса.
+
+        prefix=True - слово ещё набирается: сравнивается с началом слов словаря.
+        """
+        limit = allowed_edits(word)
+        exact = self.word_ids.get(word)
+        if limit == 0:
+            if not prefix:
+                return {exact: 0} if exact is not None else {}
+            # Короткое начало слова - точный префикс по алфавитному словарю
+            matches = {}
+            position = bisect_left(self.sorted_words, word)
+            while position < len(self.sorted_words) and self.sorted_words[position].startswith(word):
+                matches[self.word_ids[self.sorted_words[position]]] = 0
+                position += 1
+            return matches
+
+        # Фильтр по числу общих n-грамм (T-occurrence): правка портит не больше size + 1 n-грамм
+        size = gram_size(word)
+        query_grams = ngrams(word, size)
+        if prefix:
+            # У начала слова нет n-граммы с правой границей
+            query_grams = {gram for gram in query_grams if not gram.endswith('$')}
+        needed = max(1, len(query_grams) - (size + 1) * limit)
+        counts = defaultdict(int)
+        for gram in query_grams:
+            for word_id in self.grams.get(gram, ()):
+                counts[word_id] += 1
+
+        matches = {}
+        for word_id, count in counts.items():
+            if count < needed:
+                continue
+            candidate = self.words[word_id]
+            if prefix and len(candidate) > len(word):
+                # Начало слова той же длины или на k длиннее/короче - лучшее из вариантов
+                distance = min(bounded_distance(word, candidate[:length], limit)
+                               for length in range(max(1, len(word) - limit), len(word) + limit + 1))
+            else:
+                distance = bounded_distance(word, candidate, limit)
+            if distance <= limit:
+                matches[word_id] = distance
+        if exact is not None:
+            matches[exact] = 0
+        return matches
+
+    def search(self, query, limit=10, extra=False, prefix=False):
+        """Ранги фильмов, где нашлось каждое слово запроса, лучшие первыми.
+
+        extra=True - искать и в дополнительных колонках. prefix=True -
+        последнее слово сравнивается с началом слов (для подсказок).
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+
+        scores = None
+        for position, word in enumerate(words):
+            matches = self.match_words(word, prefix=prefix and position == len(words) - 1)
+            best = {}
+            for word_id, distance in matches.items():
+                postings = [self.title_docs[word_id]]
+                if extra:
+                    postings.append(self.extra_docs[word_id])
+                for docs in postings:
+                    for rank in docs:
+                        if scores is not None and rank not in scores:
+                            continue
+                        if distance < best.get(rank, distance + 1):
+                            best[rank] = distance
+            if scores is None:
+                scores = best
+            else:
+                scores = {rank: scores[rank] + distance for rank, distance in best.items()}
+            if not scores:
+                return []
+
+        return sorted(scores, key=lambda rank: (scores[rank], rank))[:limit]
+
+    def search_ids(self, query, limit=1000, extra=False):
+        """id фильмов для /api/movies в порядке релевантности"""
+        return [self.movies[rank][0] for rank in self.search(query, limit, extra)]
+
+    def suggestions(self, query, limit=10):
+        """Подсказки в формате /api/search/suggestions"""
+        return [{'id': movie_id, 'title': title, 'release_year': release_year}
+                for movie_id, title, release_year
+                in (self.movies[rank] for rank in self.search(query, limit, prefix=True))]
@@ -0,0 +1,487 @@
+"""Сборка каталога movies из исходных выгрузок Netflix, Amazon Prime и IMDb.
+
+Запуск (из папки backend):
+    python ingest.py --imdb title.basics.tsv.gz --imdb-ratings title.ratings.tsv.gz \\
+        --netflix netflix_titles.csv --amazon amazon_prime_titles.csv
+    python ingest.py ... --workers 8 --require imdb   # только фильмы, найденные в IMDb
+    python ingest.py ... --dry-run                    # сопоставить и показать статистику
+
+Форматы: Netflix и Amazon - CSV вида show_id, type, title, director, cast,
+country, date_added, release_year, rating, duration, listed_in, description.
+IMDb - title.basics.tsv (tconst, titleType, primaryTitle, startYear, genres)
+с рейтингами из title.ratings.tsv или CSV в духе OMDb (imdb_id, title, year,
+imdb_rating, imdb_votes, genre, plot, poster, language). Колонки ищутся по
+именам из FIELDS, файлы .gz читаются без распаковки. Сериалы пропускаются.
+
+Этапы:
+1. read - файлы читаются потоково пачками по chunk_size строк;
+2. normalize + match - в пуле процессов: название приводится к ключу
+   (normalize_title: без регистра, диакритики, пунктуации и начального
+   артикля), затем ищется группа - точно по (ключ, год), по тому же ключу
+   с годом +-1 и, если не нашлось, с опечатками: кандидаты того же года
+   +-1 по общим триграммам, проверка ограниченным расстоянием (fuzzy.py);
+3. merge - в основном процессе записи сливаются в группы. Первым идёт
+   IMDb (опорные записи), затем Netflix и Amazon; несопоставленные записи
+   образуют новые группы, и следующий источник сравнивается уже с ними;
+4. write - группы потоком пишутся в movies через app.import_rows (та же
+   атомарная замена таблицы, что и при загрузке CSV).
+
+canonical_key - "<ключ>_<год>", sources - "netflix,imdb,amazon" (как после
+normalize_sources). Для каждого этапа печатаются строки, секунды и строк в
+секунду; у этапов в пуле секунды - суммарное время процессов.
+"""
+import csv
+import gzip
+import multiprocessing
+import time
+from array import array
+from collections import defaultdict, deque
+from pathlib import Path
+
+from fuzzy import allowed_edits, bounded_distance, ngrams
+from suggest import tokenize
+
+# Поле записи -> возможные имена колонок в выгрузке
+FIELDS = {
+    'netflix': {
+        'id': ('show_id',),
+        'type': ('type',),
+        'title': ('title',),
+        'year': ('release_year',),
+        'director': ('director',),
+        'cast': ('cast',),
+        'country': ('country',),
+        'date_added': ('date_added',),
+        'rating': ('rating',),
+        'duration': ('duration',),
+        'listed_in': ('listed_in',),
+        'description': ('description',),
+    },
+    'imdb': {
+        'id': ('tconst', 'imdb_id', 'imdbID'),
+        'type': ('titleType', 'Type', 'type'),
+        'title': ('primaryTitle', 'title', 'Title'),
+        'original_title': ('originalTitle',),
+        'year': ('startYear', 'release_year', 'year', 'Year'),
+        'genre': ('genres', 'genre', 'Genre'),
+        'imdb_rating': ('averageRating', 'imdb_rating', 'imdbRating'),
+        'imdb_votes': ('numVotes', 'imdb_votes', 'imdbVotes'),
+        'description': ('plot', 'Plot', 'description'),
+        'poster_url': ('poster', 'Poster', 'poster_url'),
+        'language': ('language', 'Language'),
+    },
+}
+FIELDS['amazon'] = FIELDS['netflix']
+
+# Какие типы записей - фильмы (в нижнем регистре)
+MOVIE_TYPES = {'movie', 'tvmovie'}
+
+# Порядок обработки: IMDb - опорный источник с рейтингами и постерами
+SOURCE_ORDER = ('imdb', 'netflix', 'amazon')
+# Порядок в колонке sources (как в исходном каталоге)
+SOURCES_COLUMN_ORDER = ('netflix', 'imdb', 'amazon')
+
+# Начальные слова, которые не входят в ключ ("The Turning" и "Turning" - одно название)
+ARTICLES = {'the', 'a', 'an'}
+# Слова, которые пишут то словом, то знаком ("Fast & Furious")
+DROPPED_WORDS = {'and'}
+
+# Поля записей платформ - они же суффиксы колонок netflix_* и amazon_*
+PLATFORM_COLUMNS = ('id', 'director', 'cast', 'country', 'date_added', 'rating', 'duration', 'listed_in')
+
+OUTPUT_COLUMNS = [
+    'canonical_key', 'title', 'release_year', 'imdb_rating', 'imdb_votes', 'genre',
+    'description', 'poster_url', 'language', 'imdb_id', 'sources', 'num_sources',
+] + [f'{platform}_{column}' for platform in ('netflix', 'amazon') for column in PLATFORM_COLUMNS]
+
+
+def normalize_title(title):
+    """Ключ названия: "The Lord of the Rings: Return" -> "lord of the rings return" """
+    words = [word for word in tokenize(title) if word not in DROPPED_WORDS]
+    if len(words) > 1 and words[0] in ARTICLES:
+        words = words[1:]
+    return ' '.join(words)
+
+
+def parse_year(value):
+    """"1992", "1992.0", "1992–1995" -> 1992, пустое или мусор -> None"""
+    if not value:
+        return None
+    try:
+        return int(float(value[:4] if len(value) > 4 and not value[4].isdigit() else value))
+    except ValueError:
+        return None
+
+
+def parse_number(value, kind=float):
+    """Число из "6.7", "1,234", "N/A" (None)"""
+    if not value:
+        return None
+    try:
+        return kind(float(value.replace(',', '')))
+    except ValueError:
+        return None
+
+
+def open_text(path):
+    path = Path(path)
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8-sig', newline='')
+    return open(path, 'r', encoding='utf-8-sig', newline='')
+
+
+def make_reader(f, path):
+    """csv.reader с разделителем по расширению. TSV IMDb не экранирует кавычки"""
+    if '.tsv' in Path(path).suffixes:
+        return csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+    return csv.reader(f)
+
+
+def read_chunks(path, source, chunk_size, stats):
+    """Пачки сырых строк файла и позиции нужных колонок: (positions, rows)"""
+    started = time.perf_counter()
+    with open_text(path) as f:
+        reader = make_reader(f, path)
+        header = next(reader, [])
+        positions = {}
+        for field, names in FIELDS[source].items():
+            for name in names:
+                if name in header:
+                    positions[field] = header.index(name)
+                    break
+        if 'title' not in positions:
+            raise ValueError(f'В {path} нет колонки с названием ({", ".join(FIELDS[source]["title"])})')
+
+        chunk = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                stats.add('read', len(chunk), time.perf_counter() - started)
+                yield positions, chunk
+                chunk = []
+                started = time.perf_counter()
+        if chunk:
+            stats.add('read', len(chunk), time.perf_counter() - started)
+            yield positions, chunk
+
+
+def read_ratings(path, stats):
+    """title.ratings.tsv -> {tconst: (рейтинг, голоса)}"""
+    started = time.perf_counter()
+    ratings = {}
+    with open_text(path) as f:
+        reader = make_reader(f, path)
+        header = next(reader, [])
+        id_pos, rating_pos, votes_pos = (header.index(name) for name in ('tconst', 'averageRating', 'numVotes'))
+        for row in reader:
+            ratings[row[id_pos]] = (parse_number(row[rating_pos]), parse_number(row[votes_pos], int))
+    stats.add('ratings', len(ratings), time.perf_counter() - started)
+    return ratings
+
+
+def normalize_record(source, positions, row, ratings=None):
+    """Запись выгрузки -> словарь полей с ключом key и годом year. None - не фильм или без названия"""
+    record = {}
+    for field, position in positions.items():
+        value = row[position].strip() if position < len(row) else ''
+        if value and value != '\\N' and value != 'N/A':
+            record[field] = value
+    kind = record.pop('type', None)
+    if kind is not None and kind.lower() not in MOVIE_TYPES:
+        return None
+    title = record.get('title')
+    key = normalize_title(title) if title else ''
+    if not key and record.get('original_title'):
+        key = normalize_title(record['original_title'])
+    if not key:
+        return None
+    record['key'] = key
+    record['year'] = parse_year(record.get('year'))
+
+    if source == 'imdb':
+        if ratings is not None and 'id' in record and record['id'] in ratings:
+            record['imdb_rating'], record['imdb_votes'] = ratings[record['id']]
+        else:
+            record['imdb_rating'] = parse_number(record.get('imdb_rating'))
+            record['imdb_votes'] = parse_number(record.get('imdb_votes'), int)
+        if 'genre' in record:
+            # "Comedy,Drama" (IMDb) -> "Comedy, Drama" (как в каталоге)
+            record['genre'] = ', '.join(part.strip() for part in record['genre'].split(','))
+    return record
+
+
+class TitleBlocks:
+    """Индекс групп для сопоставления: точный (ключ, год) и триграммы ключей по годам"""
+
+    def __init__(self):
+        self.exact = {}
+        self.keys = []
+        self.years = []
+        self.grams = defaultdict(lambda: defaultdict(lambda: array('i')))
+
+    def add(self, key, year):
+        """Добавляет группу, возвращает её номер"""
+        group_id = len(self.keys)
+        self.keys.append(key)
+        self.years.append(year)
+        self.exact.setdefault((key, year), group_id)
+        if allowed_edits(key) and year is not None:
+            by_gram = self.grams[year]
+            for gram in ngrams(key, 3):
+                by_gram[gram].append(group_id)
+        return group_id
+
+    def find(self, key, year):
+        """(номер группы, способ: exact | year | fuzzy) или (None, None)"""
+        group_id = self.exact.get((key, year))
+        if group_id is not None:
+            return group_id, 'exact'
+        if year is None:
+            return None, None
+        for near in (year - 1, year + 1):
+            group_id = self.exact.get((key, near))
+            if group_id is not None:
+                return group_id, 'year'
+
+        limit = allowed_edits(key)
+        if limit == 0:
+            return None, None
+        query_grams = ngrams(key, 3)
+        # Правка портит не больше четырёх триграмм (как в fuzzy.FuzzyIndex.match_words)
+        needed = max(1, len(query_grams) - 4 * limit)
+        best = None
+        for near in (year, year - 1, year + 1):
+            by_gram = self.grams.get(near)
+            if not by_gram:
+                continue
+            # У кандидата не меньше needed общих триграмм, значит хотя бы одна из
+            # len - needed + 1 самых редких: остальные списки можно не читать
+            rare = sorted(query_grams, key=lambda gram: len(by_gram.get(gram, ())))
+            candidates = set()
+            for gram in rare[:len(rare) - needed + 1]:
+                candidates.update(by_gram.get(gram, ()))
+            for group_id in candidates:
+                if abs(len(self.keys[group_id]) - len(key)) > limit:
+                    continue
+                distance = bounded_distance(key, self.keys[group_id], limit)
+                if distance <= limit:
+                    rank = (distance, abs(near - year), group_id)
+                    if best is None or rank < best:
+                        best = rank
+        if best is None:
+            return None, None
+        return best[2], 'fuzzy'
+
+
+# Состояние для процессов пула (передаётся через fork, без копирования)
+_shared = {}
+
+
+def _process_chunk(task):
+    """Нормализация и сопоставление пачки: (записи с группами, секунды нормализации, секунды сопоставления)"""
+    positions, rows = task
+    source = _shared['source']
+    blocks = _shared['blocks']
+    ratings = _shared.get('ratings')
+    started = time.perf_counter()
+    records = [record for record in (normalize_record(source, positions, row, ratings) for row in rows)
+               if record is not None]
+    normalized = time.perf_counter()
+    matched = [(record,) + blocks.find(record['key'], record['year']) for record in records]
+    return matched, normalized - started, time.perf_counter() - normalized
+
+
+class StageStats:
+    """Строки и время по этапам"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage, rows, seconds):
+        entry = self.stages.setdefault(stage, {'rows': 0, 'seconds': 0.0})
+        entry['rows'] += rows
+        entry['seconds'] += seconds
+
+    def report(self):
+        return {
+            stage: {
+                'rows': entry['rows'],
+                'seconds': round(entry['seconds'], 3),
+                'rows_per_sec': round(entry['rows'] / entry['seconds']) if entry['seconds'] else None,
+            }
+            for stage, entry in self.stages.items()
+        }
+
+
+def bounded_imap(pool, func, tasks, window):
+    """Как pool.imap, но читает задачи не дальше window пачек вперёд (imap выбрал бы весь файл в память)"""
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def process_source(source, tasks, blocks, groups, workers, stats, counts, ratings=None):
+    """Прогоняет пачки источника через пул и сливает записи в groups"""
+    _shared.update(source=source, blocks=blocks, ratings=ratings)
+    # Новые группы этого источника: в индекс попадут после этапа, пока - по точному ключу
+    pending = {}
+    try:
+        if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            pool = multiprocessing.get_context('fork').Pool(workers)
+            results = bounded_imap(pool, _process_chunk, tasks, workers * 2)
+        else:
+            pool = None
+            results = map(_process_chunk, tasks)
+        try:
+            for matched, normalize_seconds, match_seconds in results:
+                stats.add('normalize', len(matched), normalize_seconds)
+                stats.add('match', len(matched), match_seconds)
+                started = time.perf_counter()
+                for record, group_id, how in matched:
+                    if group_id is None:
+                        group_id = pending.get((record['key'], record['year']))
+                        how = 'exact' if group_id is not None else None
+                    if group_id is None:
+                        group_id = len(groups)
+                        groups.append({})
+                        pending[(record['key'], record['year'])] = group_id
+                        counts['new'] += 1
+                    elif source in groups[group_id]:
+                        # Второй раз тот же фильм из того же источника (или тёзка того же года):
+                        # из IMDb остаётся запись с большим числом голосов
+                        counts['duplicates'] += 1
+                        current = groups[group_id][source]
+                        if source != 'imdb' or (record.get('imdb_votes') or 0) <= (current.get('imdb_votes') or 0):
+                            continue
+                    else:
+                        counts[how] += 1
+                    groups[group_id][source] = record
+                stats.add('merge', len(matched), time.perf_counter() - started)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+    finally:
+        _shared.clear()
+
+    started = time.perf_counter()
+    # Новые группы создавались подряд в порядке pending, поэтому номера в индексе совпадут
+    for key, year in pending:
+        blocks.add(key, year)
+    stats.add('index', len(pending), time.perf_counter() - started)
+
+
+def group_row(group):
+    """Группа записей -> строка movies в порядке OUTPUT_COLUMNS"""
+    imdb = group.get('imdb', {})
+    platforms = [group[source] for source in ('netflix', 'amazon') if source in group]
+    first = imdb or platforms[0]
+
+    def pick(field, *records):
+        for record in records:
+            if record.get(field):
+                return record[field]
+        return None
+
+    key, year = first['key'], pick('year', imdb, *platforms)
+    sources = [source for source in SOURCES_COLUMN_ORDER if source in group]
+    row = [
+        f'{key}_{year}' if year is not None else key,
+        first['title'] if first.get('title') else first.get('original_title'),
+        year,
+        imdb.get('imdb_rating'),
+        imdb.get('imdb_votes'),
+        pick('genre', imdb) or pick('listed_in', *platforms),
+        pick('description', imdb, *platforms),
+        imdb.get('poster_url') or '',
+        imdb.get('language'),
+        imdb.get('id'),
+        ','.join(sources),
+        len(sources),
+    ]
+    for source in ('netflix', 'amazon'):
+        record = group.get(source, {})
+        row.extend(record.get(column) for column in PLATFORM_COLUMNS)
+    return tuple(row)
+
+
+def ingest(conn=None, imdb=None, imdb_ratings=None, netflix=None, amazon=None,
+           workers=1, chunk_size=2000, require=(), dry_run=False):
+    """Собирает каталог из выгрузок и (если не dry_run) заменяет им movies.
+
+    require - источники, без которых группа не попадает в каталог
+    (например ('imdb',)). Возвращает статистику по этапам и сопоставлению.
+    """
+    started = time.perf_counter()
+    paths = {'imdb': imdb, 'netflix': netflix, 'amazon': amazon}
+    if not any(paths.values()):
+        raise ValueError('Не указано ни одного файла выгрузки')
+
+    stats = StageStats()
+    counts = defaultdict(int)
+    blocks = TitleBlocks()
+    groups = []
+    ratings = read_ratings(imdb_ratings, stats) if imdb_ratings else None
+    for source in SOURCE_ORDER:
+        if paths[source]:
+            process_source(source, read_chunks(paths[source], source, chunk_size, stats),
+                           blocks, groups, workers, stats, counts, ratings)
+            print(f"   {source}: групп {len(groups)}")
+    ratings = None
+
+    rows = (group_row(group) for group in groups if all(source in group for source in require))
+    result = {'groups': len(groups), 'matches': dict(counts)}
+    if dry_run:
+        started_write = time.perf_counter()
+        result['rows'] = sum(1 for _ in rows)
+        stats.add('write', result['rows'], time.perf_counter() - started_write)
+    else:
+        import app as movies_app
+
+        write = movies_app.import_rows(conn, OUTPUT_COLUMNS, rows)
+        stats.add('write', write['rows'], write['seconds'])
+        result['rows'] = write['rows']
+        result['skipped'] = write['skipped']
+    result['stages'] = stats.report()
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from config import Config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--imdb', help='title.basics.tsv[.gz] или CSV с колонками OMDb')
+    parser.add_argument('--imdb-ratings', help='title.ratings.tsv[.gz]')
+    parser.add_argument('--netflix', help='netflix_titles.csv')
+    parser.add_argument('--amazon', help='amazon_prime_titles.csv')
+    parser.add_argument('--workers', type=int, default=Config.INGEST_WORKERS)
+    parser.add_argument('--chunk-size', type=int, default=Config.INGEST_CHUNK_SIZE)
+    parser.add_argument('--require', default='', help='обязательные источники через запятую (например imdb)')
+    parser.add_argument('--dry-run', action='store_true', help='не записывать в базу')
+    args = parser.parse_args()
+
+    require = tuple(source for source in args.require.split(',') if source)
+    if any(source not in FIELDS for source in require):
+        parser.error(f'--require: допустимы {", ".join(FIELDS)}')
+
+    print("📥 Сборка каталога из выгрузок...")
+    options = dict(imdb=args.imdb, imdb_ratings=args.imdb_ratings, netflix=args.netflix, amazon=args.amazon,
+                   workers=args.workers, chunk_size=args.chunk_size, require=require)
+    if args.dry_run:
+        result = ingest(dry_run=True, **options)
+    else:
+        import app as movies_app
+
+        movies_app.init_database()
+        with movies_app.db_pool.connection() as conn:
+            result = ingest(conn, **options)
+    for stage, entry in result.pop('stages').items():
+        print(f"   {stage:<10} {entry['rows']:>10} строк  {entry['seconds']:>8} с  {entry['rows_per_sec']} строк/с")
+    print(f"✅ Каталог: {result}")
@@ -0,0 +1,348 @@
+"""Метрики сервера в формате Prometheus и профилирование запросов.
+
+- Гистограммы времени ответа по маршрутам и размера ответов.
+- Время выполнения SQL по "форме" запроса (параметры и списки ?, ?, ?
+  схлопываются) и число прочитанных строк - через подклассы
+  sqlite3.Connection / sqlite3.Cursor, которые передаются в sqlite3.connect.
+- Выборочный EXPLAIN QUERY PLAN: первый запуск каждой формы запроса и
+  дальше с вероятностью Config.METRICS_PLAN_SAMPLE_RATE. Считается, сколько
+  раз таблица читается полным проходом (SCAN) и сколько - по индексу (SEARCH).
+- Время ожидания подключения из пула.
+
+Всё хранится в памяти процесса; /metrics отдаёт текстовый формат Prometheus.
+"""
+import cProfile
+import io
+import pstats
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+
+# Границы корзин гистограмм (секунды)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    parts = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+class Counter:
+    """Счётчик с метками"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}' for key, value in items]
+
+
+class Histogram:
+    """Гистограмма с метками: накопительные корзины, сумма и количество"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items())
+        lines = []
+        names = self.labels + ('le',)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels(names, key + (bound,))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(names, key + ("+Inf",))} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {count}')
+        return lines
+
+
+class Registry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, gauges=None):
+        """Текст для /metrics. gauges - {имя: (описание, значение)} мгновенных значений"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        for name, (help_text, value) in sorted((gauges or {}).items()):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_duration = registry.add(Histogram(
+    'movies_http_request_duration_seconds', 'Время обработки запроса', ('route', 'method', 'status')))
+http_response_size = registry.add(Histogram(
+    'movies_http_response_size_bytes', 'Размер тела ответа (после сжатия)', ('route',), SIZE_BUCKETS))
+query_duration = registry.add(Histogram(
+    'movies_sqlite_query_duration_seconds', 'Время выполнения SQL запроса', ('query',)))
+query_rows = registry.add(Counter(
+    'movies_sqlite_rows_fetched_total', 'Строк прочитано из результатов SQL запросов', ('query',)))
+query_plan_steps = registry.add(Counter(
+    'movies_sqlite_plan_steps_total', 'Шаги EXPLAIN QUERY PLAN в выборке запросов', ('query', 'table', 'access')))
+query_plan_samples = registry.add(Counter(
+    'movies_sqlite_plan_samples_total', 'Сколько раз снят EXPLAIN QUERY PLAN', ('query',)))
+pool_wait = registry.add(Histogram(
+    'movies_sqlite_pool_acquire_seconds', 'Ожидание подключения из пула', ('mode',)))
+profiles_skipped = registry.add(Counter(
+    'movies_profiles_skipped_total', 'Запросы с X-Profile без профиля: профайлер был занят'))
+
+
+# Форма запроса: без лишних пробелов, списки параметров схлопнуты
+_WHITESPACE = re.compile(r'\s+')
+_PARAM_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+# Длинный список колонок не отличает один запрос от другого - его заменяет "..."
+_SELECT_LIST = re.compile(r'^(SELECT )[^()]{40,}?( FROM )')
+_shapes = OrderedDict()
+_shapes_lock = threading.Lock()
+MAX_SHAPES = 512
+
+
+def query_shape(sql):
+    """Нормализованный текст запроса для метки метрики (с кэшем по исходному тексту)"""
+    with _shapes_lock:
+        shape = _shapes.get(sql)
+        if shape is not None:
+            _shapes.move_to_end(sql)
+            return shape
+    shape = _PARAM_LIST.sub('?, ...', _WHITESPACE.sub(' ', sql).strip())
+    shape = _SELECT_LIST.sub(r'\1...\2', shape, count=1)
+    if len(shape) > Config.METRICS_QUERY_LABEL_LENGTH:
+        shape = shape[:Config.METRICS_QUERY_LABEL_LENGTH] + '...'
+    with _shapes_lock:
+        _shapes[sql] = shape
+        while len(_shapes) > MAX_SHAPES:
+            _shapes.popitem(last=False)
+    return shape
+
+
+# Формы запросов, для которых план уже снимался (LRU, как _shapes)
+_planned = OrderedDict()
+_planned_lock = threading.Lock()
+_PLAN_DETAIL = re.compile(r'^(SCAN|SEARCH)\s+(?:TABLE\s+)?(\w+)(.*)$')
+
+
+def sample_plan(conn, sql, parameters, shape):
+    """Снимает EXPLAIN QUERY PLAN для SELECT: первый раз всегда, потом выборочно"""
+    with _planned_lock:
+        seen = shape in _planned
+        if seen:
+            _planned.move_to_end(shape)
+        else:
+            _planned[shape] = True
+            while len(_planned) > MAX_SHAPES:
+                _planned.popitem(last=False)
+    if seen and random.random() >= Config.METRICS_PLAN_SAMPLE_RATE:
+        return
+    try:
+        cursor = sqlite3.Connection.cursor(conn)
+        sqlite3.Cursor.execute(cursor, 'EXPLAIN QUERY PLAN ' + sql, parameters)
+        plan = cursor.fetchall()
+    except sqlite3.Error:
+        return
+    query_plan_samples.inc(shape)
+    for row in plan:
+        match = _PLAN_DETAIL.match(row[-1])
+        if match is None:
+            if 'TEMP B-TREE' in row[-1]:
+                query_plan_steps.inc(shape, '', 'temp_btree')
+            continue
+        access, table, rest = match.groups()
+        if access == 'SEARCH' and 'COVERING INDEX' in rest:
+            access = 'covering'
+        query_plan_steps.inc(shape, table, access.lower())
+
+
+def report_query(sql, elapsed):
+    """Время одного запроса; медленные печатаются"""
+    shape = query_shape(sql)
+    query_duration.observe(elapsed, shape)
+    if Config.SLOW_QUERY_MS and elapsed * 1000 >= Config.SLOW_QUERY_MS:
+        print(f"🐢 Медленный запрос ({elapsed * 1000:.1f} мс): {shape}")
+    return shape
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Курсор, который замеряет время запросов и считает прочитанные строки"""
+
+    _shape = None
+
+    def execute(self, sql, parameters=()):
+        is_select = sql.lstrip()[:6].upper() in ('SELECT', 'WITH')
+        if is_select:
+            sample_plan(self.connection, sql, parameters, query_shape(sql))
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._shape = report_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._shape = report_query(sql, time.perf_counter() - started)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None and self._shape is not None:
+            query_rows.inc(self._shape)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if rows and self._shape is not None:
+            query_rows.inc(self._shape, amount=len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        if rows and self._shape is not None:
+            query_rows.inc(self._shape, amount=len(rows))
+        return rows
+
+    def __next__(self):
+        # for row in cursor
+        row = super().__next__()
+        if self._shape is not None:
+            query_rows.inc(self._shape)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Подключение, курсоры которого инструментированы (factory для sqlite3.connect)"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+
+def connection_factory():
+    """Класс подключения для sqlite3.connect с учётом Config.METRICS_ENABLED"""
+    return InstrumentedConnection if Config.METRICS_ENABLED else sqlite3.Connection
+
+
+# Профилирование по заголовку X-Profile: последние профили хранятся в памяти
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+MAX_PROFILES = 20
+# С Python 3.12 в процессе может быть включён только один cProfile
+# (второй enable() падает с ValueError), поэтому запросы профилируются по одному
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile:
+    """cProfile одного запроса. Создаётся через start(), пока профиль держит _profiler_lock"""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    @classmethod
+    def start(cls):
+        """Начинает профилирование или возвращает None, если профайлер уже занят"""
+        if not _profiler_lock.acquire(blocking=False):
+            profiles_skipped.inc()
+            return None
+        try:
+            return cls()
+        except ValueError:
+            # Профайлер включён не нами (например, python -m cProfile)
+            _profiler_lock.release()
+            profiles_skipped.inc()
+            return None
+
+    def stop(self):
+        """Выключает профайлер и освобождает его для следующего запроса"""
+        try:
+            self.profiler.disable()
+        finally:
+            _profiler_lock.release()
+
+    def finish(self, title, limit=30):
+        """Останавливает профилирование, сохраняет отчёт. Возвращает (id, мс, топ функций)"""
+        self.stop()
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+        stats.sort_stats('cumulative').print_stats(limit)
+
+        # Коротко для заголовка: самые дорогие функции по собственному времени
+        own = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:5]
+        top = '; '.join(f'{func[2]}:{func[1]} {timing[2] * 1000:.2f}ms' for func, timing in own)
+
+        profile_id = f'{int(time.time() * 1000):x}{random.randrange(16 ** 4):04x}'
+        with _profiles_lock:
+            _profiles[profile_id] = f'{title}\n{elapsed_ms:.2f} ms\n\n{stream.getvalue()}'
+            while len(_profiles) > MAX_PROFILES:
+                _profiles.popitem(last=False)
+        return profile_id, elapsed_ms, top
+
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        return _profiles.get(profile_id)
@@ -0,0 +1,328 @@
+"""Локальный кэш постеров и миниатюры для /api/posters/<id>.
+
+Запуск прогрева кэша (из папки backend):
+    python posters.py                   # все фильмы с poster_url
+    python posters.py --limit 1000 --workers 8
+
+Хранилище адресуется содержимым: каждый файл (оригинал или миниатюра)
+лежит в objects/<2 символа sha256>/<sha256>, одинаковые картинки с разных
+адресов хранятся один раз, а хэш сразу служит ETag. Ссылки "адрес + ширина
++ формат -> хэш" лежат в refs/ маленькими файлами, поэтому кэш переживает
+перезапуск и общий для всех процессов сервера.
+
+Размер objects/ ограничен: при превышении удаляются файлы, к которым
+дольше всего не обращались (время доступа - mtime, обновляется при
+чтении). Осиротевшие ссылки просто перестают находиться.
+
+Скачивание оригинала и нарезка миниатюр (Pillow, WebP и JPEG) выполняются
+в пуле потоков; одинаковые задачи, пришедшие одновременно, объединяются.
+Без Pillow отдаётся оригинал. Загрузчик передаётся параметром fetcher -
+для проверок можно подставить локальный источник вместо сети.
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow не установлен - только оригиналы
+    Image = None
+
+# Форматы миниатюр: формат -> (mimetype, параметры сохранения Pillow)
+FORMATS = {
+    'webp': ('image/webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('image/jpeg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Заглушка для фильмов без постера (локально, без внешних сервисов)
+PLACEHOLDER_SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="300" height="450" viewBox="0 0 300 450">
+<defs><linearGradient id="g" x1="0" y1="0" x2="1" y2="1">
+<stop offset="0" stop-color="#667eea"/><stop offset="1" stop-color="#764ba2"/></linearGradient></defs>
+<rect width="300" height="450" fill="url(#g)"/>
+<text x="150" y="215" font-family="sans-serif" font-size="22" fill="#fff" text-anchor="middle">Постер</text>
+<text x="150" y="245" font-family="sans-serif" font-size="22" fill="#fff" text-anchor="middle">не найден</text>
+</svg>
+""".encode('utf-8')
+PLACEHOLDER_ETAG = hashlib.sha256(PLACEHOLDER_SVG).hexdigest()[:32]
+
+
+def fetch_url(url, timeout=10):
+    """Загрузчик по умолчанию: (байты, mimetype) по HTTP(S)"""
+    request = urllib.request.Request(url, headers={'User-Agent': 'movies-poster-cache/1.0'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read(), response.headers.get_content_type()
+
+
+class PosterCache:
+    """Дисковый кэш постеров с миниатюрами и ограничением размера"""
+
+    def __init__(self, directory, max_bytes, widths=(150, 300, 600), fetcher=None,
+                 workers=4, timeout=10, origin=None):
+        self.directory = Path(directory)
+        self.objects = self.directory / 'objects'
+        self.refs = self.directory / 'refs'
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.refs.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.widths = tuple(sorted(widths))
+        self.fetcher = fetcher or fetch_url
+        self.timeout = timeout
+        # Подмена схемы и хоста адресов постеров (например, локальное зеркало)
+        self.origin = origin.rstrip('/') if origin else None
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='posters')
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._size = None
+        # Неудачные загрузки: адрес -> время, повтор не раньше retry_after секунд
+        self._failed = {}
+        self.retry_after = 300
+        self.stats = {'hits': 0, 'misses': 0, 'fetched': 0, 'failed': 0, 'evicted': 0}
+
+    # --- хранилище ---
+
+    def _object_path(self, digest):
+        return self.objects / digest[:2] / digest
+
+    def _ref_path(self, url, width, image_format):
+        key = hashlib.sha1(f'{url}\n{width}\n{image_format}'.encode('utf-8')).hexdigest()
+        return self.refs / key[:2] / key
+
+    def _store(self, data):
+        """Кладёт байты в хранилище, возвращает хэш"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_name(f'{digest}.{os.getpid()}.{threading.get_ident()}.tmp')
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+            with self._lock:
+                if self._size is not None:
+                    self._size += len(data)
+        return digest
+
+    def _link(self, url, width, image_format, digest, mimetype):
+        path = self._ref_path(url, width, image_format)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_text(f'{digest} {mimetype}')
+        os.replace(tmp, path)
+
+    def lookup(self, url, width, image_format):
+        """(путь к файлу, ETag, mimetype) из кэша или None"""
+        try:
+            digest, mimetype = self._ref_path(url, width, image_format).read_text().split()
+        except (OSError, ValueError):
+            return None
+        path = self._object_path(digest)
+        try:
+            os.utime(path)  # отметка для LRU
+        except OSError:
+            return None
+        return path, digest[:32], mimetype
+
+    def size(self):
+        """Текущий размер objects/ в байтах (считается один раз, дальше ведётся в памяти)"""
+        with self._lock:
+            if self._size is None:
+                self._size = sum(path.stat().st_size for path in self.objects.glob('*/*') if path.is_file())
+            return self._size
+
+    def evict(self):
+        """Удаляет самые давно использованные файлы, пока размер больше max_bytes"""
+        if self.size() <= self.max_bytes:
+            return 0
+        files = []
+        for path in self.objects.glob('*/*'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        removed = 0
+        total = sum(size for _, size, _ in files)
+        # Чистим с запасом (до 90%), чтобы не сканировать каталог на каждой записи
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._size = total
+            self.stats['evicted'] += removed
+        return removed
+
+    # --- загрузка и миниатюры ---
+
+    def source_url(self, url):
+        if self.origin is None:
+            return url
+        scheme_end = url.find('://')
+        path_start = url.find('/', scheme_end + 3) if scheme_end != -1 else 0
+        return self.origin + (url[path_start:] if path_start != -1 else '/')
+
+    def _render(self, url):
+        """Скачивает оригинал и режет все миниатюры. Возвращает True при успехе"""
+        try:
+            data, mimetype = self.fetcher(self.source_url(url), self.timeout)
+        except Exception as e:
+            print(f"⚠️  Постер не загружен ({url}): {e}")
+            return self._fail(url)
+        if not data or not (mimetype or '').startswith('image/'):
+            return self._fail(url)
+
+        original = self._store(data)
+        self._link(url, 0, 'original', original, mimetype)
+        if Image is not None:
+            try:
+                with Image.open(io.BytesIO(data)) as image:
+                    image = image.convert('RGB')
+                    for width in self.widths:
+                        # Не увеличиваем: миниатюра шире оригинала - это оригинал
+                        scaled = image
+                        if width < image.width:
+                            height = round(image.height * width / image.width)
+                            scaled = image.resize((width, height), Image.LANCZOS)
+                        for image_format, (format_mimetype, options) in FORMATS.items():
+                            buffer = io.BytesIO()
+                            scaled.save(buffer, **options)
+                            self._link(url, width, image_format, self._store(buffer.getvalue()), format_mimetype)
+            except Exception as e:
+                # Pillow не разобрал картинку - вместо миниатюр ссылки на оригинал
+                print(f"⚠️  Миниатюры не созданы ({url}): {e}")
+                for width in self.widths:
+                    for image_format in FORMATS:
+                        self._link(url, width, image_format, original, mimetype)
+        with self._lock:
+            self.stats['fetched'] += 1
+        self.evict()
+        return True
+
+    def _fail(self, url):
+        with self._lock:
+            self.stats['failed'] += 1
+            self._failed[url] = time.monotonic()
+            if len(self._failed) > 10000:
+                self._failed.clear()
+        return False
+
+    def submit(self, url):
+        """Ставит загрузку в пул (одна задача на адрес), возвращает Future"""
+        with self._lock:
+            future = self._inflight.get(url)
+            if future is None:
+                future = self._inflight[url] = self.executor.submit(self._render, url)
+                future.add_done_callback(lambda _, url=url: self._forget(url))
+        return future
+
+    def recently_failed(self, url):
+        """Не удалась ли загрузка адреса меньше retry_after секунд назад"""
+        with self._lock:
+            failed_at = self._failed.get(url)
+        return failed_at is not None and time.monotonic() - failed_at < self.retry_after
+
+    def _forget(self, url):
+        with self._lock:
+            self._inflight.pop(url, None)
+
+    def pick_width(self, width):
+        """Ближайшая готовая ширина не меньше запрошенной (0 - оригинал)"""
+        if not width:
+            return 0
+        for candidate in self.widths:
+            if candidate >= width:
+                return candidate
+        return self.widths[-1]
+
+    def get(self, url, width=0, image_format='jpeg', wait=None):
+        """(путь, ETag, mimetype) для постера, при промахе ждёт загрузку не дольше wait секунд.
+
+        None - загрузить не удалось (или не успели: задача продолжит работу в пуле).
+        """
+        width = self.pick_width(width) if Image is not None else 0
+        variant = (width, image_format) if width else (0, 'original')
+        found = self.lookup(url, *variant)
+        if found is not None:
+            with self._lock:
+                self.stats['hits'] += 1
+            return found
+
+        with self._lock:
+            self.stats['misses'] += 1
+        if self.recently_failed(url):
+            return None
+        future = self.submit(url)
+        try:
+            future.result(timeout=self.timeout if wait is None else wait)
+        except Exception:
+            return None
+        return self.lookup(url, *variant)
+
+    def prefetch(self, urls, progress_every=500):
+        """Прогрев кэша: загружает все адреса, которых ещё нет. Возвращает статистику"""
+        started = time.perf_counter()
+        pending = []
+        skipped = 0
+        for url in urls:
+            if self.lookup(url, 0, 'original') is not None:
+                skipped += 1
+                continue
+            pending.append(self.submit(url))
+        done = 0
+        failed = 0
+        for future in pending:
+            if not future.result():
+                failed += 1
+            done += 1
+            if progress_every and done % progress_every == 0:
+                print(f"   {done}/{len(pending)}...")
+        seconds = time.perf_counter() - started
+        return {
+            'fetched': done - failed,
+            'failed': failed,
+            'skipped': skipped,
+            'seconds': round(seconds, 3),
+            'per_sec': round(done / seconds, 1) if seconds else None,
+            'cache_mb': round(self.size() / (1024 * 1024), 1),
+        }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import app as movies_app
+    from config import Config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limit', type=int, help='не больше N фильмов (лучшие по рейтингу)')
+    parser.add_argument('--workers', type=int, default=Config.POSTER_WORKERS)
+    args = parser.parse_args()
+
+    Config.POSTER_WORKERS = args.workers
+    Config.SIMILAR_ON_LOAD = False
+    movies_app.init_database()
+    with movies_app.db_pool.connection(readonly=True) as conn:
+        cursor = conn.cursor()
+        query = """
+            SELECT DISTINCT poster_url FROM movies
+            WHERE poster_url IS NOT NULL AND poster_url != ''
+            ORDER BY imdb_rating DESC
+        """
+        if args.limit:
+            query += f" LIMIT {int(args.limit)}"
+        cursor.execute(query)
+        urls = [row[0] for row in cursor.fetchall()]
+    print(f"🖼️  Прогрев кэша постеров: {len(urls)} адресов")
+    stats = movies_app.get_poster_cache().prefetch(urls)
+    print(f"✅ Постеры: {stats}")
@@ -0,0 +1,359 @@
+"""Похожие фильмы: TF-IDF по описанию, жанрам, актёрам и режиссёрам, соседи считаются заранее.
+
+Запуск пересчёта вручную (из папки backend):
+    python similar.py                  # только новые фильмы и сломанные списки
+    python similar.py --full           # всё заново
+    python similar.py --workers 4
+
+Каждый фильм - вектор TF-IDF (сублинейная частота, строки нормированы),
+поэтому косинусная близость - скалярное произведение. Матрица хранится
+разреженной: scipy.sparse, если установлен, иначе те же массивы CSR
+перемножаются средствами NumPy. Близости считаются пачками строк
+(пачка x весь каталог), из каждой строки берутся top-k соседей; пачки
+раздаются процессам multiprocessing. Процессы запускаются через spawn (не
+fork: сервер многопоточный, копия чужих блокировок может повесить
+процесс), матрица передаётся им файлами .npy во временной папке и
+открывается через mmap - без копирования в каждый процесс.
+
+Результат - таблица movie_similar (movie_id, rank, similar_id, score),
+запрос /api/movies/<id>/similar читает её по первичному ключу.
+
+Пересчёт инкрементальный: словарь и IDF строятся по всему каталогу (это
+линейно и дёшево), а квадратичная часть считается только для фильмов без
+списка соседей и для списков, где сосед удалён. Новые фильмы попадают и
+в списки старых: из тех же пачек берутся пары, где близость выше
+последнего (k-го) соседа в сохранённом списке.
+"""
+import argparse
+import multiprocessing
+import re
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+from suggest import fold
+
+# Колонки с текстом: (колонка, префикс терма, вес поля)
+TEXT_FIELDS = [
+    ('description', '', 1.0),
+    ('genre', 'g:', 3.0),
+    ('netflix_director', 'p:', 2.0),
+    ('netflix_cast', 'p:', 1.5),
+    ('amazon_director', 'p:', 2.0),
+    ('amazon_cast', 'p:', 1.5),
+    ('language', 'l:', 1.0),
+]
+
+STOP_WORDS = frozenset("""
+    the and for are but not you all any can her was one our out his has had him how its may new now
+    old see two who boy did get let put say she too use with from they will have this that what when
+    where which while into their there them then than been were more most some such only over after
+    also back just like about could would should other these those your being between through during
+    before under again further once here each both very own same few off upon must life world story
+    film movie documentary series
+""".split())
+
+_WORD = re.compile(r'[^\W\d_]{3,}')
+
+# Сколько ячеек (строки пачки x фильмы) считать за раз
+BATCH_CELLS = 16 * 1024 * 1024
+
+
+def movie_terms(row, columns):
+    """Взвешенные термы фильма: {терм: вес}"""
+    terms = defaultdict(float)
+    for column, prefix, weight in TEXT_FIELDS:
+        value = row[columns[column]] if column in columns else None
+        if not value:
+            continue
+        if prefix == '':
+            for word in _WORD.findall(fold(value)):
+                if word not in STOP_WORDS:
+                    terms[word] += weight
+        else:
+            # Жанры, имена и язык - целиком, через запятую
+            for part in str(value).split(','):
+                part = fold(part).strip()
+                if part:
+                    terms[prefix + part] += weight
+    return terms
+
+
+def build_matrix(rows, columns, min_df=2, max_df=0.5):
+    """Нормированная матрица TF-IDF в виде CSR массивов (indptr, indices, data) и число термов"""
+    documents = [movie_terms(row, columns) for row in rows]
+    df = defaultdict(int)
+    for terms in documents:
+        for term in terms:
+            df[term] += 1
+
+    total = len(documents)
+    max_count = max(min_df, int(max_df * total))
+    vocabulary = {}
+    idf = []
+    for term, count in df.items():
+        if min_df <= count <= max_count:
+            vocabulary[term] = len(idf)
+            idf.append(np.log((1 + total) / (1 + count)) + 1.0)
+
+    indptr = np.zeros(total + 1, dtype=np.int64)
+    indices = []
+    data = []
+    for i, terms in enumerate(documents):
+        entries = [(vocabulary[term], (1.0 + np.log(weight)) * idf[vocabulary[term]])
+                   for term, weight in terms.items() if term in vocabulary]
+        if entries:
+            entries.sort()
+            norm = np.sqrt(sum(value * value for _, value in entries))
+            indices.extend(column for column, _ in entries)
+            data.extend(value / norm for _, value in entries)
+        indptr[i + 1] = len(indices)
+    return (indptr, np.array(indices, dtype=np.int32), np.array(data, dtype=np.float32)), len(idf)
+
+
+class SimilarityMatrix:
+    """Строки TF-IDF и транспонированная матрица для перемножения пачками"""
+
+    def __init__(self, csr, features):
+        self.indptr, self.indices, self.data = csr
+        self.size = len(self.indptr) - 1
+        self.features = features
+        if sparse is not None:
+            self.rows = sparse.csr_matrix((self.data, self.indices, self.indptr), shape=(self.size, features))
+            self.columns = self.rows.T.tocsr()
+        else:
+            # Постинги термов (CSC): какие фильмы содержат терм и с каким весом
+            order = np.argsort(self.indices, kind='stable')
+            self.posting_docs = np.repeat(np.arange(self.size), np.diff(self.indptr))[order].astype(np.int64)
+            self.posting_data = self.data[order]
+            self.posting_ptr = np.zeros(features + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=features), out=self.posting_ptr[1:])
+
+    def scores(self, batch):
+        """Плотный блок близостей: строки batch x все фильмы"""
+        if sparse is not None:
+            return (self.rows[batch] @ self.columns).toarray()
+        block = np.zeros(len(batch) * self.size, dtype=np.float32)
+        for i, row in enumerate(batch):
+            start, end = self.indptr[row], self.indptr[row + 1]
+            for term, weight in zip(self.indices[start:end], self.data[start:end]):
+                lo, hi = self.posting_ptr[term], self.posting_ptr[term + 1]
+                block[i * self.size + self.posting_docs[lo:hi]] += weight * self.posting_data[lo:hi]
+        return block.reshape(len(batch), self.size)
+
+
+# Состояние процессов пула (в родителе - на время compute_neighbors, в процессах - из _init_worker)
+_shared = {}
+
+# Массивы матрицы, которые передаются процессам пула файлами
+SHARED_ARRAYS = ('indptr', 'indices', 'data')
+
+
+def _init_worker(directory, features, k, with_thresholds):
+    """Инициализация процесса пула: матрица и пороги из .npy файлов через mmap"""
+    directory = Path(directory)
+    csr = tuple(np.load(directory / f'{name}.npy', mmap_mode='r') for name in SHARED_ARRAYS)
+    thresholds = np.load(directory / 'thresholds.npy', mmap_mode='r') if with_thresholds else None
+    _shared.update(matrix=SimilarityMatrix(csr, features), k=k, thresholds=thresholds)
+
+
+def _compute_batch(batch):
+    """Топ-k соседей строк batch и пары, которые улучшают сохранённые списки других фильмов"""
+    matrix = _shared['matrix']
+    k = _shared['k']
+    thresholds = _shared['thresholds']
+    batch = np.asarray(batch)
+    block = matrix.scores(batch)
+    block[np.arange(len(batch)), batch] = -1.0  # сам себе не сосед
+
+    count = min(k, matrix.size - 1)
+    if count > 0:
+        top = np.argpartition(-block, count - 1, axis=1)[:, :count]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+    else:
+        top = np.zeros((len(batch), 0), dtype=np.int64)
+        top_scores = np.zeros((len(batch), 0), dtype=np.float32)
+
+    # Близость симметрична: строка i - это и столбец i для других фильмов
+    updates = None
+    if thresholds is not None:
+        rows, cols = np.nonzero((block > thresholds) & (block > 0))
+        updates = (cols, batch[rows], block[rows, cols])
+    return batch, top, top_scores, updates
+
+
+def compute_neighbors(matrix, query, k, thresholds=None, workers=1):
+    """Перебирает пачки строк query, отдаёт результаты _compute_batch по мере готовности"""
+    batch_size = max(1, BATCH_CELLS // max(1, matrix.size))
+    batches = [query[i:i + batch_size] for i in range(0, len(query), batch_size)]
+    if workers > 1 and len(batches) > 1:
+        with tempfile.TemporaryDirectory(prefix='similar-') as directory:
+            for name in SHARED_ARRAYS:
+                np.save(Path(directory) / f'{name}.npy', getattr(matrix, name))
+            if thresholds is not None:
+                np.save(Path(directory) / 'thresholds.npy', thresholds)
+            context = multiprocessing.get_context('spawn')
+            initargs = (directory, matrix.features, k, thresholds is not None)
+            with context.Pool(min(workers, len(batches)), _init_worker, initargs) as pool:
+                yield from pool.imap_unordered(_compute_batch, batches)
+        return
+    _shared.update(matrix=matrix, k=k, thresholds=thresholds)
+    try:
+        for batch in batches:
+            yield _compute_batch(batch)
+    finally:
+        _shared.clear()
+
+
+def data_version(cursor):
+    """catalog_counters.data_version (увеличивается при каждой загрузке данных) или None"""
+    try:
+        cursor.execute("SELECT value FROM catalog_counters WHERE name = 'data_version'")
+    except Exception:  # база без счётчиков (до init_database)
+        return None
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def refresh_similar(conn, k=10, workers=1, full=False, rebuild_ratio=0.3):
+    """Пересчитывает movie_similar (таблицу создаёт init_database). Возвращает статистику словарём.
+
+    full=True или доля фильмов для пересчёта больше rebuild_ratio - всё заново.
+    Фильмы читаются в одной транзакции с data_version; если к записи данные
+    успели перезагрузить (импорт выдаёт id заново), результат отбрасывается
+    и в статистике stale=True.
+    """
+    started = time.perf_counter()
+    cursor = conn.cursor()
+
+    if conn.in_transaction:
+        conn.commit()
+    # Снимок: версия данных и фильмы из одной транзакции чтения
+    cursor.execute("BEGIN")
+    version = data_version(cursor)
+    cursor.execute("PRAGMA table_info(movies)")
+    existing = {row[1] for row in cursor.fetchall()}
+    text_columns = [column for column, _, _ in TEXT_FIELDS if column in existing]
+    cursor.execute(f"SELECT id, {', '.join(text_columns)} FROM movies ORDER BY id")
+    rows = cursor.fetchall()
+    columns = {column: i + 1 for i, column in enumerate(text_columns)}
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    position = {movie_id: i for i, movie_id in enumerate(ids.tolist())}
+
+    # Что уже посчитано: последний (k-й) сосед каждого списка
+    cursor.execute("SELECT movie_id, COUNT(*), MIN(score) FROM movie_similar GROUP BY movie_id")
+    stored = {movie_id: (count, last) for movie_id, count, last in cursor.fetchall()}
+    cursor.execute("""
+        SELECT DISTINCT s.movie_id FROM movie_similar s
+        LEFT JOIN movies m ON m.id = s.similar_id
+        WHERE m.id IS NULL
+    """)
+    broken = {row[0] for row in cursor.fetchall()}
+    new = [i for i, movie_id in enumerate(ids.tolist()) if movie_id not in stored]
+    query = sorted(set(new) | {position[movie_id] for movie_id in broken if movie_id in position})
+    conn.commit()
+
+    if full or not stored or len(query) > rebuild_ratio * len(ids):
+        full = True
+        query = list(range(len(ids)))
+    vector_started = time.perf_counter()
+    matrix = SimilarityMatrix(*build_matrix(rows, columns))
+    vector_seconds = time.perf_counter() - vector_started
+
+    # Порог для обновления чужих списков: k-й сосед (или 0, если список короче k)
+    thresholds = None
+    if new and not full:
+        thresholds = np.full(len(ids), np.inf, dtype=np.float32)
+        for movie_id, (count, last) in stored.items():
+            if movie_id in position and movie_id not in broken:
+                thresholds[position[movie_id]] = last if count >= k else 0.0
+        thresholds[query] = np.inf
+
+    lists = {}
+    updates = defaultdict(list)
+    for batch, top, top_scores, batch_updates in compute_neighbors(matrix, query, k, thresholds, workers):
+        for row, neighbors, scores in zip(batch.tolist(), top.tolist(), top_scores.tolist()):
+            lists[int(ids[row])] = [(int(ids[n]), s) for n, s in zip(neighbors, scores) if s > 0]
+        if batch_updates is not None:
+            for target, source, score in zip(*(part.tolist() for part in batch_updates)):
+                updates[int(ids[target])].append((int(ids[source]), score))
+
+    # Слияние новых соседей со старыми списками
+    if updates:
+        placeholders = ','.join('?' * len(updates))
+        cursor.execute(f"""
+            SELECT movie_id, similar_id, score FROM movie_similar
+            WHERE movie_id IN ({placeholders}) ORDER BY movie_id, rank
+        """, list(updates))
+        merged = defaultdict(list)
+        for movie_id, similar_id, score in cursor.fetchall():
+            merged[movie_id].append((similar_id, score))
+        for movie_id, candidates in updates.items():
+            combined = dict(merged[movie_id])
+            for similar_id, score in candidates:
+                combined[similar_id] = max(score, combined.get(similar_id, 0.0))
+            lists[movie_id] = sorted(combined.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        if data_version(cursor) != version:
+            conn.rollback()
+            return {'movies': len(ids), 'recomputed': 0, 'updated_lists': 0, 'full': full, 'stale': True,
+                    'seconds': round(time.perf_counter() - started, 3)}
+        if full:
+            cursor.execute("DELETE FROM movie_similar")
+        else:
+            cursor.execute("DELETE FROM movie_similar WHERE movie_id NOT IN (SELECT id FROM movies)")
+            cursor.executemany("DELETE FROM movie_similar WHERE movie_id = ?", [(movie_id,) for movie_id in lists])
+        cursor.executemany(
+            "INSERT INTO movie_similar (movie_id, rank, similar_id, score) VALUES (?, ?, ?, ?)",
+            [(movie_id, rank, similar_id, round(score, 5))
+             for movie_id, neighbors in lists.items()
+             for rank, (similar_id, score) in enumerate(neighbors)]
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    seconds = time.perf_counter() - started
+    return {
+        'movies': len(ids),
+        'features': matrix.features,
+        'recomputed': len(query),
+        'updated_lists': len(lists),
+        'full': full,
+        'stale': False,
+        'backend': 'scipy' if sparse is not None else 'numpy',
+        'vector_seconds': round(vector_seconds, 3),
+        'seconds': round(seconds, 3),
+        'movies_per_sec': round(len(query) / seconds) if seconds else None,
+    }
+
+
+if __name__ == '__main__':
+    import app as movies_app
+    from config import Config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--full', action='store_true', help='пересчитать все списки')
+    parser.add_argument('--workers', type=int, default=Config.SIMILAR_WORKERS)
+    parser.add_argument('--k', type=int, default=Config.SIMILAR_TOP_K)
+    args = parser.parse_args()
+
+    Config.SIMILAR_ON_LOAD = False
+    movies_app.init_database()
+    with movies_app.db_pool.connection() as conn:
+        stats = refresh_similar(conn, args.k, args.workers, args.full, Config.SIMILAR_REBUILD_RATIO)
+    print(f"✅ Похожие фильмы: {stats}")
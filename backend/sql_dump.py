@@ -0,0 +1,183 @@
+"""Потоковый разбор SQL дампа (MySQL) и перевод операторов на диалект SQLite.
+
+Файл читается построчно, токенизатор помнит, находится ли он внутри строки
+или комментария, поэтому ';' и '--' внутри значений не ломают разбор.
+Экранирование MySQL (\\', \\n, ...) сразу переводится в форму SQLite.
+"""
+import re
+
+# Начало чего-то особенного вне строк: кавычки, конец оператора, комментарии
+_SPECIAL = re.compile(r"""['"`;#]|--|/\*""")
+# Текст строки до закрывающей кавычки или "\\" (удвоенная кавычка - часть текста)
+_QUOTE_RUN = {
+    "'": re.compile(r"(?:[^'\\]+|'')*"),
+    '"': re.compile(r'(?:[^"\\]+|"")*'),
+    '`': re.compile(r'(?:[^`]+|``)*'),
+}
+
+# Экранирование внутри строк MySQL -> текст внутри одинарных кавычек SQLite
+_MYSQL_ESCAPES = {
+    "'": "''",
+    '"': '"',
+    '\\': '\\',
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+    '0': '',
+    'b': '\b',
+    'Z': '\x1a',
+    '%': '\\%',
+    '_': '\\_',
+}
+
+
+def iter_statements(lines):
+    """Разбивает поток строк SQL файла на отдельные операторы без комментариев.
+
+    Строки в двойных кавычках (строковые литералы MySQL) переводятся в
+    одинарные, идентификаторы в обратных кавычках SQLite понимает сам.
+    """
+    out = []
+    state = None  # None, "'", '"', '`' или '/*'
+    for line in lines:
+        pos = 0
+        length = len(line)
+        while pos < length:
+            if state is None:
+                match = _SPECIAL.search(line, pos)
+                if match is None:
+                    out.append(line[pos:])
+                    break
+                out.append(line[pos:match.start()])
+                token = match.group()
+                pos = match.end()
+                if token == ';':
+                    statement = ''.join(out).strip()
+                    out = []
+                    if statement:
+                        yield statement
+                elif token == '#' or (token == '--' and line[pos:pos + 1] in ('', ' ', '\t', '\n', '\r')):
+                    # Комментарий до конца строки
+                    out.append('\n')
+                    break
+                elif token == '--':
+                    out.append(token)
+                elif token == '/*':
+                    state = '/*'
+                else:
+                    state = token
+                    out.append("'" if token == '"' else token)
+            elif state == '/*':
+                end = line.find('*/', pos)
+                if end == -1:
+                    break
+                out.append(' ')
+                pos = end + 2
+                state = None
+            else:
+                # Весь текст до конца строки, "\\" или закрывающей кавычки - одним совпадением
+                match = _QUOTE_RUN[state].match(line, pos)
+                chunk = match.group()
+                out.append(chunk.replace("'", "''").replace('""', '"') if state == '"' else chunk)
+                pos = match.end()
+                if pos >= length:
+                    break
+                if line[pos] == '\\':
+                    escaped = line[pos + 1:pos + 2]
+                    out.append(_MYSQL_ESCAPES.get(escaped, escaped))
+                    pos += 2
+                else:
+                    out.append("'" if state == '"' else state)
+                    pos += 1
+                    state = None
+    tail = ''.join(out).strip()
+    if tail and state is None:
+        yield tail
+
+
+# Операторы MySQL, которые в SQLite не нужны
+_SKIP_PREFIXES = (
+    'CREATE DATABASE', 'DROP DATABASE', 'USE ', 'SET ', 'LOCK TABLES', 'UNLOCK TABLES',
+    'START TRANSACTION', 'BEGIN', 'COMMIT',
+)
+_CREATE_TABLE = re.compile(r'^CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`"]?(\w+)[`"]?\s*\((.*)\)[^)]*$', re.I | re.S)
+_INDEX_DEF = re.compile(r'^(UNIQUE\s+)?(?:INDEX|KEY)\s+[`"]?(\w+)[`"]?\s*\((.*)\)$', re.I | re.S)
+_PREFIX_LENGTH = re.compile(r'(\w+)\s*\(\d+\)')
+
+
+def _split_definitions(body):
+    """Делит тело CREATE TABLE по запятым верхнего уровня"""
+    parts = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(body):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(body[start:i].strip())
+            start = i + 1
+    parts.append(body[start:].strip())
+    return [part for part in parts if part]
+
+
+def translate_statement(statement):
+    """Переводит оператор MySQL в SQLite.
+
+    Возвращает (имя таблицы для CREATE TABLE или None, список операторов SQLite).
+    Пустой список - оператор нужно пропустить.
+    """
+    upper = statement.lstrip().upper()
+    if upper.startswith(_SKIP_PREFIXES):
+        return None, []
+
+    if upper.startswith('INSERT IGNORE'):
+        return None, ['INSERT OR IGNORE' + statement.lstrip()[len('INSERT IGNORE'):]]
+
+    match = _CREATE_TABLE.match(statement.strip())
+    if match is None:
+        return None, [statement]
+
+    # CREATE TABLE: индексы выносятся в отдельные CREATE INDEX, опции таблицы отбрасываются
+    table, body = match.group(1), match.group(2)
+    columns = []
+    indexes = []
+    for definition in _split_definitions(body):
+        index = _INDEX_DEF.match(definition)
+        if index is not None:
+            unique, name, index_columns = index.groups()
+            index_columns = _PREFIX_LENGTH.sub(r'\1', index_columns)
+            indexes.append(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table}({index_columns})"
+            )
+            continue
+        definition = re.sub(r'\bINT(EGER)?\s+PRIMARY\s+KEY\s+AUTO_INCREMENT\b',
+                            'INTEGER PRIMARY KEY AUTOINCREMENT', definition, flags=re.I)
+        definition = re.sub(r'\s+AUTO_INCREMENT\b', '', definition, flags=re.I)
+        definition = re.sub(r'\s+UNSIGNED\b', '', definition, flags=re.I)
+        columns.append(definition)
+
+    create = f"CREATE TABLE IF NOT EXISTS {table} (\n    " + ',\n    '.join(columns) + "\n)"
+    return table, [create] + indexes
+
+
+# Однострочный INSERT: "INSERT INTO t (колонки) VALUES" и кортежи значений
+_INSERT_VALUES = re.compile(
+    r'^(INSERT(?:\s+OR\s+\w+)?\s+INTO\s+[`"]?\w+[`"]?\s*\([^()\']*\)\s*VALUES)\s*(\(.*\))$', re.I | re.S
+)
+# Сколько строк объединять в один INSERT
+INSERT_BATCH_ROWS = 500
+
+
+def split_insert(query):
+    """(начало INSERT до VALUES включительно, кортежи значений) или None, если это не простой INSERT.
+
+    Подряд идущие INSERT с одинаковым началом можно склеить в один
+    многострочный INSERT ... VALUES (...), (...): SQLite разбирает и
+    выполняет его за один вызов.
+    """
+    match = _INSERT_VALUES.match(query)
+    if match is None:
+        return None
+    return ' '.join(match.group(1).split()), match.group(2)
@@ -0,0 +1,188 @@
+"""Индекс подсказок поиска в памяти для /api/search/suggestions.
+
+Названия приводятся к единой форме: без регистра и диакритики, кириллица
+транслитерируется в латиницу, поэтому "амели", "Amélie" и "amelie" дают
+одно и то же. Каждое слово названия - запись в отсортированном массиве
+(слово, ранг фильма), где ранг - место фильма по imdb_rating. Префикс
+любого слова находится бинарным поиском (bisect), а для коротких префиксов
+(самых частых при наборе) лучшие фильмы посчитаны заранее.
+
+Индекс строится из таблицы movies один раз на версию данных; запросы к
+нему базу не трогают.
+"""
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left
+from itertools import product
+
+# Кириллица -> латиница (в индексе и запросе одинаково)
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya', 'і': 'i', 'ї': 'yi', 'є': 'ye', 'ґ': 'g',
+}
+
+# Буквы, которые в латинских названиях пишут по-разному: варианты для запроса
+# ("хоббит" ищет и "khobbit", и "hobbit")
+CYRILLIC_VARIANTS = {
+    'х': ('kh', 'h'),
+    'ц': ('ts', 'c'),
+    'й': ('y', 'i', 'j'),
+    'ж': ('zh', 'j'),
+    'ю': ('yu', 'u'),
+    'я': ('ya', 'ia'),
+    'ы': ('y', 'i'),
+    'и': ('i', 'ee'),
+    'к': ('k', 'c'),
+    'э': ('e', 'a'),
+}
+MAX_VARIANTS = 16
+
+_WORD = re.compile(r'\w+')
+_CYRILLIC = re.compile(r'[а-яёіїєґ]')
+
+
+_folded_chars = {}
+
+
+def fold(text):
+    """Нижний регистр без диакритики ("Amélie" -> "amelie", "Ёлки" -> "елки"), й остаётся й"""
+    out = []
+    for char in text.casefold():
+        folded = _folded_chars.get(char)
+        if folded is None:
+            if char == 'й':
+                folded = char
+            else:
+                folded = ''.join(part for part in unicodedata.normalize('NFKD', char)
+                                 if not unicodedata.combining(part))
+            _folded_chars[char] = folded
+        out.append(folded)
+    return ''.join(out)
+
+
+def transliterate(text):
+    """Кириллица -> латиница, остальное без изменений"""
+    if not _CYRILLIC.search(text):
+        return text
+    return ''.join(CYRILLIC_TO_LATIN.get(char, char) for char in text)
+
+
+def tokenize(text):
+    """Слова названия в нормализованной форме"""
+    return _WORD.findall(transliterate(fold(text or '')))
+
+
+def query_variants(word):
+    """Варианты транслитерации одного слова запроса (не больше MAX_VARIANTS)"""
+    if not _CYRILLIC.search(word):
+        return [word]
+    options = [CYRILLIC_VARIANTS.get(char) or (CYRILLIC_TO_LATIN.get(char, char),) for char in word]
+    variants = []
+    for combination in product(*options):
+        variants.append(''.join(combination))
+        if len(variants) >= MAX_VARIANTS:
+            break
+    return variants
+
+
+class SuggestIndex:
+    """Префиксный индекс слов названий с порядком по рейтингу"""
+
+    # Для префиксов не длиннее этого лучшие фильмы посчитаны заранее
+    PREFIX_CACHE_LENGTH = 3
+
+    def __init__(self, movies, version=None, limit=10):
+        """movies - строки (id, title, release_year, imdb_rating) в любом порядке"""
+        self.version = version
+        self.limit = limit
+        # Ранг = позиция по рейтингу (NULL в конце, при равенстве по id)
+        ordered = sorted(movies, key=lambda row: (row[3] is None, -(row[3] or 0), row[0]))
+        self.movies = [(row[0], row[1], row[2]) for row in ordered]
+        self.tokens = []
+
+        entries = []
+        interned = {}
+        prefix_top = {}
+        for rank, row in enumerate(ordered):
+            words = []
+            for word in tokenize(row[1]):
+                word = interned.setdefault(word, word)
+                if word in words:
+                    continue
+                words.append(word)
+                entries.append((word, rank))
+                # Фильмы обходятся от лучших, поэтому первые limit - и есть лучшие
+                for length in range(1, min(len(word), self.PREFIX_CACHE_LENGTH) + 1):
+                    top = prefix_top.setdefault(word[:length], [])
+                    if len(top) < limit and (not top or top[-1] != rank):
+                        top.append(rank)
+            self.tokens.append(tuple(words))
+
+        entries.sort()
+        self.words = [word for word, _ in entries]
+        self.ranks = [rank for _, rank in entries]
+        self.prefix_top = prefix_top
+
+    @classmethod
+    def from_connection(cls, conn, version=None):
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, title, release_year, imdb_rating FROM movies")
+        return cls([tuple(row) for row in cursor.fetchall()], version)
+
+    def __len__(self):
+        return len(self.movies)
+
+    def _range(self, prefix):
+        lo = bisect_left(self.words, prefix)
+        hi = bisect_left(self.words, prefix + '\uffff', lo)
+        return lo, hi
+
+    def search(self, query, limit=None):
+        """Лучшие по рейтингу фильмы, где каждое слово запроса - префикс слова названия.
+
+        Возвращает список словарей id, title, release_year.
+        """
+        limit = limit or self.limit
+        words = _WORD.findall(fold(query))
+        if not words:
+            return []
+        variants = [query_variants(word) for word in words]
+
+        if len(words) == 1 and limit <= self.limit:
+            ranks = set()
+            for prefix in variants[0]:
+                if len(prefix) <= self.PREFIX_CACHE_LENGTH:
+                    ranks.update(self.prefix_top.get(prefix, ()))
+                else:
+                    lo, hi = self._range(prefix)
+                    ranks.update(heapq.nsmallest(limit, set(self.ranks[lo:hi])))
+            return [self._movie(rank) for rank in sorted(ranks)[:limit]]
+
+        # Несколько слов: кандидаты по самому редкому слову, остальные проверяются по словам фильма
+        sized = []
+        for options in variants:
+            size = sum(hi - lo for lo, hi in map(self._range, options))
+            sized.append((size, options))
+        sized.sort(key=lambda item: item[0])
+        candidates = set()
+        for prefix in sized[0][1]:
+            lo, hi = self._range(prefix)
+            candidates.update(self.ranks[lo:hi])
+
+        result = []
+        for rank in sorted(candidates):
+            tokens = self.tokens[rank]
+            if all(any(token.startswith(prefix) for prefix in options for token in tokens)
+                   for _, options in sized[1:]):
+                result.append(self._movie(rank))
+                if len(result) >= limit:
+                    break
+        return result
+
+    def _movie(self, rank):
+        movie_id, title, release_year = self.movies[rank]
+        return {'id': movie_id, 'title': title, 'release_year': release_year}
@@ -0,0 +1,108 @@
+"""Общие фикстуры тестов: модули backend импортируются как в app.py (python app.py из backend/)"""
+import contextlib
+import io
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# До импорта app: без фонового пересчёта похожих фильмов после загрузки
+os.environ.setdefault('SIMILAR_ON_LOAD', 'false')
+
+import app as movies_app
+
+# Тестовый каталог: (название, год, рейтинг, голоса, жанры, описание, источники)
+NAMED_MOVIES = [
+    ('Love Actually', 2003, 7.6, 480000, 'Comedy, Drama, Romance',
+     'Intertwined stories of people in London at Christmas.', 'imdb'),
+    ('Crazy Stupid Love', 2011, 7.4, 520000, 'Comedy, Drama, Romance',
+     'A father has to learn how to date again.', 'netflix,imdb'),
+    ('The Notebook', 2004, 7.8, 590000, 'Drama, Romance',
+     'A poor young man falls in love with a rich young woman.', 'imdb'),
+    ('Heat', 1995, 8.3, 680000, 'Action, Crime, Drama',
+     'A group of professional bank robbers and a detective.', 'imdb,amazon'),
+    ('The Matrix', 1999, 8.7, 1900000, 'Action, Sci-Fi',
+     'A hacker learns the true nature of his reality.', 'netflix,imdb,amazon'),
+]
+FILLER_WORDS = ['river', 'silent', 'winter', 'garden', 'harbor', 'echo', 'velvet', 'storm', 'orbit', 'canyon']
+FILLER_GENRES = ['Drama', 'Comedy', 'Action, Thriller', 'Horror', 'Documentary', 'Drama, Crime']
+FILLER_SOURCES = ['imdb', 'netflix,imdb', 'imdb,amazon', 'imdb']
+# Повторы и пропуски рейтингов - для проверки сортировки с одинаковыми значениями
+FILLER_RATINGS = [6.5, 7.0, None, 6.5, 5.2, 8.1, 7.0]
+
+
+def catalog_movies(fillers=55):
+    """Тестовые фильмы: несколько известных названий и предсказуемые заполнители"""
+    movies = list(NAMED_MOVIES)
+    for i in range(fillers):
+        title = f'{FILLER_WORDS[i % 10].title()} {FILLER_WORDS[(i * 3 + 1) % 10].title()} {i}'
+        movies.append((
+            title, 1980 + (i * 7) % 40, FILLER_RATINGS[i % len(FILLER_RATINGS)], 1000 + i * 137,
+            FILLER_GENRES[i % len(FILLER_GENRES)], f'A quiet {FILLER_WORDS[(i + 5) % 10]} story number {i}.',
+            FILLER_SOURCES[i % len(FILLER_SOURCES)],
+        ))
+    return movies
+
+
+def sql_literal(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def write_dump(path, movies):
+    """SQL дамп каталога в формате database/movies.sql"""
+    columns = ['canonical_key', 'title', 'release_year', 'imdb_rating', 'imdb_votes', 'genre', 'description',
+               'poster_url', 'language', 'imdb_id', 'sources', 'num_sources', 'netflix_id', 'amazon_id']
+    with open(path, 'w', encoding='utf-8') as f:
+        for number, (title, year, rating, votes, genre, description, sources) in enumerate(movies, 1):
+            values = [
+                f'{title.lower()}_{year}', title, year, rating, votes, genre, description,
+                f'https://posters.test/{number}.jpg', 'English', f'tt{number:07d}', sources,
+                sources.count(',') + 1,
+                f's{number}' if 'netflix' in sources else None,
+                f'a{number}' if 'amazon' in sources else None,
+            ]
+            f.write(f"INSERT INTO movies ({', '.join(columns)}) VALUES "
+                    f"({', '.join(sql_literal(value) for value in values)});\n")
+
+
+def use_database(db_path, data_dir):
+    """Переключает модуль app на другую базу и папку данных"""
+    movies_app.db_pool.close_all()
+    movies_app.DB_PATH = Path(db_path)
+    movies_app.db_pool = movies_app.ConnectionPool(db_path, movies_app.Config.DB_POOL_SIZE,
+                                                   movies_app.Config.DB_POOL_TIMEOUT)
+    movies_app.DATA_DIR = Path(data_dir)
+    movies_app.SNAPSHOT_PATH = Path(db_path).parent / 'movies.snapshot.db'
+    movies_app._known_tables.clear()
+    movies_app._table_columns.clear()
+    movies_app._fts_enabled = None
+    movies_app._count_cache.clear()
+    movies_app._catalog_engine = (None, None)
+    movies_app._suggest_index = (None, None)
+    movies_app._fuzzy_index = (None, None)
+    movies_app._response_cache.clear()
+    movies_app._data_version['checked'] = None
+
+
+def make_catalog(tmp_path, movies):
+    """Новая база в tmp_path, заполненная фильмами через init_database. Возвращает test client"""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    write_dump(data_dir / 'movies.sql', movies)
+    use_database(tmp_path / 'movies.db', data_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        movies_app.init_database()
+    return movies_app.app.test_client()
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """Test client с новой базой, заполненной тестовым каталогом"""
+    return make_catalog(tmp_path, catalog_movies())
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import threading
+
+from asgi import AsgiApp
+
+import app as movies_app
+
+
+class SlowWsgi:
+    """WSGI приложение, которое отвечает только после release (считает вызовы)"""
+
+    def __init__(self):
+        self.calls = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, environ, start_response):
+        self.calls.append((environ['PATH_INFO'], environ['QUERY_STRING']))
+        number = len(self.calls)
+        self.entered.set()
+        self.release.wait(5)
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [json.dumps({'call': number}).encode('utf-8')]
+
+
+async def request(asgi_app, path, query=b'', method='GET'):
+    """Один HTTP запрос к ASGI приложению: (статус, тело)"""
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query, 'headers': []}
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi_app(scope, receive, send)
+    body = b''.join(message.get('body', b'') for message in sent if message['type'] == 'http.response.body')
+    return sent[0]['status'], body
+
+
+async def wait_for(event):
+    while not event.is_set():
+        await asyncio.sleep(0.01)
+
+
+def test_identical_requests_are_coalesced():
+    wsgi = SlowWsgi()
+    asgi_app = AsgiApp(wsgi, threads=2, max_pending=10, coalesce=True)
+
+    async def scenario():
+        same = [asyncio.create_task(request(asgi_app, '/api/movies', b'page=1')) for _ in range(3)]
+        await wait_for(wsgi.entered)
+        await asyncio.sleep(0.05)
+        wsgi.release.set()
+        other = await request(asgi_app, '/api/movies', b'page=2')
+        return await asyncio.gather(*same), other
+
+    try:
+        same, other = asyncio.run(scenario())
+    finally:
+        asgi_app.executor.shutdown()
+
+    assert same == [(200, b'{"call": 1}')] * 3
+    assert other == (200, b'{"call": 2}')
+    assert wsgi.calls == [('/api/movies', 'page=1'), ('/api/movies', 'page=2')]
+    assert asgi_app.stats == {'requests': 4, 'coalesced': 2, 'rejected': 0}
+    assert asgi_app.inflight == {} and asgi_app.pending == 0
+
+
+def test_admin_and_post_requests_are_not_coalesced():
+    asgi_app = AsgiApp(SlowWsgi(), threads=1, coalesce=True)
+    try:
+        assert asgi_app.coalesce_key({'method': 'GET', 'path': '/api/admin/export-csv',
+                                      'query_string': b'', 'headers': []}) is None
+        assert asgi_app.coalesce_key({'method': 'POST', 'path': '/api/movies/batch',
+                                      'query_string': b'', 'headers': []}) is None
+        assert asgi_app.coalesce_key({'method': 'GET', 'path': '/api/movies', 'query_string': b'',
+                                      'headers': [(b'accept', b'application/msgpack'), (b'cookie', b'x')]}) == \
+            ('/api/movies', b'', ((b'accept', b'application/msgpack'),))
+    finally:
+        asgi_app.executor.shutdown()
+
+
+def test_overflow_is_rejected_with_503():
+    wsgi = SlowWsgi()
+    asgi_app = AsgiApp(wsgi, threads=1, max_pending=1, coalesce=False)
+
+    async def scenario():
+        first = asyncio.create_task(request(asgi_app, '/api/movies'))
+        await wait_for(wsgi.entered)
+        rejected = await request(asgi_app, '/api/movies')
+        wsgi.release.set()
+        return await first, rejected
+
+    try:
+        first, rejected = asyncio.run(scenario())
+    finally:
+        asgi_app.executor.shutdown()
+
+    assert first[0] == 200
+    assert rejected[0] == 503
+    assert json.loads(rejected[1]) == {'success': False, 'error': 'Сервер перегружен'}
+    assert asgi_app.stats['rejected'] == 1
+    assert len(wsgi.calls) == 1
+
+
+def test_flask_routes_through_asgi(catalog):
+    asgi_app = AsgiApp(movies_app.app, threads=2)
+    try:
+        status, body = asyncio.run(request(asgi_app, '/api/movies', b'search=heat&fields=title'))
+    finally:
+        asgi_app.executor.shutdown()
+
+    assert status == 200
+    assert json.loads(body)['movies'] == [{'title': 'Heat'}]
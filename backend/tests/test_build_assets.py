@@ -0,0 +1,43 @@
+import gzip
+
+from build_assets import build, load_assets, minify_css, minify_js
+
+
+def test_minify_css_keeps_significant_spaces():
+    css = """
+    /* комментарий */
+    .card :hover , a > b {
+        color : red;
+        width: calc(100% + 2px);
+    }
+    @media (max-width: 600px) { .card:not(.wide) p { margin: 0 auto; } }
+    """
+
+    assert minify_css(css) == (
+        '.card :hover,a>b{color :red;width:calc(100% + 2px)}'
+        '@media (max-width:600px){.card:not(.wide) p{margin:0 auto}}'
+    )
+
+
+def test_minify_js_keeps_strings_and_templates():
+    js = "const a = 'x  //  y';  // комментарий\nconst b = `${ a }  ok`;\nlet c = a + +1;\n"
+
+    assert minify_js(js) == "const a='x  //  y';\nconst b=`${a}  ok`;\nlet c=a + +1;\n"
+
+
+def test_build_and_load_assets(tmp_path):
+    (tmp_path / 'index.html').write_text('<link href="style.css"><script src="./script.js"></script>')
+    (tmp_path / 'style.css').write_text('body { color : red; }\n' * 50)
+    (tmp_path / 'script.js').write_text('console.log(1);\n')
+
+    manifest = build(tmp_path)
+    assets = load_assets(tmp_path / 'dist')
+
+    style = manifest['renames']['style.css']
+    script = manifest['renames']['script.js']
+    assert f'href="/{style}"' in assets['index.html'].body.decode()
+    assert f'src="/{script}"' in assets['index.html'].body.decode()
+    assert assets[style].immutable and not assets['style.css'].immutable
+    assert gzip.decompress(assets[style].variants['gzip']) == assets[style].body
+    assert 'gzip' not in assets[script].variants  # меньше MIN_COMPRESS_SIZE
+    assert load_assets(tmp_path / 'missing') is None
@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+from config import Config
+
+import app as movies_app
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    # Здесь проверяется подсчёт, а не кэш готовых ответов
+    monkeypatch.setattr(movies_app._response_cache, 'max_size', 0)
+
+
+def execute(sql):
+    conn = sqlite3.connect(movies_app.DB_PATH)
+    conn.execute(sql)
+    conn.commit()
+    conn.close()
+
+
+def test_unfiltered_total_comes_from_counter(catalog):
+    assert catalog.get('/api/movies').get_json()['total'] == 60
+    assert catalog.get('/health').get_json()['movies_count'] == 60
+
+    # Счётчик читается как есть, без COUNT(*) по таблице
+    execute("UPDATE catalog_counters SET value = 999 WHERE name = 'movies'")
+    assert catalog.get('/api/movies').get_json()['total'] == 999
+    assert catalog.get('/health').get_json()['movies_count'] == 999
+
+
+def test_counter_follows_inserts_and_deletes(catalog):
+    execute("DELETE FROM movies WHERE title = 'Heat'")
+    execute("INSERT INTO movies (title, poster_url) VALUES ('New One', ''), ('New Two', '')")
+
+    assert catalog.get('/health').get_json()['movies_count'] == 61
+
+
+def test_filtered_total_is_cached_until_data_changes(catalog):
+    assert catalog.get('/api/movies?min_rating=8').get_json()['total'] == 10
+
+    execute("UPDATE movies SET imdb_rating = 9.0 WHERE title = 'Love Actually'")
+    with movies_app.db_pool.connection() as conn:
+        # Кэш живёт до смены data_version
+        assert catalog.get('/api/movies?min_rating=8').get_json()['total'] == 10
+        movies_app.bump_data_version(conn.cursor())
+        conn.commit()
+
+    assert catalog.get('/api/movies?min_rating=8').get_json()['total'] == 11
+
+
+def test_total_can_be_skipped_or_estimated(catalog, monkeypatch):
+    data = catalog.get('/api/movies?include_total=false').get_json()
+    assert data['total'] is None and data['total_pages'] is None
+    assert len(data['movies']) == 20
+
+    monkeypatch.setattr(Config, 'COUNT_ESTIMATE_LIMIT', 5)
+    data = catalog.get('/api/movies?genre=Drama&include_total=estimate').get_json()
+    assert data['total'] == 5 and data['total_is_estimate'] is True
@@ -0,0 +1,46 @@
+import pytest
+
+from bench_engine import QUERIES
+from config import Config
+
+import app as movies_app
+
+
+def answer(client, engine, query_string):
+    Config.CATALOG_ENGINE = engine
+    return client.get(f'/api/movies?per_page=7&{query_string}').get_json()
+
+
+@pytest.fixture
+def engines(catalog, monkeypatch):
+    monkeypatch.setattr(Config, 'CATALOG_ENGINE', 'sql')
+    # Без кэша COUNT SQL режим каждый раз считает total сам
+    monkeypatch.setattr(Config, 'COUNT_CACHE_SIZE', 0)
+    monkeypatch.setattr(movies_app._response_cache, 'max_size', 0)
+    return catalog
+
+
+@pytest.mark.parametrize('query_string', QUERIES + [
+    'genre=drama&sort_by=imdb_rating&sort_order=ASC',
+    'min_rating=7&sort_by=title&page=2',
+    'sources=imdb&year_to=1999&sort_by=release_year',
+    'genre=Documentary&page=5',
+])
+def test_memory_engine_matches_sql(engines, query_string):
+    expected = answer(engines, 'sql', query_string)
+
+    assert answer(engines, 'memory', query_string) == expected
+    assert movies_app._catalog_engine[1] is not None
+
+
+def test_memory_engine_rebuilds_after_data_change(engines):
+    answer(engines, 'memory', '')
+    version = movies_app._catalog_engine[0]
+
+    with movies_app.db_pool.connection() as conn:
+        conn.execute("UPDATE movies SET imdb_rating = 9.9 WHERE title = 'Heat'")
+        movies_app.bump_data_version(conn.cursor())
+        conn.commit()
+
+    assert answer(engines, 'memory', '')['movies'][0]['title'] == 'Heat'
+    assert movies_app._catalog_engine[0] != version
@@ -0,0 +1,86 @@
+from collections import Counter
+
+import pytest
+
+from config import Config
+from conftest import catalog_movies
+
+import app as movies_app
+
+
+def expected_facets(movies):
+    """Фасеты, посчитанные по списку тестовых фильмов (порядок как в sort_facets)"""
+    genres, years, buckets, platforms = Counter(), Counter(), Counter(), Counter()
+    for title, year, rating, votes, genre, description, sources in movies:
+        genres.update(name.strip() for name in genre.split(','))
+        years[year] += 1
+        if rating is not None:
+            buckets[min(int(rating), 10)] += 1
+        platforms.update(name for name in ('netflix', 'amazon') if name in sources)
+        platforms['imdb'] += 1  # у всех фильмов дампа есть постер
+    return {
+        'genre': [{'value': value, 'count': count}
+                  for value, count in sorted(genres.items(), key=lambda item: (-item[1], item[0]))],
+        'year': [{'value': value, 'count': count} for value, count in sorted(years.items(), reverse=True)],
+        'platform': [{'value': value, 'count': platforms[value]}
+                     for value in ('netflix', 'amazon', 'imdb') if platforms[value]],
+        'rating_bucket': [{'value': value, 'count': count} for value, count in sorted(buckets.items(), reverse=True)],
+    }
+
+
+@pytest.fixture
+def client(catalog, monkeypatch):
+    monkeypatch.setattr(movies_app._response_cache, 'max_size', 0)
+    return catalog
+
+
+def get_facets(client, query_string):
+    response = client.get(f'/api/movies?facets=genre,year,platform,rating_bucket&{query_string}')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_facets_without_filters_match_catalog(client):
+    data = get_facets(client, '')
+
+    assert data['facets'] == expected_facets(catalog_movies())
+    assert data['total'] == 60
+
+
+@pytest.mark.parametrize('query_string, matches', [
+    ('genre=Drama', lambda movie: 'Drama' in movie[4].split(', ')),
+    ('min_rating=7&year_to=2005', lambda movie: movie[2] is not None and movie[2] >= 7 and movie[1] <= 2005),
+    ('sources=netflix', lambda movie: 'netflix' in movie[6]),
+    ('search=love', lambda movie: 'love' in movie[0].lower() or 'love' in movie[5].lower()),
+])
+def test_facets_follow_filters(client, query_string, matches):
+    movies = [movie for movie in catalog_movies() if matches(movie)]
+
+    data = get_facets(client, f'{query_string}&per_page=3')
+
+    assert data['total'] == len(movies)
+    assert data['facets'] == expected_facets(movies)
+    assert len(data['movies']) == min(3, len(movies))
+
+
+@pytest.mark.parametrize('query_string', ['', 'genre=Drama', 'min_rating=7&year_to=2005', 'sources=amazon'])
+def test_memory_engine_facets_match_sql(client, monkeypatch, query_string):
+    monkeypatch.setattr(Config, 'CATALOG_ENGINE', 'sql')
+    expected = get_facets(client, query_string)['facets']
+
+    monkeypatch.setattr(Config, 'CATALOG_ENGINE', 'memory')
+    assert get_facets(client, query_string)['facets'] == expected
+    assert movies_app._catalog_engine[1] is not None
+
+
+def test_only_requested_facets(client):
+    data = client.get('/api/movies?facets=platform,platform').get_json()
+    assert list(data['facets']) == ['platform']
+    assert 'facets' not in client.get('/api/movies').get_json()
+
+
+def test_unknown_facet_is_rejected(client):
+    response = client.get('/api/movies?facets=genre,director')
+
+    assert response.status_code == 400
+    assert 'director' in response.get_json()['error']
@@ -0,0 +1,30 @@
+import pytest
+
+import app as movies_app
+
+
+def test_fields_projection(catalog):
+    data = catalog.get('/api/movies?search=matrix&fields=title,sources').get_json()
+
+    assert data['movies'] == [{'title': 'The Matrix', 'sources': ['netflix', 'imdb', 'amazon']}]
+
+
+def test_sources_are_parsed_once_per_value(catalog):
+    movies_app.sources_list.cache_clear()
+
+    movies = catalog.get('/api/movies?per_page=60&fields=id,sources').get_json()['movies']
+
+    assert len(movies) == 60
+    # Четыре различных набора платформ в тестовом каталоге
+    assert movies_app.sources_list.cache_info().misses == 4
+    assert {tuple(movie['sources']) for movie in movies} == {
+        ('imdb',), ('netflix', 'imdb'), ('imdb', 'amazon'), ('netflix', 'imdb', 'amazon'),
+    }
+
+
+def test_msgpack_response(catalog):
+    msgpack = pytest.importorskip('msgpack')
+    response = catalog.get('/api/movies?search=heat&fields=title,sources', headers={'Accept': 'application/msgpack'})
+
+    assert response.mimetype == 'application/msgpack'
+    assert msgpack.unpackb(response.get_data())['movies'] == [{'title': 'Heat', 'sources': ['imdb', 'amazon']}]
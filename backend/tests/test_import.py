@@ -0,0 +1,75 @@
+import csv
+import sqlite3
+
+import pytest
+
+import app as movies_app
+
+
+@pytest.fixture
+def conn(tmp_path):
+    connection = sqlite3.connect(tmp_path / 'import.db')
+    yield connection
+    connection.close()
+
+
+def write_csv(path, rows, header=('movie_id', 'canonical_key', 'title', 'release_year', 'imdb_rating', 'poster_url')):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return path
+
+
+def test_empty_poster_is_loaded(conn, tmp_path):
+    path = write_csv(tmp_path / 'movies.csv', [
+        [1, 'a_2001', 'A', '2001', '7.5', 'http://example.com/a.jpg'],
+        [2, 'b_2002', 'B', '2002', '6.1', ''],
+    ])
+
+    stats = movies_app.import_csv_file(conn, path)
+
+    assert stats['rows'] == 2
+    assert stats['skipped'] == 0
+    rows = conn.execute("SELECT title, poster_url, release_year FROM movies ORDER BY title").fetchall()
+    assert rows == [('A', 'http://example.com/a.jpg', 2001), ('B', '', 2002)]
+
+
+def test_missing_poster_column_uses_default(conn, tmp_path):
+    path = write_csv(tmp_path / 'movies.csv', [['A', '2001'], ['B', '']], header=('title', 'release_year'))
+
+    stats = movies_app.import_csv_file(conn, path)
+
+    assert stats['rows'] == 2
+    assert conn.execute("SELECT COUNT(*) FROM movies WHERE poster_url = ''").fetchone()[0] == 2
+
+
+def test_duplicates_and_constraint_errors_are_counted(conn, tmp_path):
+    path = write_csv(tmp_path / 'movies.csv', [
+        [1, 'a_2001', 'A', '2001', '7.5', ''],
+        [2, 'a_2001', 'A again', '2001', '7.5', ''],
+        [3, 'c_2003', '', '2003', '5.0', ''],
+        [4, 'd_2004', 'D', '2004', '8.0', ''],
+    ])
+
+    stats = movies_app.import_csv_file(conn, path, chunk_size=10)
+
+    assert stats['rows'] == 2
+    assert stats['duplicates'] == 1
+    assert stats['failed'] == 1
+    assert 'строка 3' in stats['errors'][0]
+    assert stats['skipped'] == 2
+    titles = [row[0] for row in conn.execute("SELECT title FROM movies ORDER BY title")]
+    assert titles == ['A', 'D']
+    assert movies_app.read_counters(conn.cursor())['movies'] == 2
+
+
+def test_failed_import_keeps_old_catalog(catalog, tmp_path):
+    path = write_csv(tmp_path / 'broken.csv', [['A']], header=('name',))
+
+    with movies_app.db_pool.connection() as conn:
+        with pytest.raises(ValueError):
+            movies_app.import_csv_file(conn, path)
+
+    assert catalog.get('/health').get_json()['movies_count'] == 60
+    assert catalog.get('/api/movies?search=matrix').get_json()['total'] == 1
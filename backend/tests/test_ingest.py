@@ -0,0 +1,73 @@
+import csv
+
+import app as movies_app
+from ingest import TitleBlocks, ingest, normalize_title
+
+PLATFORM_HEADER = ['show_id', 'type', 'title', 'director', 'cast', 'country', 'date_added',
+                   'release_year', 'rating', 'duration', 'listed_in', 'description']
+
+
+def write_csv(path, header, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return path
+
+
+def platform_row(show_id, title, year, kind='Movie', director='', listed_in='Dramas'):
+    return [show_id, kind, title, director, '', 'United States', '', year, 'PG-13', '100 min', listed_in,
+            f'{title} description']
+
+
+def test_normalize_title():
+    assert normalize_title('The Lord of the Rings: The Return') == 'lord of the rings the return'
+    assert normalize_title('Fast & Furious') == normalize_title('Fast and Furious') == 'fast furious'
+    assert normalize_title('Amélie') == 'amelie'
+    assert normalize_title('The') == 'the'
+
+
+def test_title_blocks_match_exact_year_and_typo():
+    blocks = TitleBlocks()
+    group_id = blocks.add('shawshank redemption', 1994)
+
+    assert blocks.find('shawshank redemption', 1994) == (group_id, 'exact')
+    assert blocks.find('shawshank redemption', 1995) == (group_id, 'year')
+    assert blocks.find('shawshenk redemption', 1994) == (group_id, 'fuzzy')
+    assert blocks.find('shawshank redemption', 1997) == (None, None)
+    assert blocks.find('heat', 1995) == (None, None)
+
+
+def test_ingest_merges_sources(catalog, tmp_path):
+    imdb = write_csv(tmp_path / 'imdb.csv', ['imdb_id', 'type', 'title', 'year', 'imdb_rating', 'imdb_votes', 'genre'], [
+        ['tt0111161', 'movie', 'The Shawshank Redemption', '1994', '9.3', '2900000', 'Drama'],
+        ['tt0113277', 'movie', 'Heat', '1995', '8.3', '680000', 'Action,Crime,Drama'],
+        ['tt0903747', 'tvSeries', 'Breaking Bad', '2008', '9.5', '2100000', 'Crime,Drama'],
+    ])
+    netflix = write_csv(tmp_path / 'netflix.csv', PLATFORM_HEADER, [
+        platform_row('s1', 'Shawshank Redemption', '1995', director='Frank Darabont'),
+        platform_row('s2', 'Breaking Bad', '2008', kind='TV Show'),
+        platform_row('s3', 'Only On Netflix', '2020'),
+    ])
+    amazon = write_csv(tmp_path / 'amazon.csv', PLATFORM_HEADER, [
+        platform_row('a1', 'The Shawshenk Redemption', '1994'),
+        platform_row('a2', 'Heat', '1995', listed_in='Action'),
+    ])
+
+    with movies_app.db_pool.connection() as conn:
+        result = ingest(conn, imdb=imdb, netflix=netflix, amazon=amazon, chunk_size=2)
+
+    assert result['rows'] == 3
+    assert result['matches'] == {'new': 3, 'year': 1, 'fuzzy': 1, 'exact': 1}
+    with movies_app.db_pool.connection(readonly=True) as conn:
+        rows = conn.execute("""
+            SELECT title, release_year, imdb_rating, genre, sources, num_sources, netflix_id,
+                   netflix_director, amazon_id
+            FROM movies ORDER BY title
+        """).fetchall()
+    assert [tuple(row) for row in rows] == [
+        ('Heat', 1995, 8.3, 'Action, Crime, Drama', 'imdb,amazon', 2, None, None, 'a2'),
+        ('Only On Netflix', 2020, None, 'Dramas', 'netflix', 1, 's3', None, None),
+        ('The Shawshank Redemption', 1994, 9.3, 'Drama', 'netflix,imdb,amazon', 3, 's1', 'Frank Darabont', 'a1'),
+    ]
+    assert catalog.get('/api/movies?search=shawshank').get_json()['total'] == 1
@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+import metrics
+from config import Config
+
+
+@pytest.fixture
+def conn():
+    connection = sqlite3.connect(':memory:', factory=metrics.InstrumentedConnection)
+    connection.execute("CREATE TABLE t (x INTEGER)")
+    connection.executemany("INSERT INTO t (x) VALUES (?)", [(1,), (2,), (3,)])
+    yield connection
+    connection.close()
+
+
+def rows_fetched(sql):
+    return metrics.query_rows._values.get((metrics.query_shape(sql),), 0)
+
+
+def test_rows_are_counted_for_fetch_and_iteration(conn):
+    sql = "SELECT x FROM t WHERE x > ?"
+    before = rows_fetched(sql)
+
+    cursor = conn.cursor()
+    assert len(cursor.execute(sql, (0,)).fetchall()) == 3
+    assert [row[0] for row in cursor.execute(sql, (1,))] == [2, 3]
+    cursor.execute(sql, (2,))
+    assert cursor.fetchone() == (3,)
+
+    assert rows_fetched(sql) - before == 6
+
+
+def test_plan_sampling_keeps_recent_shapes(conn, monkeypatch):
+    monkeypatch.setattr(metrics, 'MAX_SHAPES', 2)
+    monkeypatch.setattr(metrics, '_planned', metrics.OrderedDict())
+    monkeypatch.setattr(Config, 'METRICS_PLAN_SAMPLE_RATE', 0)
+
+    for sql in ("SELECT x FROM t", "SELECT x + 1 FROM t", "SELECT x FROM t", "SELECT x + 2 FROM t"):
+        conn.cursor().execute(sql).fetchall()
+
+    assert list(metrics._planned) == ["SELECT x FROM t", "SELECT x + 2 FROM t"]
+
+
+def test_one_profile_at_a_time():
+    first = metrics.RequestProfile.start()
+    assert first is not None
+    try:
+        assert metrics.RequestProfile.start() is None
+    finally:
+        first.finish('first')
+
+    second = metrics.RequestProfile.start()
+    assert second is not None
+    second.stop()
+
+
+def test_profile_header_skips_when_busy(catalog, monkeypatch):
+    monkeypatch.setattr(Config, 'PROFILING_ENABLED', True)
+
+    busy = metrics.RequestProfile.start()
+    try:
+        response = catalog.get('/api/genres', headers={'X-Profile': '1'})
+    finally:
+        busy.stop()
+    assert response.status_code == 200
+    assert response.headers['X-Profile-Skipped'] == 'busy'
+    assert 'X-Profile-Id' not in response.headers
+
+    response = catalog.get('/api/genres', headers={'X-Profile': '1'})
+    profile_id = response.headers['X-Profile-Id']
+    assert catalog.get(f'/metrics/profiles/{profile_id}').status_code == 200
+    profile = metrics.RequestProfile.start()
+    assert profile is not None
+    profile.stop()
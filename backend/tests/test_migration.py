@@ -0,0 +1,122 @@
+import contextlib
+import io
+import shutil
+import sqlite3
+
+import pytest
+
+import app as movies_app
+from conftest import use_database
+
+# База из репозитория: схема до canonical_key, источники как "['netflix', 'imdb']", 1000 фильмов
+LEGACY_DB = movies_app.BASE_DIR / 'movies.db'
+
+
+def init_quietly():
+    """init_database с перехваченным выводом, возвращает напечатанное"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        movies_app.init_database()
+    return output.getvalue()
+
+
+def expected_mask(sources):
+    return sum(bit for name, bit in movies_app.SOURCE_BITS.items() if name in (sources or '').split(','))
+
+
+def check_schema_v3(conn):
+    cursor = conn.cursor()
+    assert cursor.execute("PRAGMA user_version").fetchone()[0] == movies_app.SCHEMA_VERSION
+    assert not movies_app.movies_table_outdated(cursor)
+    for sources, mask in cursor.execute("SELECT sources, source_mask FROM movies"):
+        assert '[' not in (sources or '')
+        assert mask == expected_mask(sources)
+    missing = cursor.execute("""
+        SELECT COUNT(*) FROM movies WHERE (imdb_rating IS NULL) != (weighted_rating IS NULL)
+    """).fetchone()[0]
+    assert missing == 0
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    path = tmp_path / 'movies.db'
+    shutil.copy(LEGACY_DB, path)
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    use_database(path, data_dir)
+    return path
+
+
+def test_legacy_database_is_migrated(legacy_db):
+    with contextlib.closing(sqlite3.connect(legacy_db)) as conn:
+        before = conn.execute("SELECT id, title, release_year, imdb_rating FROM movies ORDER BY id").fetchall()
+        assert 'canonical_key' not in [row[1] for row in conn.execute("PRAGMA table_info(movies)")]
+
+    output = init_quietly()
+
+    assert f'приведена к схеме {movies_app.SCHEMA_VERSION}: 1000 фильмов' in output
+    with movies_app.db_pool.connection() as conn:
+        check_schema_v3(conn)
+        after = conn.execute("SELECT id, title, release_year, imdb_rating FROM movies ORDER BY id").fetchall()
+    assert [tuple(row) for row in after] == before
+
+    client = movies_app.app.test_client()
+    assert client.get('/health').get_json()['movies_count'] == 1000
+    data = client.get('/api/movies?sort_by=weighted_rating&per_page=10&fields=id,weighted_rating').get_json()
+    ratings = [movie['weighted_rating'] for movie in data['movies']]
+    assert data['total'] == 1000 and ratings == sorted(ratings, reverse=True)
+    # Повторный старт схему уже не трогает
+    assert 'приведена к схеме' not in init_quietly()
+
+
+def test_v2_database_is_migrated(catalog):
+    # База версии 2: без source_mask и weighted_rating, годы записаны как REAL (1995.0)
+    with movies_app.db_pool.connection() as conn:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(movies)")
+                   if row[1] not in ('source_mask', 'weighted_rating')]
+        conn.execute(f"CREATE TABLE movies_v2 AS SELECT {', '.join(columns)} FROM movies")
+        conn.execute("DROP TABLE movies")
+        conn.execute("ALTER TABLE movies_v2 RENAME TO movies")
+        conn.execute("UPDATE movies SET release_year = release_year + 0.0")
+        conn.execute("INSERT INTO movie_similar VALUES (4, 1, 5, 0.5)")
+        conn.execute("PRAGMA user_version = 2")
+        conn.commit()
+    use_database(movies_app.DB_PATH, movies_app.DATA_DIR)
+
+    output = init_quietly()
+
+    assert f'приведена к схеме {movies_app.SCHEMA_VERSION}: 60 фильмов' in output
+    with movies_app.db_pool.connection() as conn:
+        check_schema_v3(conn)
+        assert conn.execute("SELECT typeof(release_year) FROM movies WHERE id = 4").fetchone()[0] == 'integer'
+        # id сохранились, поэтому посчитанные соседи остаются
+        assert tuple(conn.execute("SELECT movie_id, similar_id FROM movie_similar").fetchone()) == (4, 5)
+    assert catalog.get('/health').get_json()['movies_count'] == 60
+    assert catalog.get('/api/movies/4').get_json()['movie']['title'] == 'Heat'
+    assert catalog.get('/api/movies?search=matrix').get_json()['total'] == 1
+    assert catalog.get('/api/movies?sources=amazon').get_json()['total'] == 16
+
+
+def test_pandas_table_is_migrated(legacy_db):
+    # Таблица в духе pandas.to_sql: без ограничений, годы REAL, голоса с разделителями
+    with contextlib.closing(sqlite3.connect(legacy_db)) as conn:
+        conn.executescript("""
+            DROP TABLE movies;
+            CREATE TABLE movies (movie_id INTEGER, canonical_key TEXT, title TEXT,
+                                 release_year REAL, imdb_votes TEXT, poster_url TEXT);
+            INSERT INTO movies VALUES (1, 'a_2001', 'A', 2001.0, '1,234', NULL);
+            INSERT INTO movies VALUES (2, 'a_2001', 'A again', 2001.0, '5', '');
+            INSERT INTO movies VALUES (3, 'c_2003', NULL, 2003.0, NULL, 'http://example.com/c.jpg');
+            INSERT INTO movies VALUES (4, 'd_2004', 'D', 2004.0, '', 'http://example.com/d.jpg');
+        """)
+
+    output = init_quietly()
+
+    assert 'не перенесено 2 строк: без title 1, повторы id/canonical_key 1' in output
+    with movies_app.db_pool.connection() as conn:
+        check_schema_v3(conn)
+        rows = conn.execute("SELECT title, release_year, imdb_votes, poster_url, sources FROM movies ORDER BY title")
+        assert [tuple(row) for row in rows] == [
+            ('A', 2001, 1234, '', None),
+            ('D', 2004, None, 'http://example.com/d.jpg', 'imdb'),
+        ]
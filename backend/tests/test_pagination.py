@@ -0,0 +1,57 @@
+import pytest
+
+
+def ids(response):
+    return [movie['id'] for movie in response.get_json()['movies']]
+
+
+def cursor_pages(client, query):
+    """Все страницы курсорного режима по next_cursor"""
+    pages = []
+    token = ''
+    while True:
+        data = client.get(f'/api/movies?{query}&cursor={token}').get_json()
+        assert data['success']
+        pages.append([movie['id'] for movie in data['movies']])
+        token = data['next_cursor']
+        if token is None:
+            return pages
+
+
+@pytest.mark.parametrize('sort_by', ['imdb_rating', 'title', 'release_year', 'num_sources'])
+@pytest.mark.parametrize('sort_order', ['DESC', 'ASC'])
+def test_cursor_pages_match_offset_pages(catalog, sort_by, sort_order):
+    query = f'per_page=7&sort_by={sort_by}&sort_order={sort_order}'
+
+    pages = cursor_pages(catalog, query)
+
+    assert len(pages) == 9  # 60 фильмов по 7
+    for page, cursor_ids in enumerate(pages, 1):
+        assert cursor_ids == ids(catalog.get(f'/api/movies?{query}&page={page}'))
+
+
+def test_cursor_pages_with_filter(catalog):
+    query = 'per_page=4&genre=Drama&sort_by=imdb_rating'
+
+    pages = cursor_pages(catalog, query)
+
+    total = catalog.get(f'/api/movies?{query}').get_json()['total']
+    assert sum(len(page) for page in pages) == total
+    for page, cursor_ids in enumerate(pages, 1):
+        assert cursor_ids == ids(catalog.get(f'/api/movies?{query}&page={page}'))
+
+
+def test_cursor_with_search_sorts_by_rating(catalog):
+    data = catalog.get('/api/movies?search=love&cursor=').get_json()
+
+    assert [movie['title'] for movie in data['movies']] == ['The Notebook', 'Love Actually', 'Crazy Stupid Love']
+
+    response = catalog.get('/api/movies?search=love&sort_by=relevance&cursor=')
+    assert response.status_code == 400
+
+
+def test_cursor_for_other_sort_is_rejected(catalog):
+    token = catalog.get('/api/movies?per_page=5&sort_by=title&cursor=').get_json()['next_cursor']
+
+    assert catalog.get(f'/api/movies?per_page=5&sort_by=year&cursor={token}').status_code == 400
+    assert catalog.get('/api/movies?cursor=not-a-cursor').status_code == 400
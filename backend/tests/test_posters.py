@@ -0,0 +1,155 @@
+import hashlib
+import io
+import os
+import threading
+
+import pytest
+from PIL import Image
+
+import app as movies_app
+from config import Config
+from posters import PosterCache
+from conftest import NAMED_MOVIES, make_catalog
+
+# Источник постеров в тестовом каталоге (см. conftest.write_dump)
+ORIGIN = 'https://posters.test'
+
+
+def make_image(width=400, height=600, color=(200, 50, 50)):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class FakeOrigin:
+    """Локальный источник постеров вместо сети: адрес -> байты, обращения считаются"""
+
+    def __init__(self, images):
+        self.images = images
+        self.calls = []
+        # Пока событие сброшено, загрузка "висит" (медленный источник)
+        self.ready = threading.Event()
+        self.ready.set()
+
+    def __call__(self, url, timeout):
+        self.calls.append(url)
+        self.ready.wait(5)
+        if url not in self.images:
+            raise OSError('404 Not Found')
+        return self.images[url], 'image/jpeg'
+
+
+@pytest.fixture
+def origin():
+    return FakeOrigin({f'{ORIGIN}/a.jpg': make_image(), f'{ORIGIN}/1.jpg': make_image()})
+
+
+@pytest.fixture
+def cache(tmp_path, origin):
+    cache = PosterCache(tmp_path / 'posters', 10 * 1024 * 1024, widths=(150, 300), fetcher=origin, workers=2)
+    yield cache
+    cache.executor.shutdown()
+
+
+def test_miss_then_hit(cache, origin):
+    path, etag, mimetype = cache.get(f'{ORIGIN}/a.jpg', 300, 'jpeg')
+
+    assert mimetype == 'image/jpeg'
+    assert cache.stats['misses'] == 1 and cache.stats['hits'] == 0
+    assert cache.get(f'{ORIGIN}/a.jpg', 300, 'jpeg') == (path, etag, mimetype)
+    assert cache.stats['hits'] == 1
+    assert origin.calls == [f'{ORIGIN}/a.jpg']
+
+
+def test_etag_is_content_hash(cache):
+    path, etag, _ = cache.get(f'{ORIGIN}/a.jpg', 150, 'webp')
+
+    assert etag == hashlib.sha256(path.read_bytes()).hexdigest()[:32]
+
+
+def test_width_selection(cache, origin):
+    assert [cache.pick_width(width) for width in (0, 100, 150, 200, 1000)] == [0, 150, 150, 300, 300]
+
+    path, _, mimetype = cache.get(f'{ORIGIN}/a.jpg', 200, 'webp')
+    with Image.open(path) as image:
+        assert mimetype == 'image/webp'
+        assert image.size == (300, 450)
+    path, _, _ = cache.get(f'{ORIGIN}/a.jpg', 0)
+    assert path.read_bytes() == origin.images[f'{ORIGIN}/a.jpg']
+
+
+def test_failed_fetch_is_retried_after_window(cache, origin):
+    url = f'{ORIGIN}/missing.jpg'
+
+    assert cache.get(url, 300) is None
+    assert cache.get(url, 300) is None
+    assert origin.calls == [url]
+    assert cache.recently_failed(url)
+
+    cache.retry_after = 0
+    assert cache.get(url, 300) is None
+    assert origin.calls == [url, url]
+
+
+def test_lru_eviction(tmp_path):
+    images = {f'{ORIGIN}/{name}.jpg': bytes([index]) * 10000 for index, name in enumerate('abc')}
+    fetcher = lambda url, timeout: (images[url], 'image/jpeg')
+    cache = PosterCache(tmp_path / 'posters', 25000, widths=(), fetcher=fetcher, workers=1)
+    try:
+        paths = {url: cache.get(url)[0] for url in list(images)[:2]}
+        os.utime(paths[f'{ORIGIN}/a.jpg'], (1000, 1000))
+        os.utime(paths[f'{ORIGIN}/b.jpg'], (500, 500))
+        cache.get(f'{ORIGIN}/a.jpg')  # обращение обновляет время
+
+        cache.get(f'{ORIGIN}/c.jpg')
+
+        assert cache.stats['evicted'] == 1
+        assert cache.lookup(f'{ORIGIN}/b.jpg', 0, 'original') is None
+        assert cache.lookup(f'{ORIGIN}/a.jpg', 0, 'original') is not None
+        assert cache.lookup(f'{ORIGIN}/c.jpg', 0, 'original') is not None
+        assert cache.size() <= 25000
+    finally:
+        cache.executor.shutdown()
+
+
+@pytest.fixture
+def client(tmp_path, cache):
+    client = make_catalog(tmp_path, NAMED_MOVIES[:3])
+    with movies_app.db_pool.connection() as conn:
+        conn.execute("UPDATE movies SET poster_url = ? WHERE id = 2", (f'{ORIGIN}/missing.jpg',))
+        conn.execute("UPDATE movies SET poster_url = '' WHERE id = 3")
+        conn.commit()
+    movies_app._poster_cache = cache
+    yield client
+    movies_app._poster_cache = None
+
+
+def test_poster_endpoint_etag_and_304(client):
+    response = client.get('/api/posters/1?w=300&format=jpeg')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert response.headers['Cache-Control'] == f'public, max-age={Config.POSTER_MAX_AGE}'
+    etag = response.headers['ETag']
+    assert client.get('/api/posters/1?w=300&format=jpeg', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_poster_endpoint_placeholder(client):
+    for movie_id in (2, 3):
+        response = client.get(f'/api/posters/{movie_id}?w=300')
+        assert response.mimetype == 'image/svg+xml'
+        assert response.headers['Cache-Control'] == 'public, max-age=300'
+    assert client.get('/api/posters/999').status_code == 404
+
+
+def test_poster_endpoint_does_not_wait_for_slow_origin(client, cache, origin, monkeypatch):
+    monkeypatch.setattr(Config, 'POSTER_WAIT', 0.05)
+    origin.ready.clear()
+
+    response = client.get('/api/posters/1?w=300&format=jpeg')
+
+    assert response.mimetype == 'image/svg+xml'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    origin.ready.set()
+    cache.submit(f'{ORIGIN}/1.jpg').result(5)
+    assert client.get('/api/posters/1?w=300&format=jpeg').mimetype == 'image/jpeg'
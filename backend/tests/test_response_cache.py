@@ -0,0 +1,60 @@
+import csv
+import sqlite3
+
+from config import Config
+
+import app as movies_app
+
+
+def test_etag_and_304(catalog):
+    first = catalog.get('/api/movies?genre=Drama')
+    assert first.status_code == 200
+    assert first.headers['X-Cache'] == 'MISS'
+    etag = first.headers['ETag']
+
+    second = catalog.get('/api/movies?genre=Drama')
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.headers['ETag'] == etag
+    assert second.get_data() == first.get_data()
+
+    not_modified = catalog.get('/api/movies?genre=Drama', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b''
+
+    # Другие параметры - другой ключ и другое тело
+    assert catalog.get('/api/movies?genre=Comedy').headers['ETag'] != etag
+
+
+def test_cache_is_dropped_after_csv_load(catalog):
+    etag = catalog.get('/api/movies').headers['ETag']
+    stats_etag = catalog.get('/api/stats').headers['ETag']
+
+    with open(movies_app.DATA_DIR / 'integrated_movies_with_posters.csv', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['canonical_key', 'title', 'release_year', 'imdb_rating', 'genre', 'poster_url', 'sources'])
+        writer.writerow(['fresh_2020', 'Fresh', 2020, 9.1, 'Drama', 'https://posters.test/f.jpg', 'imdb'])
+    assert catalog.post('/api/admin/load-csv').get_json()['count'] == 1
+
+    response = catalog.get('/api/movies', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'MISS'
+    assert [movie['title'] for movie in response.get_json()['movies']] == ['Fresh']
+    assert catalog.get('/api/stats', headers={'If-None-Match': stats_etag}).status_code == 200
+
+
+def test_other_process_load_is_seen_after_check_interval(catalog, monkeypatch):
+    etag = catalog.get('/api/movies').headers['ETag']
+
+    # Загрузка в другом процессе: меняется только data_version в базе
+    conn = sqlite3.connect(movies_app.DB_PATH)
+    conn.execute("DELETE FROM movies WHERE title = 'The Matrix'")
+    conn.execute("UPDATE catalog_counters SET value = value + 1 WHERE name = 'data_version'")
+    conn.commit()
+    conn.close()
+
+    assert catalog.get('/api/movies', headers={'If-None-Match': etag}).status_code == 304
+
+    monkeypatch.setattr(Config, 'DATA_VERSION_CHECK_INTERVAL', 0)
+    response = catalog.get('/api/movies', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['total'] == 59
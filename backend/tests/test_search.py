@@ -0,0 +1,73 @@
+import sqlite3
+
+import pytest
+
+from config import Config
+
+import app as movies_app
+from conftest import make_catalog
+
+
+def titles(response):
+    return [movie['title'] for movie in response.get_json()['movies']]
+
+
+def test_title_matches_rank_before_description_matches(catalog):
+    response = catalog.get('/api/movies?search=love')
+
+    assert response.get_json()['total'] == 3
+    found = titles(response)
+    assert set(found[:2]) == {'Love Actually', 'Crazy Stupid Love'}
+    assert found[2] == 'The Notebook'
+
+
+def test_search_matches_word_prefixes(catalog):
+    assert titles(catalog.get('/api/movies?search=noteb')) == ['The Notebook']
+    assert titles(catalog.get('/api/movies?search=matrix hacker')) == ['The Matrix']
+
+
+def test_search_index_follows_updates(catalog):
+    conn = sqlite3.connect(movies_app.DB_PATH)
+    conn.execute("UPDATE movies SET title = 'Heat Wave' WHERE title = 'Heat'")
+    conn.commit()
+    conn.close()
+
+    assert titles(catalog.get('/api/movies?search=wave')) == ['Heat Wave']
+
+
+def test_suggestions_match_title_words(catalog):
+    suggestions = catalog.get('/api/search/suggestions?q=lov').get_json()['suggestions']
+
+    assert [suggestion['title'] for suggestion in suggestions] == ['Love Actually', 'Crazy Stupid Love']
+
+
+def test_fuzzy_search_tolerates_typos(catalog):
+    assert titles(catalog.get('/api/movies?search=matrx')) == []
+    assert titles(catalog.get('/api/movies?search=matrx&fuzzy=true')) == ['The Matrix']
+    assert titles(catalog.get('/api/movies?search=notebok&fuzzy=true'))[0] == 'The Notebook'
+
+
+@pytest.fixture
+def matrices(tmp_path):
+    movies = [(f'Matrix {number}', 1999 + number, 7.0, 1000, 'Action', 'A sequel.', 'imdb') for number in range(5)]
+    return make_catalog(tmp_path, movies + [('Heat', 1995, 8.3, 1000, 'Crime', 'Robbers.', 'imdb')])
+
+
+def test_fuzzy_total_is_marked_capped(matrices, monkeypatch):
+    monkeypatch.setattr(Config, 'FUZZY_MAX_RESULTS', 3)
+
+    data = matrices.get('/api/movies?search=matrx&fuzzy=true').get_json()
+
+    assert data['total'] == 3
+    assert data['total_capped'] is True
+    assert data['max_results'] == 3
+
+
+def test_fuzzy_total_under_cap_is_exact(matrices, monkeypatch):
+    monkeypatch.setattr(Config, 'FUZZY_MAX_RESULTS', 10)
+
+    data = matrices.get('/api/movies?search=matrx&fuzzy=true').get_json()
+
+    assert data['total'] == 5
+    assert data['total_capped'] is False
+    assert 'total_capped' not in matrices.get('/api/movies?search=matrix').get_json()
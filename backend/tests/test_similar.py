@@ -0,0 +1,75 @@
+import contextlib
+import io
+import sqlite3
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import similar
+
+import app as movies_app
+
+
+def refresh(**kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return movies_app.refresh_similar_movies(**kwargs)
+
+
+def similar_rows():
+    conn = sqlite3.connect(movies_app.DB_PATH)
+    rows = conn.execute("SELECT movie_id, rank, similar_id, score FROM movie_similar ORDER BY movie_id, rank").fetchall()
+    conn.close()
+    return rows
+
+
+def test_refresh_fills_similar_lists(catalog):
+    stats = refresh(full=True)
+
+    assert stats['stale'] is False
+    assert stats['recomputed'] == 60
+    data = catalog.get('/api/movies/1/similar?fields=title').get_json()
+    assert data['success']
+    assert data['movies']
+    assert 'Love Actually' not in [movie['title'] for movie in data['movies']]
+
+
+def test_spawned_workers_match_single_process(catalog, monkeypatch):
+    refresh(full=True)
+    expected = similar_rows()
+
+    # Несколько пачек, чтобы пересчёт ушёл в пул процессов
+    monkeypatch.setattr(similar, 'BATCH_CELLS', 2000)
+    monkeypatch.setattr(movies_app.Config, 'SIMILAR_WORKERS', 2)
+    methods = []
+    get_context = similar.multiprocessing.get_context
+
+    def recording_context(method):
+        methods.append(method)
+        return get_context(method)
+    monkeypatch.setattr(similar.multiprocessing, 'get_context', recording_context)
+    stats = refresh(full=True)
+
+    assert methods == ['spawn']
+    assert stats['stale'] is False
+    assert similar_rows() == expected
+
+
+def test_import_during_refresh_discards_result(catalog, tmp_path, monkeypatch):
+    path = tmp_path / 'movies.csv'
+    path.write_text('title,genre,description\nFresh,Drama,A fresh story.\nOther,Drama,A fresh tale.\n',
+                    encoding='utf-8')
+    build_matrix = similar.build_matrix
+
+    def import_meanwhile(*args, **kwargs):
+        # Импорт выдаёт id заново, пока пересчёт работает со старым снимком
+        with movies_app.db_pool.connection() as conn:
+            movies_app.import_csv_file(conn, path)
+        return build_matrix(*args, **kwargs)
+    monkeypatch.setattr(similar, 'build_matrix', import_meanwhile)
+
+    stats = refresh(full=True)
+
+    assert stats['stale'] is True
+    assert stats['recomputed'] == 0
+    assert similar_rows() == []
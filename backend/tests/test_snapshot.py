@@ -0,0 +1,94 @@
+import contextlib
+import io
+import sqlite3
+
+import pytest
+
+from config import Config
+
+import app as movies_app
+from conftest import use_database
+
+
+def quiet(function, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args)
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Записывает вызовы apply_schema и загрузчиков данных"""
+    recorded = []
+    for name in ('apply_schema', 'load_sql_file', 'import_csv_file'):
+        original = getattr(movies_app, name)
+
+        def record(*args, _name=name, _original=original):
+            recorded.append(_name)
+            return _original(*args)
+        monkeypatch.setattr(movies_app, name, record)
+    return recorded
+
+
+def movies_count():
+    with movies_app.db_pool.connection(readonly=True) as conn:
+        return conn.execute("SELECT COUNT(*) FROM movies").fetchone()[0]
+
+
+def test_restart_skips_schema_and_data_loading(catalog, calls):
+    with movies_app.db_pool.connection(readonly=True) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == movies_app.SCHEMA_VERSION
+
+    quiet(movies_app.init_database)
+
+    assert calls == []
+    assert movies_count() == 60
+
+
+def test_outdated_schema_version_is_applied(catalog, calls):
+    with movies_app.db_pool.connection() as conn:
+        conn.execute("PRAGMA user_version = 0")
+        conn.execute("DROP INDEX idx_year")
+
+    quiet(movies_app.init_database)
+
+    assert calls == ['apply_schema']
+    with movies_app.db_pool.connection(readonly=True) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == movies_app.SCHEMA_VERSION
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_year'").fetchone() is not None
+
+
+def test_missing_database_is_restored_from_snapshot(catalog, tmp_path, calls):
+    stats = quiet(movies_app.build_snapshot)
+    snapshot = sqlite3.connect(stats['path'])
+    assert snapshot.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+    snapshot.close()
+
+    use_database(tmp_path / 'movies.db', tmp_path / 'empty')
+    movies_app.db_pool.close_all()
+    (tmp_path / 'movies.db').unlink()
+    for suffix in ('-wal', '-shm'):
+        (tmp_path / f'movies.db{suffix}').unlink(missing_ok=True)
+    quiet(movies_app.init_database)
+
+    assert calls == []
+    assert movies_count() == 60
+    assert catalog.get('/api/movies?search=matrix').get_json()['total'] == 1
+
+
+@pytest.mark.parametrize('mode', ['readonly', 'memory'])
+def test_serving_straight_from_snapshot(catalog, monkeypatch, calls, mode):
+    quiet(movies_app.build_snapshot)
+    monkeypatch.setattr(Config, 'SNAPSHOT_MODE', mode)
+    movies_app.db_pool.close_all()
+    movies_app.db_pool = movies_app.ConnectionPool(movies_app.snapshot_uri(), Config.DB_POOL_SIZE,
+                                                   Config.DB_POOL_TIMEOUT, uri=True)
+
+    assert quiet(movies_app.init_database) is True
+
+    assert calls == []
+    assert catalog.get('/health').get_json()['movies_count'] == 60
+    assert catalog.get('/api/movies?search=heat').get_json()['total'] == 1
+    movies_app.db_pool.close_all()
+    if movies_app._snapshot_keeper is not None:
+        movies_app._snapshot_keeper.close()
+        movies_app._snapshot_keeper = None
@@ -0,0 +1,68 @@
+import contextlib
+import io
+import shutil
+from pathlib import Path
+
+from sql_dump import iter_statements, split_insert, translate_statement
+
+import app as movies_app
+from conftest import use_database
+
+BUNDLED_DUMP = Path(movies_app.__file__).parent / 'database' / 'movies.sql'
+
+
+def test_quoted_semicolons_and_comments_are_kept():
+    dump = io.StringIO(
+        "-- комментарий; не оператор\n"
+        "INSERT INTO movies (title, description) VALUES ('A; B', 'x -- y');\n"
+        "INSERT INTO movies (title, description) VALUES (\"It's\", 'multi\nline; text'); # хвост\n"
+        "/* блок; */ INSERT INTO movies (title) VALUES ('a\\'b');\n"
+    )
+
+    statements = list(iter_statements(dump))
+
+    assert statements == [
+        "INSERT INTO movies (title, description) VALUES ('A; B', 'x -- y')",
+        "INSERT INTO movies (title, description) VALUES ('It''s', 'multi\nline; text')",
+        "INSERT INTO movies (title) VALUES ('a''b')",
+    ]
+    assert split_insert(statements[0]) == ("INSERT INTO movies (title, description) VALUES", "('A; B', 'x -- y')")
+
+
+def test_mysql_statements_are_translated():
+    assert translate_statement('USE movies_db') == (None, [])
+    table, queries = translate_statement(
+        'CREATE TABLE t (id INT PRIMARY KEY AUTO_INCREMENT, name TEXT, INDEX idx_name (name(10)))'
+    )
+    assert table == 't'
+    assert 'AUTO_INCREMENT' not in queries[0]
+    assert queries[1].startswith('CREATE INDEX IF NOT EXISTS idx_name ON t')
+
+
+def test_bundled_dump_loads_all_movies(tmp_path, monkeypatch):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    shutil.copyfile(BUNDLED_DUMP, data_dir / 'movies.sql')
+    use_database(tmp_path / 'movies.db', data_dir)
+    results = []
+    load_sql_file = movies_app.load_sql_file
+
+    def recording_load(*args):
+        results.append(load_sql_file(*args))
+        return results[-1]
+    monkeypatch.setattr(movies_app, 'load_sql_file', recording_load)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        movies_app.init_database()
+
+    stats, = results
+    # CREATE DATABASE, USE и CREATE TABLE movies (таблицу уже создал init_database)
+    assert stats['skipped'] == 3
+    assert stats['failed'] == 0
+    assert stats['executed'] == stats['statements'] - 3
+    client = movies_app.app.test_client()
+    assert client.get('/health').get_json()['movies_count'] == 1000
+    with movies_app.db_pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM movies_fts").fetchone()[0] == 1000
+        assert conn.execute("SELECT COUNT(*) FROM movie_genres").fetchone()[0] > 1000
+        assert tuple(conn.execute("SELECT MIN(id), MAX(id) FROM movies").fetchone()) == (1, 1000)
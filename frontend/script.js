@@ -3,6 +3,16 @@ const API_BASE_URL = window.location.origin === 'http://localhost:5000'
     ? 'http://localhost:5000/api' 
     : '/api';
 
+// Постеры отдаются через локальный кэш сервера (миниатюры нужной ширины)
+const POSTER_PLACEHOLDER = `${API_BASE_URL}/posters/placeholder`;
+
+function posterSrc(movie, width) {
+    if (!movie.poster_url || movie.poster_url.endsWith('/posters/placeholder')) {
+        return POSTER_PLACEHOLDER;
+    }
+    return `${API_BASE_URL}/posters/${movie.id}?w=${width}`;
+}
+
 const config = {
     itemsPerPage: 20,
     currentPage: 1,
@@ -109,7 +119,7 @@ function setupEventListeners() {
     document.addEventListener('error', function(e) {
         if (e.target.tagName === 'IMG' && e.target.classList.contains('movie-poster')) {
             e.target.onerror = null;
-            e.target.src = 'https://via.placeholder.com/300x450/667eea/ffffff?text=Постер+не+найден';
+            e.target.src = POSTER_PLACEHOLDER;
         }
     }, true);
 }
@@ -162,8 +172,11 @@ async function loadMovies() {
             search: config.currentFilters.search,
             genre: config.currentFilters.genre,
             min_rating: config.currentFilters.rating,
-            sort_by: 'imdb_rating',
-            sort_order: 'DESC'
+            // При поиске сортируем по релевантности (bm25 + рейтинг)
+            sort_by: config.currentFilters.search ? 'relevance' : 'weighted_rating',
+            sort_order: 'DESC',
+            // Только поля, которые показывает карточка
+            fields: 'id,title,release_year,imdb_rating,genre,description,poster_url,sources'
         });
         
         // Добавляем фильтры по платформам
@@ -235,7 +248,7 @@ function displayMovies(movies) {
             : 'Описание отсутствует';
         
         // Проверяем наличие постера
-        const posterUrl = movie.poster_url || 'https://via.placeholder.com/300x450/667eea/ffffff?text=Постер+не+найден';
+        const posterUrl = posterSrc(movie, 300);
         
         html += `
             <div class="movie-card" data-id="${movie.id}" onclick="showMovieDetails(${movie.id})">
@@ -244,7 +257,7 @@ function displayMovies(movies) {
                          alt="${movie.title}" 
                          class="movie-poster"
                          loading="lazy"
-                         onerror="this.onerror=null; this.src='https://via.placeholder.com/300x450/667eea/ffffff?text=Постер+не+найден'">
+                         onerror="this.onerror=null; this.src='${POSTER_PLACEHOLDER}'">
                     ${rating ? `
                         <div class="movie-rating-badge">
                             <i class="fas fa-star"></i>
@@ -355,16 +368,16 @@ function displayMovieDetails(movie) {
     
     movieDetails.innerHTML = `
         <div class="movie-details-header">
-            <img src="${movie.poster_url || 'https://via.placeholder.com/800x450/667eea/ffffff?text=Постер+не+найден'}" 
+            <img src="${posterSrc(movie, 600)}" 
                  alt="${movie.title}" 
                  class="movie-details-backdrop"
-                 onerror="this.onerror=null; this.src='https://via.placeholder.com/800x450/667eea/ffffff?text=Постер+не+найден'">
+                 onerror="this.onerror=null; this.src='${POSTER_PLACEHOLDER}'">
             
             <div class="movie-details-overlay">
-                <img src="${movie.poster_url || 'https://via.placeholder.com/200x300/667eea/ffffff?text=Постер+не+найден'}" 
+                <img src="${posterSrc(movie, 300)}" 
                      alt="${movie.title}" 
                      class="movie-details-poster"
-                     onerror="this.onerror=null; this.src='https://via.placeholder.com/200x300/667eea/ffffff?text=Постер+не+найден'">
+                     onerror="this.onerror=null; this.src='${POSTER_PLACEHOLDER}'">
                 
                 <div class="movie-details-title">
                     <h2>${movie.title}</h2>